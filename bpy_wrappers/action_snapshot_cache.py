@@ -0,0 +1,332 @@
+"""Save baked actions as compressed .npz snapshots and restore them, e.g. to skip re-keyframing unchanged takes.
+
+A snapshot holds all fcurves of an action: data paths, array indices, group names and the
+keyframe arrays (co, handles, interpolation, ...) of all fcurves concatenated, read with
+`foreach_get` and written back with `keyframe_points.add(n)` plus `foreach_set`.
+A snapshot can be limited to a frame range, e.g. the frames of one take keyed back to back with
+others into the same action, and merged back into that range of the action.
+
+Author: zhaoyafei0210@gmail.com
+"""
+import hashlib
+import json
+import os
+import os.path as osp
+
+import bpy
+import numpy as np
+
+from bpy_wrappers.bulk_fcurves import (
+    KEYFRAME_ARRAY_PROPERTIES,
+    ensure_action,
+    get_action_fcurves,
+    get_or_create_fcurve,
+    read_keyframes,
+    replace_keyframes_in_range,
+    write_keyframes
+)
+
+
+__all__ = [
+    'get_action_snapshot',
+    'restore_action_snapshot',
+    'merge_action_snapshot',
+    'save_action_snapshots',
+    'load_action_snapshots',
+    'get_action_cache_path',
+    'save_actions_to_cache',
+    'load_actions_from_cache'
+]
+
+
+def get_action_snapshot(id_data: bpy.types.ID, frame_range: tuple[float, float] | None = None) -> dict:
+    """Read all fcurves of the action assigned to an ID into arrays.
+
+    Parameters:
+        id_data: animated ID, e.g. mesh_obj.data.shape_keys or an armature object.
+        frame_range: optional (frame_start, frame_end), only read the keys within it (inclusive).
+
+    Returns:
+        dict: A dictionary containing:
+            - 'action_name': name of the action
+            - 'data_paths': str array with shape (#num_fcurves,)
+            - 'array_indices': int32 array with shape (#num_fcurves,)
+            - 'group_names': str array with shape (#num_fcurves,), '' for fcurves without group
+            - 'key_offsets': int64 array with shape (#num_fcurves + 1,), the keys of fcurve i are
+              [key_offsets[i], key_offsets[i+1]) of the keyframe arrays
+            - 'frame_range': float64 array [frame_start, frame_end], [-inf, inf] if frame_range is not set
+            - one array per keyframe property, see bulk_fcurves.KEYFRAME_ARRAY_PROPERTIES
+    """
+    anim_data = id_data.animation_data
+    assert anim_data is not None and anim_data.action is not None, f"'{id_data.name}' has no action."
+
+    action = anim_data.action
+    fcurves = list(get_action_fcurves(action, id_data))
+
+    keyframes_list = [read_keyframes(fcurve) for fcurve in fcurves]
+
+    if frame_range is None:
+        frame_range = (-np.inf, np.inf)
+    else:
+        # Same tolerance on the borders as bulk_fcurves.replace_keyframes_in_range()
+        eps = 1e-3
+        for ii, keyframes in enumerate(keyframes_list):
+            frames = keyframes['co'][:, 0]
+            in_range = (frames >= frame_range[0] - eps) & (frames <= frame_range[1] + eps)
+            keyframes_list[ii] = {name: array[in_range] for name, array in keyframes.items()}
+
+    key_offsets = np.zeros(len(fcurves) + 1, dtype=np.int64)
+    np.cumsum([len(keyframes['co']) for keyframes in keyframes_list], out=key_offsets[1:])
+
+    snapshot = {
+        'action_name': action.name,
+        'data_paths': np.array([fcurve.data_path for fcurve in fcurves], dtype=str),
+        'array_indices': np.array([fcurve.array_index for fcurve in fcurves], dtype=np.int32),
+        'group_names': np.array([fcurve.group.name if fcurve.group else '' for fcurve in fcurves], dtype=str),
+        'key_offsets': key_offsets,
+        'frame_range': np.array(frame_range, dtype=np.float64),
+    }
+
+    for name, (num_components, dtype) in KEYFRAME_ARRAY_PROPERTIES.items():
+        shape = (0, num_components) if num_components > 1 else (0,)
+        snapshot[name] = np.concatenate(
+            [keyframes[name] for keyframes in keyframes_list] or [np.empty(shape, dtype=dtype)])
+
+    return snapshot
+
+
+def restore_action_snapshot(
+        id_data: bpy.types.ID,
+        snapshot: dict,
+        action_name: str | None = None
+) -> bpy.types.Action:
+    """Create a new action from a snapshot and assign it to an ID.
+
+    Only fcurves whose data path resolves on id_data are restored, e.g. a snapshot of
+    shape keys restores onto any mesh with (some of) the same shape key names,
+    a snapshot of an armature onto any armature with the same bone names.
+
+    Parameters:
+        id_data: ID to animate, e.g. mesh_obj.data.shape_keys or an armature object.
+        snapshot: dict, see get_action_snapshot().
+        action_name: name of the new action, default is the name of the snapshot's action.
+
+    Returns:
+        action: the new bpy.types.Action.
+    """
+    anim_data = id_data.animation_data
+    if anim_data is None:
+        anim_data = id_data.animation_data_create()
+
+    action = bpy.data.actions.new(name=action_name or str(snapshot['action_name']))
+    anim_data.action = action
+
+    key_offsets = snapshot['key_offsets']
+    num_skipped = 0
+
+    for ii, (data_path, index, group_name) in enumerate(
+            zip(snapshot['data_paths'], snapshot['array_indices'], snapshot['group_names'])):
+        data_path = str(data_path)
+
+        try:
+            id_data.path_resolve(data_path, False)
+        except ValueError:
+            num_skipped += 1
+            continue
+
+        start, end = key_offsets[ii], key_offsets[ii + 1]
+        keyframes = {name: snapshot[name][start:end] for name in KEYFRAME_ARRAY_PROPERTIES}
+
+        fcurve = get_or_create_fcurve(action, data_path, int(index), str(group_name) or None, id_data=id_data)
+        write_keyframes(fcurve, keyframes)
+
+    if num_skipped:
+        print(f"---> Skip {num_skipped} fcurves not found in '{id_data.name}'.")
+
+    return action
+
+
+def merge_action_snapshot(id_data: bpy.types.ID, snapshot: dict) -> bpy.types.Action:
+    """Merge a snapshot into the action assigned to an ID, the keys within the snapshot's frame range are replaced.
+
+    Unlike restore_action_snapshot(), the action of id_data is kept (or created if there is none),
+    so the keys of other takes outside the frame range stay untouched.
+    Fcurves are matched by data path like in restore_action_snapshot().
+
+    Parameters:
+        id_data: ID to animate, e.g. mesh_obj.data.shape_keys or an armature object.
+        snapshot: dict, see get_action_snapshot().
+
+    Returns:
+        action: the action of id_data.
+    """
+    action = ensure_action(id_data, str(snapshot['action_name']))
+    # Snapshots saved without a frame range hold the whole action
+    frame_start, frame_end = snapshot.get('frame_range', (-np.inf, np.inf))
+
+    key_offsets = snapshot['key_offsets']
+    num_skipped = 0
+
+    for ii, (data_path, index, group_name) in enumerate(
+            zip(snapshot['data_paths'], snapshot['array_indices'], snapshot['group_names'])):
+        data_path = str(data_path)
+
+        try:
+            id_data.path_resolve(data_path, False)
+        except ValueError:
+            num_skipped += 1
+            continue
+
+        start, end = key_offsets[ii], key_offsets[ii + 1]
+        keyframes = {name: snapshot[name][start:end] for name in KEYFRAME_ARRAY_PROPERTIES}
+
+        fcurve = get_or_create_fcurve(action, data_path, int(index), str(group_name) or None, id_data=id_data)
+        replace_keyframes_in_range(fcurve, frame_start, frame_end, keyframes)
+
+    if num_skipped:
+        print(f"---> Skip {num_skipped} fcurves not found in '{id_data.name}'.")
+
+    return action
+
+
+def save_action_snapshots(file_path: str, snapshots: dict[str, dict], metadata: dict | None = None) -> None:
+    """Save named snapshots into one compressed .npz file, the file is replaced atomically.
+
+    Parameters:
+        file_path: path of the .npz file.
+        snapshots: {label: snapshot}, e.g. {'shape_keys': ..., 'armature': ...}.
+        metadata: optional JSON-serializable dict saved along, e.g. the end frame.
+    """
+    arrays = {'__metadata__': np.array(json.dumps(metadata or {}))}
+    for label, snapshot in snapshots.items():
+        for name, array in snapshot.items():
+            arrays[f'{label}/{name}'] = np.asarray(array)
+
+    os.makedirs(osp.dirname(osp.abspath(file_path)), exist_ok=True)
+
+    tmp_path = file_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez_compressed(f, **arrays)
+    os.replace(tmp_path, file_path)
+
+
+def load_action_snapshots(file_path: str) -> tuple[dict[str, dict], dict]:
+    """Load the snapshots saved by save_action_snapshots().
+
+    Returns:
+        snapshots: {label: snapshot}.
+        metadata: dict.
+    """
+    snapshots = {}
+
+    with np.load(file_path, allow_pickle=False) as data:
+        metadata = json.loads(str(data['__metadata__']))
+
+        for key in data.files:
+            if key == '__metadata__':
+                continue
+            label, name = key.split('/', 1)
+            snapshots.setdefault(label, {})[name] = data[key]
+
+    for snapshot in snapshots.values():
+        snapshot['action_name'] = str(snapshot['action_name'])
+
+    return snapshots, metadata
+
+
+def get_action_cache_path(
+        cache_dir: str,
+        csv_path: str,
+        obj_names: list[str],
+        params: dict
+) -> str:
+    """Get the cache file of the actions baked from a CSV file.
+
+    The cache key is a hash of the CSV file content, the names of the target objects
+    and the keying parameters, so any change of them leads to a new cache file.
+
+    Parameters:
+        cache_dir: directory of the cache files.
+        csv_path: path of the source CSV file.
+        obj_names: names of the keyframed objects.
+        params: JSON-serializable keying parameters, e.g. {'start_frame': 1, 'time_downsample_rate': 2}.
+
+    Returns:
+        str: path of the .npz cache file.
+    """
+    hasher = hashlib.sha1()
+
+    with open(csv_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            hasher.update(block)
+
+    hasher.update(json.dumps([obj_names, params], sort_keys=True).encode())
+
+    csv_name = osp.splitext(osp.basename(csv_path))[0]
+
+    return osp.join(cache_dir, f'{csv_name}_{hasher.hexdigest()[:16]}.npz')
+
+
+def save_actions_to_cache(
+        cache_path: str,
+        id_datas: dict[str, bpy.types.ID],
+        metadata: dict | None = None,
+        frame_range: tuple[float, float] | None = None
+) -> None:
+    """Save the actions of IDs into a cache file.
+
+    Parameters:
+        cache_path: path of the cache file, see get_action_cache_path().
+        id_datas: {label: ID}, e.g. {'shape_keys': mesh_obj.data.shape_keys, 'armature': armature_obj}.
+        metadata: optional JSON-serializable dict, e.g. {'end_frame': 250}.
+        frame_range: optional (frame_start, frame_end) keyed from the CSV file, only its keys are saved,
+            see get_action_snapshot().
+    """
+    snapshots = {label: get_action_snapshot(id_data, frame_range) for label, id_data in id_datas.items()}
+    save_action_snapshots(cache_path, snapshots, metadata)
+
+    print(f'---> Saved {len(snapshots)} actions to cache: {cache_path}')
+
+
+def load_actions_from_cache(cache_path: str, id_datas: dict[str, bpy.types.ID]) -> dict | None:
+    """Restore the actions of IDs from a cache file.
+
+    The cached keys are merged into the actions of the IDs, see merge_action_snapshot().
+
+    Parameters:
+        cache_path: path of the cache file, see get_action_cache_path().
+        id_datas: {label: ID}, the same labels as used by save_actions_to_cache().
+
+    Returns:
+        metadata: dict saved along with the actions, or None if the cache file
+            does not exist or misses one of the labels.
+    """
+    if not osp.isfile(cache_path):
+        return None
+
+    snapshots, metadata = load_action_snapshots(cache_path)
+
+    if any(label not in snapshots for label in id_datas):
+        return None
+
+    for label, id_data in id_datas.items():
+        merge_action_snapshot(id_data, snapshots[label])
+
+    print(f'---> Restored {len(id_datas)} actions from cache: {cache_path}')
+
+    return metadata
+
+
+if __name__ == "__main__":
+    mesh_name = 'Cube'
+    shape_keys = bpy.data.objects[mesh_name].data.shape_keys
+
+    snapshot = get_action_snapshot(shape_keys)
+    print(f"---> {len(snapshot['data_paths'])} fcurves, {len(snapshot['co'])} keys")
+
+    file_path = osp.join(bpy.app.tempdir, 'action_snapshot.npz')
+    save_action_snapshots(file_path, {'shape_keys': snapshot})
+
+    snapshots, _ = load_action_snapshots(file_path)
+    action = restore_action_snapshot(shape_keys, snapshots['shape_keys'])
+    print(f'---> restored action: {action.name}')
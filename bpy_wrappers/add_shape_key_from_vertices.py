@@ -2,6 +2,8 @@
 
 Author: zhaoyafei0210@gmail.com
 """
+import time
+
 import bpy
 import numpy as np
 
@@ -12,10 +14,18 @@ __all__ = ['add_shape_key_from_vertices']
 def add_shape_key_from_vertices(
         mesh_obj_name: str, 
         target_vertices: list | np.ndarray,
-        shape_key_names: str | list[str] = 'Key'
-    ) -> list[str]:
+        shape_key_names: str | list[str] = 'Key',
+        slider_min: float | list[float] | np.ndarray | None = None,
+        slider_max: float | list[float] | np.ndarray | None = None,
+        relative_key: str | list[str] | None = None,
+        interpolation: str | list[str] = 'KEY_LINEAR',
+        return_stats: bool = False
+    ) -> list[str] | tuple[list[str], dict]:
     """Create shape key from input vertices.
 
+    The coordinates of each new key block are written with a single
+    `foreach_set('co', ...)` call from a contiguous float32 buffer.
+
     Parameters:
         mesh_obj_name: Name of the mesh object, with #num_basis_vertices vertices.
         target_vertices: List of target vertices or a NumPy array of vertices, 
@@ -23,10 +33,21 @@ def add_shape_key_from_vertices(
             or (#num_shape_key, #num_basis_vertices, 3).
         shape_key_names: Name or Prefix of the shape key or a list of shape key names 
             with length of #num_shape_key. 
+        slider_min: None, a float or a list/array of #num_shape_key floats, the minimum slider value(s).
+        slider_max: None, a float or a list/array of #num_shape_key floats, the maximum slider value(s).
+        relative_key: None, a shape key name or a list of #num_shape_key names, 
+            the key block(s) the new shape keys are relative to (default is the Basis).
+        interpolation: Interpolation type or a list of #num_shape_key interpolation types,
+            e.g. 'KEY_LINEAR', 'KEY_CARDINAL', 'KEY_CATMULL_ROM', 'KEY_BSPLINE'.
+        return_stats: If True, also return a dict of timing stats for the batch.
     
     Returns:
         List of shape key names.
+        stats: dict with 'num_shape_keys', 'num_vertices', 'total_seconds' and 'seconds_per_key',
+            only if return_stats is True.
     """
+    start_time = time.perf_counter()
+
     # Get the Mesh object
     obj = bpy.data.objects.get(mesh_obj_name)
 
@@ -45,7 +66,8 @@ def add_shape_key_from_vertices(
     
     assert isinstance(shape_key_names, list) or isinstance(shape_key_names, str), \
         "shape_key_names must be a str or list of str."
-    target_vertices = np.array(target_vertices)
+    # One contiguous float32 buffer, each key block is written from a flat view of it
+    target_vertices = np.ascontiguousarray(target_vertices, dtype=np.float32)
 
     # Ensure the shape of target_vertices is valid
     assert target_vertices.ndim in {2, 3}, \
@@ -87,16 +109,56 @@ def add_shape_key_from_vertices(
             f"but got {type(shape_key_names)}."
         )
 
+    num_shape_key = len(shape_key_names)
+
+    def _per_key(value, name):
+        """Broadcast a scalar (or None) option to a list with one item per shape key."""
+        if value is None or isinstance(value, (str, int, float)):
+            return [value] * num_shape_key
+        assert len(value) == num_shape_key, \
+            f"{name} must have {num_shape_key} items, but got {len(value)}."
+        return list(value)
+
+    slider_mins = _per_key(slider_min, 'slider_min')
+    slider_maxs = _per_key(slider_max, 'slider_max')
+    relative_keys = _per_key(relative_key, 'relative_key')
+    interpolations = _per_key(interpolation, 'interpolation')
+
+    shape_key_names = list(shape_key_names)
+    key_blocks = obj.data.shape_keys.key_blocks
+
     for ii, shape_key_name in enumerate(shape_key_names):
-        shape_key = obj.shape_key_add(name=shape_key_name)
-        shape_key.interpolation = 'KEY_LINEAR'
+        shape_key = obj.shape_key_add(name=shape_key_name, from_mix=False)
+        # shape_key_add() may rename the key if the name is already taken
+        shape_key_names[ii] = shape_key.name
 
-        for jj, vert in enumerate(target_vertices[ii]):
-            shape_key.data[jj].co = vert
+        shape_key.interpolation = interpolations[ii]
+
+        # Set slider_max first, Blender keeps slider_min below slider_max
+        if slider_maxs[ii] is not None:
+            shape_key.slider_max = slider_maxs[ii]
+        if slider_mins[ii] is not None:
+            shape_key.slider_min = slider_mins[ii]
+        if relative_keys[ii] is not None:
+            shape_key.relative_key = key_blocks[relative_keys[ii]]
+
+        shape_key.data.foreach_set('co', target_vertices[ii].reshape(-1))
+
+    obj.data.update()
+
+    total_seconds = time.perf_counter() - start_time
+    print(f"{num_shape_key} shape key(s) created successfully for object "
+          f"'{mesh_obj_name}' in {total_seconds:.3f} seconds.")
+
+    if return_stats:
+        stats = {
+            'num_shape_keys': num_shape_key,
+            'num_vertices': num_basis_vertices,
+            'total_seconds': total_seconds,
+            'seconds_per_key': total_seconds / max(num_shape_key, 1),
+        }
+        return shape_key_names, stats
 
-        print(f"Shape key '{shape_key_name}' created successfully for object " 
-              f"'{mesh_obj_name}'.")
-    
     return shape_key_names
 
 
@@ -165,3 +227,8 @@ if __name__ == "__main__":
 
     shape_key_names = add_shape_key_from_vertices(mesh_obj_name, target_vertices5, ["ScaleUp2", "ScaleDown2"])
     print(f'--> Created shape_key_names: {shape_key_names}')
+
+    shape_key_names, stats = add_shape_key_from_vertices(
+        mesh_obj_name, target_vertices5, ["ScaleUp3", "ScaleDown3"],
+        slider_min=-1.0, slider_max=2.0, return_stats=True)
+    print(f'--> Created shape_key_names: {shape_key_names}, stats: {stats}')
@@ -26,16 +26,21 @@ def is_valid_object(bpy_obj_name:str, type:str='MESH') -> bool:
 def add_uv_map(
     mesh_name: str, 
     uv_coords: list[list] | np.ndarray, 
-    uv_polygons: list[list] | np.ndarray, 
+    uv_polygons: list[list] | np.ndarray | tuple[np.ndarray, np.ndarray], 
     uv_name: str = "UVMap"
 ) -> None:
     """
     Adds a new UV map to a mesh object in Blender.
 
+    The per-loop UVs are gathered with `uv_coords[uv_polygons]` in NumPy and
+    written with a single `uv_layer.data.foreach_set('uv', ...)` call.
+
     Parameters:
         mesh_name (str): The name of the mesh object.
         uv_coords (list or np.ndarray): A list or numpy array of UV coordinates.
-        uv_polygons (list or np.ndarray): A list or numpy array of polygon vertex indices.
+        uv_polygons (list, np.ndarray or tuple): Indices into uv_coords for each polygon, 
+            either a list of lists / (#num_polygons, N) array (dense layout), 
+            or a compressed-sparse-row tuple (offsets, indices), as returned by get_uv_map_as_numpy().
         uv_name (str, optional): The name of the UV map. Defaults to "UVMap".
 
     Returns:
@@ -54,6 +59,58 @@ def add_uv_map(
     # Get the mesh data (this contains the UV layers, vertices, etc.)
     mesh_data = mesh.data
 
+    num_polygons = len(mesh_data.polygons)
+    num_loops = len(mesh_data.loops)
+
+    uv_coords = np.asarray(uv_coords, dtype=np.float32)
+    if uv_coords.ndim != 2 or uv_coords.shape[1] != 2:
+        raise ValueError(f"Invalid shape of uv_coords, must be (N, 2), but got {uv_coords.shape}.")
+
+    # Convert uv_polygons into CSR layout: (offsets, indices)
+    if isinstance(uv_polygons, tuple):
+        offsets, indices = uv_polygons
+        offsets = np.asarray(offsets, dtype=np.int64)
+        indices = np.asarray(indices, dtype=np.int64)
+    elif isinstance(uv_polygons, np.ndarray) and uv_polygons.ndim == 2:
+        offsets = np.arange(uv_polygons.shape[0] + 1, dtype=np.int64) * uv_polygons.shape[1]
+        indices = uv_polygons.reshape(-1).astype(np.int64)
+    else:
+        polygon_sizes = [len(polygon) for polygon in uv_polygons]
+        offsets = np.zeros(len(polygon_sizes) + 1, dtype=np.int64)
+        np.cumsum(polygon_sizes, out=offsets[1:])
+        indices = np.fromiter(
+            (idx for polygon in uv_polygons for idx in polygon), dtype=np.int64, count=offsets[-1])
+
+    # Validate shapes against the mesh up front
+    if len(offsets) != num_polygons + 1:
+        raise ValueError(f"uv_polygons has {len(offsets) - 1} polygons, but mesh '{mesh_name}' has {num_polygons}.")
+
+    if offsets[0] != 0:
+        raise ValueError(f"uv_polygons offsets must start at 0, but got {offsets[0]}.")
+
+    if len(indices) != offsets[-1]:
+        raise ValueError(f"uv_polygons offsets end at {offsets[-1]}, but got {len(indices)} indices.")
+
+    loop_starts = np.empty(num_polygons, dtype=np.int64)
+    loop_totals = np.empty(num_polygons, dtype=np.int64)
+    mesh_data.polygons.foreach_get('loop_start', loop_starts)
+    mesh_data.polygons.foreach_get('loop_total', loop_totals)
+
+    bad_polygons = np.flatnonzero(np.diff(offsets) != loop_totals)
+    if len(bad_polygons):
+        poly_idx = bad_polygons[0]
+        raise ValueError(
+            f"Polygon {poly_idx} has {loop_totals[poly_idx]} loops, "
+            f"but uv_polygons[{poly_idx}] has {offsets[poly_idx + 1] - offsets[poly_idx]} indices.")
+
+    if len(indices) and (indices.min() < 0 or indices.max() >= len(uv_coords)):
+        raise ValueError(f"uv_polygons has indices out of range [0, {len(uv_coords)}).")
+
+    # Gather UVs in loop order
+    loop_order = np.repeat(loop_starts - offsets[:-1], loop_totals) + np.arange(num_loops, dtype=np.int64)
+    loop_uvs = np.empty((num_loops, 2), dtype=np.float32)
+    loop_uvs[loop_order] = uv_coords[indices]
+
     # Create a new UV layer (UV map) if it doesn't exist
     if uv_name not in mesh_data.uv_layers:
         uv_layer = mesh_data.uv_layers.new(name=uv_name)
@@ -64,17 +121,8 @@ def add_uv_map(
     mesh_data.uv_layers.active = uv_layer
 
     # Assign UV coordinates to the UV map
-    for polygon in mesh_data.polygons:
-        for ii, loop_idx in enumerate(polygon.loop_indices):
-            # vert_idx = mesh_data.loops[loop_idx].vertex_index
-            # Get UV coordinates for this vertex
-            # uv_coord = uv_coords[uv_polygons[polygon.index][polygon.vertices.index(vert_idx)]]
-            print(f'polygon.index: {polygon.index}')
-            print(f'loop_idx: {loop_idx}')
-            # print(f'vert_idx: {vert_idx}')
-            uv_coord = uv_coords[uv_polygons[polygon.index][ii]]
-            # Assign the UV coordinate to the corresponding loop index
-            uv_layer.data[loop_idx].uv = uv_coord
+    uv_layer.data.foreach_set('uv', loop_uvs.reshape(-1))
+    mesh_data.update()
     
     print(f"UV map '{uv_name}' added to mesh '{mesh_name}'.")
 
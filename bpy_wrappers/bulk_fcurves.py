@@ -0,0 +1,352 @@
+"""Read and write fcurve keyframes in bulk with NumPy arrays.
+
+Keyframes are moved between Blender and NumPy with `keyframe_points.foreach_get` /
+`foreach_set`, instead of one `keyframe_insert()` call per key per frame.
+
+Author: zhaoyafei0210@gmail.com
+"""
+import bpy
+import numpy as np
+
+
+__all__ = [
+    'get_keyframe_enum_value',
+    'ensure_action',
+    'get_action_fcurves',
+    'get_or_create_fcurve',
+    'make_keyframes',
+    'read_keyframes',
+    'write_keyframes',
+    'merge_keyframes',
+    'set_fcurve_keyframes',
+    'replace_keyframes_in_range'
+]
+
+
+# Keyframe properties read and written in bulk: {name: (#components, dtype)}
+# Enum properties are transferred as their integer values.
+KEYFRAME_ARRAY_PROPERTIES = {
+    'co': (2, np.float32),
+    'handle_left': (2, np.float32),
+    'handle_right': (2, np.float32),
+    'interpolation': (1, np.int32),
+    'handle_left_type': (1, np.int32),
+    'handle_right_type': (1, np.int32),
+    'easing': (1, np.int32),
+    'type': (1, np.int32),
+}
+
+
+def get_keyframe_enum_value(prop_name: str, item: str) -> int:
+    """Get the integer value of an enum item of bpy.types.Keyframe,
+    e.g. get_keyframe_enum_value('interpolation', 'LINEAR').
+    """
+    return bpy.types.Keyframe.bl_rna.properties[prop_name].enum_items[item].value
+
+
+def ensure_action(id_data: bpy.types.ID, action_name: str | None = None) -> bpy.types.Action:
+    """Get the action of an ID (object, shape keys, ...), create it if there is none.
+
+    Parameters:
+        id_data: ID data-block to animate, e.g. bpy.data.objects['Armature'] or mesh_obj.data.shape_keys.
+        action_name: name of the new action, default is id_data.name + 'Action' like keyframe_insert().
+
+    Returns:
+        action: bpy.types.Action assigned to id_data.animation_data.
+    """
+    anim_data = id_data.animation_data
+    if anim_data is None:
+        anim_data = id_data.animation_data_create()
+
+    if anim_data.action is None:
+        anim_data.action = bpy.data.actions.new(name=action_name or f'{id_data.name}Action')
+
+    return anim_data.action
+
+
+def get_action_fcurves(action: bpy.types.Action, id_data: bpy.types.ID | None = None):
+    """Get the fcurve collection of an action.
+
+    Blender 5.0 removed Action.fcurves, there the fcurves of the action slot
+    assigned to id_data are used. If no slot is assigned (e.g. the action was assigned
+    without one, or is not the action of id_data), the first slot for id_data's ID type
+    is used, or a new one is created.
+    """
+    if hasattr(action, 'fcurves'):
+        return action.fcurves
+
+    from bpy_extras import anim_utils
+
+    assert id_data is not None, "id_data is required to get the fcurves of a layered action"
+
+    anim_data = id_data.animation_data
+    is_assigned = anim_data is not None and anim_data.action == action
+
+    slot = anim_data.action_slot if is_assigned else None
+    if slot is None:
+        slot = next((slot for slot in action.slots if slot.target_id_type == id_data.id_type), None)
+        if slot is None:
+            slot = action.slots.new(id_data.id_type, id_data.name)
+
+        if is_assigned:
+            anim_data.action_slot = slot
+
+    return anim_utils.action_ensure_channelbag_for_slot(action, slot).fcurves
+
+
+def get_or_create_fcurve(
+        action: bpy.types.Action,
+        data_path: str,
+        index: int = 0,
+        group_name: str | None = None,
+        id_data: bpy.types.ID | None = None
+) -> bpy.types.FCurve:
+    """Find an fcurve of an action by data path and array index, create it if it does not exist.
+
+    Parameters:
+        action: bpy.types.Action.
+        data_path: RNA path of the animated property, e.g. 'key_blocks["jawOpen"].value'.
+        index: array index of the property.
+        group_name: name of the action group of a new fcurve, e.g. the bone name.
+        id_data: animated ID, only needed for layered actions (Blender 5.0+).
+
+    Returns:
+        fcurve: bpy.types.FCurve.
+    """
+    fcurves = get_action_fcurves(action, id_data)
+
+    fcurve = fcurves.find(data_path, index=index)
+    if fcurve is None:
+        if group_name:
+            fcurve = fcurves.new(data_path, index=index, action_group=group_name)
+        else:
+            fcurve = fcurves.new(data_path, index=index)
+
+    return fcurve
+
+
+def make_keyframes(
+        frames: np.ndarray,
+        values: np.ndarray,
+        interpolation: str | None = None,
+        handle_type: str | None = None
+) -> dict:
+    """Make keyframe arrays for new keys, handles are recalculated by fcurve.update().
+
+    Parameters:
+        frames: array with shape (N,), frame numbers.
+        values: array with shape (N,), values.
+        interpolation: e.g. 'CONSTANT', 'LINEAR', 'BEZIER', default is the user preference
+            for new keyframes, like keyframe_insert().
+        handle_type: e.g. 'AUTO_CLAMPED', 'AUTO', 'VECTOR', default is the user preference for new keyframes.
+
+    Returns:
+        keyframes: dict of arrays, see KEYFRAME_ARRAY_PROPERTIES.
+    """
+    frames = np.asarray(frames, dtype=np.float32).reshape(-1)
+    values = np.asarray(values, dtype=np.float32).reshape(-1)
+    assert len(frames) == len(values), \
+        f"frames and values must have the same length, but got {len(frames)} and {len(values)}."
+
+    edit_prefs = bpy.context.preferences.edit
+    if interpolation is None:
+        interpolation = edit_prefs.keyframe_new_interpolation_type
+    if handle_type is None:
+        handle_type = edit_prefs.keyframe_new_handle_type
+
+    num_keys = len(frames)
+    co = np.stack([frames, values], axis=1)
+
+    return {
+        'co': co,
+        'handle_left': co.copy(),
+        'handle_right': co.copy(),
+        'interpolation': np.full(num_keys, get_keyframe_enum_value('interpolation', interpolation), dtype=np.int32),
+        'handle_left_type': np.full(num_keys, get_keyframe_enum_value('handle_left_type', handle_type), dtype=np.int32),
+        'handle_right_type': np.full(num_keys, get_keyframe_enum_value('handle_right_type', handle_type), dtype=np.int32),
+        'easing': np.full(num_keys, get_keyframe_enum_value('easing', 'AUTO'), dtype=np.int32),
+        'type': np.full(num_keys, get_keyframe_enum_value('type', 'KEYFRAME'), dtype=np.int32),
+    }
+
+
+def read_keyframes(fcurve: bpy.types.FCurve) -> dict:
+    """Read all keyframes of an fcurve with foreach_get.
+
+    Returns:
+        keyframes: dict of arrays, see KEYFRAME_ARRAY_PROPERTIES, e.g. keyframes['co'] has shape (N, 2).
+    """
+    keyframe_points = fcurve.keyframe_points
+    num_keys = len(keyframe_points)
+
+    keyframes = {}
+    for name, (num_components, dtype) in KEYFRAME_ARRAY_PROPERTIES.items():
+        shape = (num_keys, num_components) if num_components > 1 else (num_keys,)
+        array = np.empty(shape, dtype=dtype)
+        keyframe_points.foreach_get(name, array.reshape(-1))
+        keyframes[name] = array
+
+    return keyframes
+
+
+def write_keyframes(fcurve: bpy.types.FCurve, keyframes: dict) -> None:
+    """Replace all keyframes of an fcurve: clear, `keyframe_points.add(n)`,
+    one foreach_set per property and a single fcurve.update().
+
+    Parameters:
+        fcurve: bpy.types.FCurve.
+        keyframes: dict of arrays sorted by frame, see make_keyframes() and read_keyframes().
+    """
+    keyframe_points = fcurve.keyframe_points
+
+    if hasattr(keyframe_points, 'clear'):
+        keyframe_points.clear()
+    else:
+        while len(keyframe_points):
+            keyframe_points.remove(keyframe_points[-1], fast=True)
+
+    num_keys = len(keyframes['co'])
+    keyframe_points.add(num_keys)
+
+    for name, (_, dtype) in KEYFRAME_ARRAY_PROPERTIES.items():
+        if name in keyframes:
+            keyframe_points.foreach_set(name, np.ascontiguousarray(keyframes[name], dtype=dtype).reshape(-1))
+
+    fcurve.update()
+
+
+def merge_keyframes(existing: dict, new: dict, frame_tolerance: float = 1e-3) -> dict:
+    """Merge new keyframes into existing ones, existing keys at the frames of new keys are replaced.
+
+    Parameters:
+        existing: dict of keyframe arrays, see read_keyframes().
+        new: dict of keyframe arrays, see make_keyframes().
+        frame_tolerance: keys closer than this (in frames) are considered to be at the same frame.
+
+    Returns:
+        keyframes: dict of keyframe arrays sorted by frame.
+    """
+    if len(existing['co']) == 0:
+        return new
+    if len(new['co']) == 0:
+        return existing
+
+    existing_frames = existing['co'][:, 0]
+    new_frames = np.sort(new['co'][:, 0])
+
+    # Distance from each existing key to the closest new key
+    pos = np.searchsorted(new_frames, existing_frames)
+    left = new_frames[np.clip(pos - 1, 0, len(new_frames) - 1)]
+    right = new_frames[np.clip(pos, 0, len(new_frames) - 1)]
+    closest = np.minimum(np.abs(existing_frames - left), np.abs(existing_frames - right))
+    keep = closest > frame_tolerance
+
+    merged = {name: np.concatenate([existing[name][keep], new[name]]) for name in new}
+    order = np.argsort(merged['co'][:, 0], kind='stable')
+
+    return {name: array[order] for name, array in merged.items()}
+
+
+def set_fcurve_keyframes(
+        fcurve: bpy.types.FCurve,
+        frames: np.ndarray,
+        values: np.ndarray,
+        interpolation: str | None = None,
+        handle_type: str | None = None,
+        replace: bool = False
+) -> None:
+    """Keyframe an fcurve with arrays of frames and values in bulk.
+
+    Parameters:
+        fcurve: bpy.types.FCurve.
+        frames: array with shape (N,), frame numbers.
+        values: array with shape (N,), values.
+        interpolation: interpolation of the new keys, see make_keyframes().
+        handle_type: handle type of the new keys, see make_keyframes().
+        replace: if True, all existing keys are removed, otherwise new keys are merged into
+            the existing ones and replace existing keys at the same frames, like keyframe_insert().
+    """
+    keyframes = make_keyframes(frames, values, interpolation, handle_type)
+
+    if not replace and len(fcurve.keyframe_points):
+        keyframes = merge_keyframes(read_keyframes(fcurve), keyframes)
+    else:
+        order = np.argsort(keyframes['co'][:, 0], kind='stable')
+        keyframes = {name: array[order] for name, array in keyframes.items()}
+
+    write_keyframes(fcurve, keyframes)
+
+
+def replace_keyframes_in_range(
+        fcurve: bpy.types.FCurve,
+        frame_start: float,
+        frame_end: float,
+        keyframes: dict | None = None
+) -> int:
+    """Replace the keys of an fcurve within the frame window [frame_start, frame_end].
+
+    The existing frames are read with one foreach_get, the window is found with
+    np.searchsorted on the (sorted) frames, and the curve is rebuilt once from
+    keys before the window + new keys + keys after the window.
+
+    Parameters:
+        fcurve: bpy.types.FCurve.
+        frame_start: first frame of the window (inclusive).
+        frame_end: last frame of the window (inclusive).
+        keyframes: dict of new keyframe arrays within the window, see make_keyframes(),
+            if None, the keys in the window are only removed.
+
+    Returns:
+        num_removed: number of existing keys removed from the window.
+    """
+    existing = read_keyframes(fcurve)
+    existing_frames = existing['co'][:, 0]
+
+    # Small tolerance so that keys exactly on the window borders are included
+    eps = 1e-3
+    lo = np.searchsorted(existing_frames, frame_start - eps, side='left')
+    hi = np.searchsorted(existing_frames, frame_end + eps, side='right')
+
+    if keyframes is None:
+        keyframes = {name: array[:0] for name, array in existing.items()}
+    else:
+        new_frames = keyframes['co'][:, 0]
+        if len(new_frames) and (new_frames.min() < frame_start - eps or new_frames.max() > frame_end + eps):
+            raise ValueError(
+                f"New keys [{new_frames.min()}, {new_frames.max()}] are out of the window [{frame_start}, {frame_end}].")
+        order = np.argsort(new_frames, kind='stable')
+        keyframes = {name: np.asarray(array)[order] for name, array in keyframes.items()}
+
+    if hi == lo and len(keyframes['co']) == 0:
+        return 0
+
+    spliced = {
+        name: np.concatenate([existing[name][:lo], keyframes[name], existing[name][hi:]])
+        for name in existing if name in keyframes
+    }
+    write_keyframes(fcurve, spliced)
+
+    return int(hi - lo)
+
+
+if __name__ == "__main__":
+    mesh_name = 'Cube'
+    key_name = 'Stretch'
+
+    shape_keys = bpy.data.objects[mesh_name].data.shape_keys
+    action = ensure_action(shape_keys)
+
+    data_path = shape_keys.key_blocks[key_name].path_from_id('value')
+    fcurve = get_or_create_fcurve(action, data_path, id_data=shape_keys)
+
+    frames = np.arange(1, 73)
+    values = 0.5 - 0.5 * np.cos(frames / 72 * 2 * np.pi)
+    set_fcurve_keyframes(fcurve, frames, values)
+
+    keyframes = read_keyframes(fcurve)
+    print(f"---> {data_path}: {len(keyframes['co'])} keys")
+
+    # Patch frames [25, 48] only
+    patch_frames = np.arange(25, 49)
+    num_removed = replace_keyframes_in_range(
+        fcurve, 25, 48, make_keyframes(patch_frames, np.ones(len(patch_frames)), 'LINEAR'))
+    print(f"---> replaced {num_removed} keys")
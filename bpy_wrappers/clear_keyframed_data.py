@@ -6,7 +6,15 @@ Author: zhaoyafei0210@gmail.com
 """
 import bpy
 
-__all__ = ['clear_keyframed_animation_data', 'clear_keyframed_shape_key_data']
+from bpy_wrappers.bulk_fcurves import get_action_fcurves, replace_keyframes_in_range
+
+__all__ = [
+    'clear_keyframed_animation_data',
+    'clear_keyframed_shape_key_data',
+    'clear_keyframes_in_range',
+    'clear_shape_key_keyframes_in_range',
+    'clear_pose_bone_keyframes_in_range'
+]
 
 def clear_keyframed_animation_data(bpy_obj_name):
     """Clear keyframed (pose) animation data
@@ -24,6 +32,115 @@ def clear_keyframed_shape_key_data(bpy_obj_name):
         bpy_obj.data.shape_keys.animation_data_clear()
 
 
+def clear_keyframes_in_range(
+        id_data: bpy.types.ID,
+        frame_start: float,
+        frame_end: float,
+        data_path_prefixes: list[str] | None = None
+) -> int:
+    """Clear the keys within [frame_start, frame_end] of the fcurves of an ID's action.
+
+    Each affected fcurve is rebuilt once from the keys outside the range (see
+    bulk_fcurves.replace_keyframes_in_range()), fcurves left without keys are removed.
+
+    Parameters:
+        id_data: animated ID, e.g. mesh_obj.data.shape_keys or an armature object.
+        frame_start: first frame of the range (inclusive).
+        frame_end: last frame of the range (inclusive).
+        data_path_prefixes: only clear fcurves whose data path starts with one of these,
+            e.g. ['key_blocks["jawOpen"]'], default is all fcurves.
+
+    Returns:
+        num_removed: number of removed keys.
+    """
+    if id_data is None or id_data.animation_data is None or id_data.animation_data.action is None:
+        return 0
+
+    fcurves = get_action_fcurves(id_data.animation_data.action, id_data)
+
+    if data_path_prefixes is not None:
+        data_path_prefixes = tuple(data_path_prefixes)
+        affected = [fcurve for fcurve in fcurves if fcurve.data_path.startswith(data_path_prefixes)]
+    else:
+        affected = list(fcurves)
+
+    num_removed = 0
+    for fcurve in affected:
+        num_removed += replace_keyframes_in_range(fcurve, frame_start, frame_end)
+
+        if len(fcurve.keyframe_points) == 0:
+            fcurves.remove(fcurve)
+
+    return num_removed
+
+
+def clear_shape_key_keyframes_in_range(
+        bpy_obj_name: str,
+        frame_start: float,
+        frame_end: float,
+        shape_key_names: list[str] | None = None
+) -> int:
+    """Clear keyframed shape_key (blendshapes) data within [frame_start, frame_end]
+
+    Parameters:
+        bpy_obj_name: name of the mesh object.
+        frame_start, frame_end: frame range (inclusive).
+        shape_key_names: only clear these shape keys, default is all shape keys.
+
+    Returns:
+        num_removed: number of removed keys.
+    """
+    if not (bpy_obj_name and bpy_obj_name in bpy.data.objects.keys()):
+        return 0
+
+    shape_keys = bpy.data.objects[bpy_obj_name].data.shape_keys
+    if shape_keys is None:
+        return 0
+
+    prefixes = None
+    if shape_key_names is not None:
+        key_blocks = shape_keys.key_blocks
+        prefixes = [key_blocks[name].path_from_id() for name in shape_key_names if name in key_blocks]
+
+    num_removed = clear_keyframes_in_range(shape_keys, frame_start, frame_end, prefixes)
+    print(f"---> Cleared {num_removed} shape key keys of '{bpy_obj_name}' in [{frame_start}, {frame_end}]")
+
+    return num_removed
+
+
+def clear_pose_bone_keyframes_in_range(
+        bpy_obj_name: str,
+        frame_start: float,
+        frame_end: float,
+        bone_names: list[str] | None = None
+) -> int:
+    """Clear keyframed pose bone data within [frame_start, frame_end]
+
+    Parameters:
+        bpy_obj_name: name of the armature object.
+        frame_start, frame_end: frame range (inclusive).
+        bone_names: only clear these pose bones, default is all animated pose bones.
+
+    Returns:
+        num_removed: number of removed keys.
+    """
+    if not (bpy_obj_name and bpy_obj_name in bpy.data.objects.keys()):
+        return 0
+
+    bpy_obj = bpy.data.objects[bpy_obj_name]
+
+    if bone_names is None:
+        prefixes = ['pose.bones[']
+    else:
+        pose_bones = bpy_obj.pose.bones
+        prefixes = [pose_bones[name].path_from_id() for name in bone_names if name in pose_bones]
+
+    num_removed = clear_keyframes_in_range(bpy_obj, frame_start, frame_end, prefixes)
+    print(f"---> Cleared {num_removed} pose bone keys of '{bpy_obj_name}' in [{frame_start}, {frame_end}]")
+
+    return num_removed
+
+
 if __name__ == "__main__":
     head_mesh_obj_name = 'Wolf3D_Head'
     teeth_mesh_obj_name = 'Wolf3D_Teeth'
@@ -31,4 +148,8 @@ if __name__ == "__main__":
 
     clear_keyframed_shape_key_data(head_mesh_obj_name)
     clear_keyframed_shape_key_data(teeth_mesh_obj_name)
-    clear_keyframed_animation_data(armature_obj_name)
\ No newline at end of file
+    clear_keyframed_animation_data(armature_obj_name)
+
+    # Clear frames [100, 200] of some channels only
+    # clear_shape_key_keyframes_in_range(head_mesh_obj_name, 100, 200, ['jawOpen', 'mouthClose'])
+    # clear_pose_bone_keyframes_in_range(armature_obj_name, 100, 200, ['Head'])
\ No newline at end of file
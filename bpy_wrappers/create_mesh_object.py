@@ -10,29 +10,107 @@ __all__ = ['create_mesh_object']
 def create_mesh_object(
         vertices: list | np.ndarray,
         edges: list | np.ndarray,
-        faces: list | np.ndarray, 
-        mesh_name: str = "NewMesh"
+        faces: list | np.ndarray | tuple[np.ndarray, np.ndarray],
+        mesh_name: str = "NewMesh",
+        uv_coords: np.ndarray | None = None,
+        uv_name: str = "UVMap",
+        normals: np.ndarray | None = None
     ) -> str:
     """Create a mesh object from input vertices, edges and faces.
-    
+
+    The mesh is allocated with `vertices.add`, `loops.add` and `polygons.add` and
+    filled with `foreach_set` straight from NumPy arrays, instead of `mesh.from_pydata`
+    which converts the inputs back to Python sequences.
+
     Parameters:
         vertices: list of vertices or numpy.ndarray, each vertex is a tuple of (x, y, z)
-        edges: list of edges or numpy.ndarray, each edge is a tuple of (v1, v2)
-        faces: list of faces or numpy.ndarray, each triangle is a tuple of (v1, v2, v3)
+        edges: list of edges or numpy.ndarray, each edge is a tuple of (v1, v2).
+            Edges of the faces are created automatically, only loose edges are needed.
+        faces: list of faces or numpy.ndarray, each triangle is a tuple of (v1, v2, v3),
+            or a compressed-sparse-row tuple (offsets, indices) for faces with different numbers of vertices
         mesh_name: name of the mesh object
+        uv_coords: optional per-loop UV coordinates, an array with shape (#num_loops, 2) in face order
+        uv_name: name of the UV map created from uv_coords
+        normals: optional custom normals, an array with shape (#num_loops, 3) (per face corner)
+            or (#num_vertices, 3) (per vertex)
 
     Returns:
         mesh_obj_name: name of the mesh object
     """
+    vertices = np.ascontiguousarray(vertices, dtype=np.float32).reshape(-1, 3)
+    num_vertices = len(vertices)
+
+    # Convert faces into CSR layout: (offsets, indices)
+    if isinstance(faces, tuple):
+        offsets, indices = faces
+        offsets = np.asarray(offsets, dtype=np.int32)
+        indices = np.ascontiguousarray(indices, dtype=np.int32)
+    elif isinstance(faces, np.ndarray) and faces.ndim == 2:
+        offsets = np.arange(faces.shape[0] + 1, dtype=np.int32) * faces.shape[1]
+        indices = np.ascontiguousarray(faces, dtype=np.int32).reshape(-1)
+    else:
+        face_sizes = [len(face) for face in faces]
+        offsets = np.zeros(len(face_sizes) + 1, dtype=np.int32)
+        np.cumsum(face_sizes, out=offsets[1:])
+        indices = np.fromiter((idx for face in faces for idx in face), dtype=np.int32, count=offsets[-1])
+
+    num_faces = len(offsets) - 1
+    num_loops = len(indices)
+
+    assert offsets[-1] == num_loops, f"Invalid faces, offsets[-1] ({offsets[-1]}) != len(indices) ({num_loops})"
+    if num_loops:
+        assert indices.min() >= 0 and indices.max() < num_vertices, \
+            f"Invalid faces, vertex indices must be in [0, {num_vertices})"
+
+    edges = np.ascontiguousarray(edges, dtype=np.int32).reshape(-1, 2)
+
     # Create a new Mesh object
     mesh = bpy.data.meshes.new(mesh_name)
-    
+
     # mesh_name = mesh.name
-    
+
     # Create the basic structure of the Mesh (vertices and polygons)
-    mesh.from_pydata(vertices, edges, faces)
-    
-    # Update the Mesh to make its structure valid
+    mesh.vertices.add(num_vertices)
+    mesh.vertices.foreach_set('co', vertices.reshape(-1))
+
+    if len(edges):
+        mesh.edges.add(len(edges))
+        mesh.edges.foreach_set('vertices', edges.reshape(-1))
+
+    mesh.loops.add(num_loops)
+    mesh.loops.foreach_set('vertex_index', indices)
+
+    mesh.polygons.add(num_faces)
+    mesh.polygons.foreach_set('loop_start', offsets[:-1])
+    if bpy.app.version < (4, 0, 0):
+        # loop_total is read-only (derived from loop_start) since Blender 4.0
+        mesh.polygons.foreach_set('loop_total', np.diff(offsets))
+
+    # Update the Mesh to make its structure valid, edges of the faces are created here
+    mesh.update(calc_edges=True)
+
+    if uv_coords is not None:
+        uv_coords = np.ascontiguousarray(uv_coords, dtype=np.float32)
+        assert uv_coords.shape == (num_loops, 2), \
+            f"Invalid shape of uv_coords, must be ({num_loops}, 2), but got {uv_coords.shape}."
+        uv_layer = mesh.uv_layers.new(name=uv_name)
+        uv_layer.data.foreach_set('uv', uv_coords.reshape(-1))
+
+    if normals is not None:
+        normals = np.ascontiguousarray(normals, dtype=np.float32)
+        assert normals.shape in ((num_loops, 3), (num_vertices, 3)), \
+            f"Invalid shape of normals, must be ({num_loops}, 3) or ({num_vertices}, 3), but got {normals.shape}."
+
+        # Custom normals are only used on smooth shaded faces
+        mesh.polygons.foreach_set('use_smooth', np.ones(num_faces, dtype=bool))
+        if bpy.app.version < (4, 1, 0):
+            mesh.use_auto_smooth = True
+
+        if normals.shape == (num_loops, 3):
+            mesh.normals_split_custom_set(normals)
+        else:
+            mesh.normals_split_custom_set_from_vertices(normals)
+
     mesh.update()
 
     # Create a new object and assign the Mesh to it
@@ -68,3 +146,14 @@ if __name__ == "__main__":
     # Call the function to create the Mesh object
     obj_name = create_mesh_object(vertices2, [],faces2, 'MySquare2')
     print(f'Created mesh object: {obj_name}')
+
+    # A quad and a triangle in CSR layout, with per-loop UVs and per-vertex normals
+    vertices3 = np.array([(1, 1, 0), (1, -1, 0), (-1, -1, 0), (-1, 1, 0), (0, 2, 0)]) + np.array([0, 0, 2])
+    offsets3 = np.array([0, 4, 7])
+    indices3 = np.array([0, 1, 2, 3, 0, 3, 4])
+    uv_coords3 = (vertices3[indices3, :2] + 2) / 4
+    normals3 = np.tile([0.0, 0.0, 1.0], (len(vertices3), 1))
+
+    obj_name = create_mesh_object(
+        vertices3, [], (offsets3, indices3), 'MyQuadAndTriangle', uv_coords=uv_coords3, normals=normals3)
+    print(f'Created mesh object: {obj_name}')
@@ -0,0 +1,174 @@
+"""Share the shape-key action of one mesh with other meshes, remapping the shape key names per mesh.
+
+Meshes whose shape keys match the names of the source mesh share the source action.
+For each other naming scheme (e.g. 'JawOpen' or 'jaw_open' instead of 'jawOpen'),
+one copy of the action is made with the data paths rewritten, and shared by all meshes
+with the same mapping.
+
+Author: zhaoyafei0210@gmail.com
+"""
+import re
+
+import bpy
+import numpy as np
+
+from bpy_wrappers.action_snapshot_cache import get_action_snapshot, restore_action_snapshot
+from bpy_wrappers.bulk_fcurves import KEYFRAME_ARRAY_PROPERTIES
+
+
+__all__ = ['normalize_shape_key_name', 'get_shape_key_name_mapping', 'fan_out_shape_key_action']
+
+
+def normalize_shape_key_name(name: str) -> str:
+    """Lower-case name without non-alphanumeric characters, e.g. 'Jaw_Open' -> 'jawopen'."""
+    return re.sub(r'[^0-9a-z]', '', name.lower())
+
+
+def get_shape_key_name_mapping(
+        source_names: list[str],
+        target_names: list[str],
+        name_map: dict[str, str] | None = None
+) -> dict[str, str]:
+    """Map source shape key names to target shape key names.
+
+    A source name is mapped by name_map first, then to the target with the same name,
+    then to the target with the same normalized name (see normalize_shape_key_name()).
+
+    Returns:
+        mapping: {source_name: target_name}, unmatched source names are left out.
+    """
+    target_set = set(target_names)
+    normalized_targets = {}
+    for name in target_names:
+        normalized_targets.setdefault(normalize_shape_key_name(name), name)
+
+    mapping = {}
+    for name in source_names:
+        if name_map and name_map.get(name) in target_set:
+            mapping[name] = name_map[name]
+        elif name in target_set:
+            mapping[name] = name
+        elif normalize_shape_key_name(name) in normalized_targets:
+            mapping[name] = normalized_targets[normalize_shape_key_name(name)]
+
+    return mapping
+
+
+def __select_snapshot_fcurves(snapshot: dict, fcurve_mask: np.ndarray) -> dict:
+    """Select fcurves of an action snapshot (see action_snapshot_cache.get_action_snapshot()) by a boolean mask."""
+    num_keys = np.diff(snapshot['key_offsets'])
+    key_mask = np.repeat(fcurve_mask, num_keys)
+
+    selected = {name: snapshot[name][key_mask] for name in KEYFRAME_ARRAY_PROPERTIES}
+    selected['action_name'] = snapshot['action_name']
+    selected['data_paths'] = snapshot['data_paths'][fcurve_mask]
+    selected['array_indices'] = snapshot['array_indices'][fcurve_mask]
+    selected['group_names'] = snapshot['group_names'][fcurve_mask]
+    selected['frame_range'] = snapshot['frame_range']
+    selected['key_offsets'] = np.concatenate([[0], np.cumsum(num_keys[fcurve_mask])]).astype(np.int64)
+
+    return selected
+
+
+def fan_out_shape_key_action(
+        source_obj_name: str,
+        target_obj_names: list[str],
+        name_map: dict[str, str] | None = None,
+        action_cache: dict | None = None
+) -> dict[str, bpy.types.Action]:
+    """Assign the shape-key action of a source mesh to target meshes, remapped to their shape key names.
+
+    The actions a previous call assigned to the targets are unassigned first, and removed if they have no other users,
+    so that keying a take again replaces the remapped copies instead of leaving orphans.
+
+    Parameters:
+        source_obj_name: name of the keyframed mesh object.
+        target_obj_names: names of the mesh objects to animate.
+        name_map: optional {source_name: target_name} for names that do not match by normalization.
+        action_cache: optional dict {signature: action} reused across calls for the same source action,
+            the signature is the tuple of (source_name, target_name) pairs of a mesh.
+
+    Returns:
+        actions: {target_obj_name: action} of the targets with shape keys.
+    """
+    source_shape_keys = bpy.data.objects[source_obj_name].data.shape_keys
+    source_action = source_shape_keys.animation_data.action
+
+    snapshot = get_action_snapshot(source_shape_keys)
+    data_paths = snapshot['data_paths']
+
+    # Source shape key name of each fcurve, '' for fcurves not animating a shape key value
+    source_names = [
+        match.group(1) if match else ''
+        for match in (re.fullmatch(r'key_blocks\["(.+)"\]\.value', str(data_path)) for data_path in data_paths)
+    ]
+
+    if action_cache is None:
+        action_cache = {}
+
+    # Free the remapped copies of a previous call, and their names
+    kept_actions = {source_action, *action_cache.values()}
+    stale_actions = set()
+    for obj_name in target_obj_names:
+        shape_keys = bpy.data.objects[obj_name].data.shape_keys
+        anim_data = shape_keys.animation_data if shape_keys is not None else None
+        if anim_data and anim_data.action is not None and anim_data.action not in kept_actions:
+            stale_actions.add(anim_data.action)
+            anim_data.action = None
+
+    for action in stale_actions:
+        if action.users == 0:
+            print(f"---> Remove previous action '{action.name}'")
+            bpy.data.actions.remove(action)
+
+    actions = {}
+    for obj_name in target_obj_names:
+        shape_keys = bpy.data.objects[obj_name].data.shape_keys
+        if shape_keys is None:
+            print(f"==> Skip MESH object without shape keys: {obj_name}")
+            continue
+
+        mapping = get_shape_key_name_mapping(
+            [name for name in source_names if name], shape_keys.key_blocks.keys(), name_map)
+
+        if all(source == target for source, target in mapping.items()):
+            # Same naming scheme as the source mesh
+            action = source_action
+        else:
+            signature = tuple(sorted(mapping.items()))
+            action = action_cache.get(signature)
+
+            if action is None:
+                # Rewrite the data paths of all mapped fcurves at once
+                fcurve_mask = np.array([name in mapping for name in source_names], dtype=bool)
+                remapped_paths = np.array(
+                    [f'key_blocks["{mapping[name]}"].value' for name in source_names if name in mapping], dtype=str)
+
+                remapped = __select_snapshot_fcurves(snapshot, fcurve_mask)
+                remapped['data_paths'] = remapped_paths
+
+                action = restore_action_snapshot(
+                    shape_keys, remapped, f'{source_action.name}_{len(action_cache) + 1:02d}')
+                action_cache[signature] = action
+
+                print(f"---> New action '{action.name}' for the shape key names of '{obj_name}'")
+
+        anim_data = shape_keys.animation_data
+        if not anim_data:
+            anim_data = shape_keys.animation_data_create()
+
+        anim_data.action = action
+        actions[obj_name] = action
+
+    print(f'---> {len(actions)} meshes share {len(set(actions.values()))} actions')
+
+    return actions
+
+
+if __name__ == "__main__":
+    source_obj_name = 'head'
+    target_obj_names = ['lowerteeth', 'upperteeth', 'tongue', 'brows', 'eyelashes']
+
+    actions = fan_out_shape_key_action(source_obj_name, target_obj_names)
+    for obj_name, action in actions.items():
+        print(f'{obj_name}: {action.name}')
@@ -8,23 +8,38 @@ import numpy as np
 
 __all__ = ['get_face_vertex_indices_as_numpy']
 
-def get_face_vertex_indices_as_numpy(mesh_name, expected_num_edges=None):
+def get_face_vertex_indices_as_numpy(
+        mesh_name: str,
+        expected_num_edges: int | None = None,
+        layout: str = 'auto'
+    ) -> np.ndarray | tuple[np.ndarray, np.ndarray]:
     """
     Export face vertex indices of a mesh object to a NumPy array.
 
+    Polygon sizes and loop vertex indices are read in bulk with `foreach_get`,
+    so meshes mixing tris, quads and n-gons are supported without Python loops.
+
     Parameters:
         mesh_name: str, the name of the mesh object.
         expected_num_edges: int or None, the expected number of edges for each face. If None, no check is performed.
+        layout: str, one of 'auto', 'dense' or 'csr'.
+            'dense': return a 2D array, all faces must have the same number of vertices.
+            'csr': return a compressed-sparse-row tuple (offsets, indices).
+            'auto': 'dense' if all faces have the same number of vertices, otherwise 'csr'.
 
     Returns:
-        face_vertex_indices_array: np.ndarray, a 2D array where each row represents the vertex indices of a face.
+        face_vertex_indices_array: np.ndarray, a 2D array where each row represents the vertex indices of a face (dense layout).
+        or (offsets, indices): tuple of np.ndarray (csr layout), where offsets has shape (#num_faces + 1,)
+            and the vertex indices of face i are indices[offsets[i]:offsets[i+1]].
     """
+    assert layout in ('auto', 'dense', 'csr'), f"Invalid layout: {layout}, must be 'auto', 'dense' or 'csr'."
+
     # Get the mesh object by name
     obj = bpy.data.objects.get(mesh_name)
-    
+
     # Check if the mesh object exists
     assert obj is not None, f"No mesh found with the name: {mesh_name}"
-    
+
     # Ensure the object is of type 'MESH'
     assert obj.type == 'MESH', f"Object {mesh_name} is not a mesh"
 
@@ -35,19 +50,49 @@ def get_face_vertex_indices_as_numpy(mesh_name, expected_num_edges=None):
     bpy.context.view_layer.objects.active = obj
     bpy.ops.object.mode_set(mode='OBJECT')
 
-    # Create an empty list to store face vertex indices
-    face_vertex_indices = []
+    num_polygons = len(mesh.polygons)
+    num_loops = len(mesh.loops)
+
+    loop_starts = np.empty(num_polygons, dtype=np.int32)
+    loop_totals = np.empty(num_polygons, dtype=np.int32)
+    mesh.polygons.foreach_get('loop_start', loop_starts)
+    mesh.polygons.foreach_get('loop_total', loop_totals)
+
+    loop_vertex_indices = np.empty(num_loops, dtype=np.int32)
+    mesh.loops.foreach_get('vertex_index', loop_vertex_indices)
+
+    # Check for consistent edge numbers (optional)
+    if expected_num_edges:
+        bad_faces = np.flatnonzero(loop_totals != expected_num_edges)
+        if len(bad_faces):
+            face_idx = bad_faces[0]
+            raise ValueError(f"Face with index {face_idx} does not have {expected_num_edges} edges. It has {loop_totals[face_idx]} edges.")
+
+    offsets = np.zeros(num_polygons + 1, dtype=np.int32)
+    np.cumsum(loop_totals, out=offsets[1:])
+
+    # Polygons normally own consecutive runs of loops in polygon order,
+    # otherwise gather the loops of each polygon into polygon order
+    if np.array_equal(loop_starts, offsets[:-1]):
+        indices = loop_vertex_indices
+    else:
+        loop_order = np.repeat(loop_starts - offsets[:-1], loop_totals) + np.arange(offsets[-1], dtype=np.int32)
+        indices = loop_vertex_indices[loop_order]
+
+    is_uniform = num_polygons > 0 and np.all(loop_totals == loop_totals[0])
+
+    if layout == 'dense' or (layout == 'auto' and is_uniform):
+        if num_polygons == 0:
+            return np.empty((0, 0), dtype=np.int32)
+        if not is_uniform:
+            raise ValueError(f"Mesh '{mesh_name}' has faces with different numbers of vertices, use layout='csr'.")
 
-    # Loop through each face in the mesh and check for consistent edge numbers (optional)
-    for face in mesh.polygons:
-        if expected_num_edges and len(face.vertices) != expected_num_edges:
-            raise ValueError(f"Face with index {face.index} does not have {expected_num_edges} edges. It has {len(face.vertices)} edges.")
-        face_vertex_indices.append(face.vertices[:])
+        # Dense fast path: a reshape view, no copy
+        face_vertex_indices_array = indices.reshape(num_polygons, loop_totals[0])
 
-    # Convert to NumPy array
-    face_vertex_indices_array = np.array(face_vertex_indices)
+        return face_vertex_indices_array
 
-    return face_vertex_indices_array
+    return offsets, indices
 
 if __name__ == "__main__":
     mesh_name = "Cube"  # Replace with the name of your mesh object
@@ -55,3 +100,6 @@ if __name__ == "__main__":
     vertex_indices_array = get_face_vertex_indices_as_numpy(mesh_name, expected_num_edges)
     print(vertex_indices_array)
 
+    offsets, indices = get_face_vertex_indices_as_numpy(mesh_name, layout='csr')
+    print(f'---> offsets: {offsets}')
+    print(f'---> indices: {indices}')
@@ -0,0 +1,172 @@
+"""Sample the shape-key and pose-bone fcurves of an object into a dense NumPy array.
+
+The keys of each fcurve are read with `keyframe_points.foreach_get`, segments with 'LINEAR'
+or 'CONSTANT' interpolation are evaluated with NumPy, only frames in other segments
+(e.g. 'BEZIER') are evaluated with `fcurve.evaluate()`. Neither the current frame
+nor the depsgraph is touched.
+
+Author: zhaoyafei0210@gmail.com
+"""
+import re
+
+import bpy
+import numpy as np
+
+from bpy_wrappers.bulk_fcurves import get_action_fcurves, get_keyframe_enum_value
+
+
+__all__ = ['sample_fcurve', 'get_fcurves_as_numpy']
+
+
+def sample_fcurve(fcurve: bpy.types.FCurve, frames: np.ndarray) -> np.ndarray:
+    """Sample an fcurve at the given frames.
+
+    Parameters:
+        fcurve: bpy.types.FCurve.
+        frames: array with shape (T,), frame numbers, may be fractional.
+
+    Returns:
+        values: float32 array with shape (T,).
+    """
+    frames = np.asarray(frames, dtype=np.float64).reshape(-1)
+    keyframe_points = fcurve.keyframe_points
+    num_keys = len(keyframe_points)
+
+    # Modifiers (noise, cycles, ...) can only be evaluated by Blender
+    if num_keys == 0 or len(fcurve.modifiers):
+        return np.array([fcurve.evaluate(frame) for frame in frames], dtype=np.float32)
+
+    co = np.empty(num_keys * 2, dtype=np.float32)
+    keyframe_points.foreach_get('co', co)
+    key_frames = co[0::2].astype(np.float64)
+    key_values = co[1::2]
+
+    interpolation = np.empty(num_keys, dtype=np.int32)
+    keyframe_points.foreach_get('interpolation', interpolation)
+
+    # Index of the key starting the segment of each frame, -1 before the first key
+    seg = np.searchsorted(key_frames, frames, side='right') - 1
+    before = seg < 0
+    after = seg >= num_keys - 1
+    inside = ~(before | after)
+
+    values = np.empty(len(frames), dtype=np.float32)
+    values[before] = key_values[0]
+    values[after] = key_values[-1]
+
+    seg = seg[inside]
+    span = key_frames[seg + 1] - key_frames[seg]
+    t = np.divide(frames[inside] - key_frames[seg], span, out=np.zeros_like(span), where=span > 0)
+
+    seg_interpolation = interpolation[seg]
+    is_constant = seg_interpolation == get_keyframe_enum_value('interpolation', 'CONSTANT')
+    is_linear = seg_interpolation == get_keyframe_enum_value('interpolation', 'LINEAR')
+
+    values[inside] = np.where(
+        is_constant, key_values[seg], key_values[seg] + t * (key_values[seg + 1] - key_values[seg]))
+
+    needs_evaluate = np.zeros(len(frames), dtype=bool)
+    needs_evaluate[inside] = ~(is_constant | is_linear)
+    if fcurve.extrapolation != 'CONSTANT':
+        needs_evaluate |= before | after
+
+    if needs_evaluate.any():
+        values[needs_evaluate] = [fcurve.evaluate(frame) for frame in frames[needs_evaluate]]
+
+    return values
+
+
+def __get_channel_name(data_path: str, array_index: int) -> str:
+    """'key_blocks["jawOpen"].value' -> 'jawOpen',
+    'pose.bones["Head"].rotation_quaternion', 1 -> 'Head.rotation_quaternion[1]'.
+    """
+    match = re.fullmatch(r'key_blocks\["(.+)"\]\.value', data_path)
+    if match:
+        return match.group(1)
+
+    match = re.fullmatch(r'pose\.bones\["(.+)"\]\.(\w+)', data_path)
+    if match:
+        return f'{match.group(1)}.{match.group(2)}[{array_index}]'
+
+    return f'{data_path}[{array_index}]'
+
+
+def get_fcurves_as_numpy(
+        obj_name: str,
+        frame_start: int | None = None,
+        frame_end: int | None = None,
+        frame_step: float = 1
+) -> dict | None:
+    """Sample all shape-key fcurves (mesh) or pose-bone fcurves (armature) of an object over a frame range.
+
+    Only the active action is sampled, NLA strips are not evaluated.
+
+    Parameters:
+        obj_name: Name of a mesh or armature object.
+        frame_start: first frame, default is the scene's frame_start.
+        frame_end: last frame (inclusive), default is the scene's frame_end.
+        frame_step: step between sampled frames.
+
+    Returns:
+        dict: A dictionary containing:
+            - 'frames': float32 array with shape (T,)
+            - 'values': float32 array with shape (T, C), one column per fcurve
+            - 'channel_names': list of C names, shape key names or 'bone.property[index]'
+            - 'data_paths': list of C fcurve data paths
+            - 'array_indices': list of C fcurve array indices
+        or None if the object has no animated shape keys or pose bones.
+    """
+    obj = bpy.data.objects.get(obj_name)
+    assert obj is not None, f"Object '{obj_name}' not found."
+
+    if obj.type == 'MESH':
+        id_data = obj.data.shape_keys
+        path_prefix = 'key_blocks['
+    elif obj.type == 'ARMATURE':
+        id_data = obj
+        path_prefix = 'pose.bones['
+    else:
+        raise ValueError(f"Object '{obj_name}' must be a mesh or an armature, but got '{obj.type}'.")
+
+    if id_data is None or id_data.animation_data is None or id_data.animation_data.action is None:
+        print(f"Object '{obj_name}' has no animated shape keys or pose bones.")
+        return None
+
+    fcurves = [
+        fcurve for fcurve in get_action_fcurves(id_data.animation_data.action, id_data)
+        if fcurve.data_path.startswith(path_prefix)
+    ]
+
+    scene = bpy.context.scene
+    if frame_start is None:
+        frame_start = scene.frame_start
+    if frame_end is None:
+        frame_end = scene.frame_end
+
+    frames = np.arange(frame_start, frame_end + frame_step * 0.5, frame_step, dtype=np.float64)
+
+    values = np.empty((len(frames), len(fcurves)), dtype=np.float32)
+    for ii, fcurve in enumerate(fcurves):
+        values[:, ii] = sample_fcurve(fcurve, frames)
+
+    return {
+        'frames': frames.astype(np.float32),
+        'values': values,
+        'channel_names': [__get_channel_name(fcurve.data_path, fcurve.array_index) for fcurve in fcurves],
+        'data_paths': [fcurve.data_path for fcurve in fcurves],
+        'array_indices': [fcurve.array_index for fcurve in fcurves],
+    }
+
+
+if __name__ == "__main__":
+    mesh_name = 'Wolf3D_Head'
+    armature_name = 'AvatarRoot'
+
+    for obj_name in (mesh_name, armature_name):
+        sampled = get_fcurves_as_numpy(obj_name)
+        if sampled is None:
+            continue
+
+        print(f"---> '{obj_name}': {sampled['values'].shape[1]} channels x {len(sampled['frames'])} frames")
+        for name, column in zip(sampled['channel_names'], sampled['values'].T):
+            print(f'  {name}: min {column.min():.3f}, max {column.max():.3f}')
@@ -0,0 +1,72 @@
+"""Export the triangulated index buffers of a mesh object to NumPy arrays.
+
+Author: zhaoyafei0210@gmail.com
+"""
+import bpy
+import numpy as np
+
+
+__all__ = ['get_loop_triangles_as_numpy']
+
+
+def get_loop_triangles_as_numpy(
+        mesh_name: str,
+        return_polygon_indices: bool = False
+    ) -> tuple[np.ndarray, ...]:
+    """
+    Export the triangulated index buffers of a mesh object to NumPy arrays.
+
+    The mesh is triangulated with `mesh.calc_loop_triangles()` and the triangles are
+    read in bulk with `loop_triangles.foreach_get`. The loop indices can be used to
+    gather per-corner data (UVs, normals, colors) without a second pass, e.g.
+    `uv_coords[tri_loop_indices]` with the UVs from `get_uv_map_as_numpy()`.
+
+    Parameters:
+        mesh_name: str, the name of the mesh object.
+        return_polygon_indices: bool, if True, also return the index of the polygon each triangle belongs to.
+
+    Returns:
+        tri_vertex_indices: np.ndarray, int32 array with shape (#num_triangles, 3), vertex indices of each triangle.
+        tri_loop_indices: np.ndarray, int32 array with shape (#num_triangles, 3), loop indices of each triangle.
+        tri_polygon_indices: np.ndarray, int32 array with shape (#num_triangles,), only if return_polygon_indices is True.
+    """
+    # Get the mesh object by name
+    obj = bpy.data.objects.get(mesh_name)
+
+    # Check if the mesh object exists
+    assert obj is not None, f"No mesh found with the name: {mesh_name}"
+
+    # Ensure the object is of type 'MESH'
+    assert obj.type == 'MESH', f"Object {mesh_name} is not a mesh"
+
+    # Flush edit-mode changes into the mesh data
+    obj.update_from_editmode()
+
+    mesh = obj.data
+    mesh.calc_loop_triangles()
+
+    loop_triangles = mesh.loop_triangles
+    num_triangles = len(loop_triangles)
+
+    tri_vertex_indices = np.empty((num_triangles, 3), dtype=np.int32)
+    tri_loop_indices = np.empty((num_triangles, 3), dtype=np.int32)
+    loop_triangles.foreach_get('vertices', tri_vertex_indices.reshape(-1))
+    loop_triangles.foreach_get('loops', tri_loop_indices.reshape(-1))
+
+    if not return_polygon_indices:
+        return tri_vertex_indices, tri_loop_indices
+
+    tri_polygon_indices = np.empty(num_triangles, dtype=np.int32)
+    loop_triangles.foreach_get('polygon_index', tri_polygon_indices)
+
+    return tri_vertex_indices, tri_loop_indices, tri_polygon_indices
+
+
+if __name__ == "__main__":
+    mesh_name = "Cube"
+
+    tri_vertex_indices, tri_loop_indices = get_loop_triangles_as_numpy(mesh_name)
+    print(f'---> tri_vertex_indices.shape: {tri_vertex_indices.shape}')
+    print(f'---> tri_vertex_indices: {tri_vertex_indices}')
+    print(f'---> tri_loop_indices.shape: {tri_loop_indices.shape}')
+    print(f'---> tri_loop_indices: {tri_loop_indices}')
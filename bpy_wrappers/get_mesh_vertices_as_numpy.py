@@ -8,22 +8,38 @@ import numpy as np
 
 __all__ = ['get_vertices_as_numpy']
 
-def get_vertices_as_numpy(mesh_obj_name):
+def get_vertices_as_numpy(
+        mesh_obj_name: str,
+        dtype: type | np.dtype = np.float64,
+        out: np.ndarray | None = None,
+        evaluated: bool = False
+    ) -> np.ndarray | None:
     """Get vertices of a mesh object as a NumPy array.
 
+    All coordinates are read with a single `vertices.foreach_get('co', ...)` call,
+    so no per-vertex Python objects are created.
+
     Parameters:
         mesh_obj_name: Name of the mesh object.
-    
-    Returns: 
-        NumPy array of vertices.
+        dtype: np.float32 or np.float64, dtype of the returned array. Defaults to np.float64.
+        out: Optional C-contiguous array with shape (#num_vertices, 3) and dtype `dtype`
+            to fill in place, e.g. a buffer reused across a batch loop.
+        evaluated: If True, read vertices from the evaluated depsgraph mesh,
+            i.e. with modifiers (and shape keys) applied. Defaults to False.
+
+    Returns:
+        NumPy array of vertices with shape (#num_vertices, 3).
     """
+    dtype = np.dtype(dtype)
+    if dtype not in (np.float32, np.float64):
+        raise ValueError(f"dtype must be np.float32 or np.float64, but got {dtype}.")
 
     # Get Mesh object
     obj = bpy.data.objects.get(mesh_obj_name)
     if obj is None:
         print(f"Object '{mesh_obj_name}' not found.")
         return None
-    
+
     if obj.type != 'MESH':
         print(f"Object '{mesh_obj_name}' is not a mesh.")
         return None
@@ -31,8 +47,34 @@ def get_vertices_as_numpy(mesh_obj_name):
     # Update object to ensure it is up to date (especially if there are modifiers)
     obj.update_from_editmode()
 
-    # Get all vertex coordinates
-    vertices = np.array([vert.co for vert in obj.data.vertices])
+    if evaluated:
+        depsgraph = bpy.context.evaluated_depsgraph_get()
+        obj_eval = obj.evaluated_get(depsgraph)
+        mesh = obj_eval.to_mesh()
+    else:
+        obj_eval = None
+        mesh = obj.data
+
+    try:
+        num_vertices = len(mesh.vertices)
+
+        if out is None:
+            vertices = np.empty((num_vertices, 3), dtype=dtype)
+        else:
+            if out.shape != (num_vertices, 3):
+                raise ValueError(
+                    f"Invalid shape of out, must be ({num_vertices}, 3), but got {out.shape}.")
+            if out.dtype != dtype:
+                raise ValueError(f"Invalid dtype of out, must be {dtype}, but got {out.dtype}.")
+            if not out.flags['C_CONTIGUOUS']:
+                raise ValueError("out must be a C-contiguous array.")
+            vertices = out
+
+        # Get all vertex coordinates, reshape(-1) is a view of the contiguous buffer
+        mesh.vertices.foreach_get('co', vertices.reshape(-1))
+    finally:
+        if obj_eval is not None:
+            obj_eval.to_mesh_clear()
 
     return vertices
 
@@ -45,3 +87,7 @@ if __name__ == "__main__":
     if vertices_array is not None:
         print(vertices_array)
 
+        # Reuse a float32 buffer and read the evaluated mesh (with modifiers)
+        buffer = np.empty_like(vertices_array, dtype=np.float32)
+        vertices_array = get_vertices_as_numpy(mesh_obj_name, np.float32, out=buffer, evaluated=True)
+        print(vertices_array)
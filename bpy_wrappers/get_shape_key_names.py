@@ -4,9 +4,10 @@ Author: zhaoyafei0210@gmail.com
 """
 import bpy
 import json
+import numpy as np
 
 
-__all__ = ['get_shape_key_names', 'get_all_shape_key_names']
+__all__ = ['get_shape_key_names', 'get_all_shape_key_names', 'get_shape_keys_as_numpy']
 
 
 def get_shape_key_names(obj_name):
@@ -23,6 +24,71 @@ def get_shape_key_names(obj_name):
     return [sk.name for sk in obj.data.shape_keys.key_blocks]
 
 
+def get_shape_keys_as_numpy(
+        obj_name: str,
+        relative: bool = False,
+        dtype: type | np.dtype = np.float32
+) -> dict:
+    """
+    Get all shape-key blocks of a mesh object as one (K, V, 3) array.
+
+    The coordinates of each key block are read with a single `foreach_get('co', ...)` call.
+
+    Parameters:
+        obj_name: Name of the mesh object.
+        relative: If True, return deltas relative to the Basis (reference key)
+            instead of absolute positions, the delta of the Basis itself is all zeros.
+        dtype: dtype of the returned vertex array, default is np.float32.
+
+    Returns:
+        dict: A dictionary containing:
+            - 'names': list of shape-key names, with length #num_shape_keys
+            - 'vertices': array with shape (#num_shape_keys, #num_vertices, 3)
+            - 'relative_key_indices': int32 array with shape (#num_shape_keys,), index of each key's relative key
+            - 'slider_min': float32 array with shape (#num_shape_keys,)
+            - 'slider_max': float32 array with shape (#num_shape_keys,)
+            - 'reference_key_index': index of the Basis (reference key)
+    """
+    obj = bpy.data.objects[obj_name]
+    assert obj.type == 'MESH', f"Object '{obj_name}' is not a mesh."
+    assert obj.data.shape_keys is not None, f"Object '{obj_name}' has no shape keys."
+
+    # Flush edit-mode changes into the mesh data
+    obj.update_from_editmode()
+
+    shape_keys = obj.data.shape_keys
+    key_blocks = shape_keys.key_blocks
+    names = key_blocks.keys()
+
+    num_shape_keys = len(key_blocks)
+    num_vertices = len(obj.data.vertices)
+
+    vertices = np.empty((num_shape_keys, num_vertices, 3), dtype=dtype)
+    for ii, kb in enumerate(key_blocks):
+        kb.data.foreach_get('co', vertices[ii].reshape(-1))
+
+    relative_key_indices = np.array([key_blocks.find(kb.relative_key.name) for kb in key_blocks], dtype=np.int32)
+
+    slider_min = np.empty(num_shape_keys, dtype=np.float32)
+    slider_max = np.empty(num_shape_keys, dtype=np.float32)
+    key_blocks.foreach_get('slider_min', slider_min)
+    key_blocks.foreach_get('slider_max', slider_max)
+
+    reference_key_index = key_blocks.find(shape_keys.reference_key.name)
+
+    if relative:
+        vertices -= vertices[reference_key_index].copy()
+
+    return {
+        'names': names,
+        'vertices': vertices,
+        'relative_key_indices': relative_key_indices,
+        'slider_min': slider_min,
+        'slider_max': slider_max,
+        'reference_key_index': reference_key_index,
+    }
+
+
 def get_all_shape_key_names():
     """
     Get shape-key names of all shape-key data.
@@ -50,6 +116,10 @@ def get_all_shape_key_names():
 if __name__ == "__main__":
     print(get_shape_key_names('Cube'))
 
+    shape_key_data = get_shape_keys_as_numpy('Cube', relative=True)
+    print(f"---> names: {shape_key_data['names']}")
+    print(f"---> vertices.shape: {shape_key_data['vertices'].shape}")
+
     all_shape_key_names = get_all_shape_key_names()
     print(json.dumps(all_shape_key_names, indent=2))
 
@@ -6,41 +6,88 @@ import bpy
 import numpy as np
 
 
-__all__ = ['get_uv_coords_as_numpy']
+__all__ = ['get_uv_coords_as_numpy', 'get_all_uv_coords_as_numpy']
 
 
-def get_uv_coords_as_numpy(obj_name):
+def __get_mesh_object(obj_name: str) -> bpy.types.Object:
     # Ensure the object exists
     obj = bpy.data.objects.get(obj_name)
     assert obj is not None, f"Object '{obj_name}' not found"
-    
+
     # Ensure the object is a mesh and has UVs
     assert obj.type == 'MESH', f"Object '{obj_name}' is not a mesh"
-    
-    # Switch to object mode to avoid issues with accessing data
-    bpy.ops.object.mode_set(mode='OBJECT')
-    
-    # Get the active UV map
-    uv_layer = obj.data.uv_layers.active
-    assert uv_layer is not None, f"Object '{obj_name}' has no active UV map"
-    
-    # Prepare an empty list to store the UV coordinates
-    uv_coords = []
-
-    print(f'length of obj.data.loops: {len(obj.data.loops)}')
-
-    # Iterate through each loop (vertex per face corner) to get UVs
-    for loop in obj.data.loops:
-        # print(f'loop index: {loop.index}')
-        uv = uv_layer.data[loop.index].uv[:]
-        # print(f'len(uv): {len(uv)}')
-        uv_coords.append(uv)
-
-    # Convert the list of UVs to a NumPy array
-    uv_array = np.array(uv_coords)
-    
+
+    # Flush edit-mode data into the mesh, no operator mode switch needed
+    obj.update_from_editmode()
+
+    return obj
+
+
+def get_uv_coords_as_numpy(
+        obj_name: str,
+        uv_name: str | None = None,
+        out: np.ndarray | None = None
+    ) -> np.ndarray:
+    """Get the per-loop UV coordinates of a mesh object as a NumPy array.
+
+    Parameters:
+        obj_name: Name of the mesh object.
+        uv_name: Name of the UV map, if None, the active UV map is used.
+        out: Optional C-contiguous float32 array with shape (#num_loops, 2) to fill in place.
+
+    Returns:
+        uv_array: float32 array with shape (#num_loops, 2).
+    """
+    obj = __get_mesh_object(obj_name)
+
+    # Get the UV map
+    if uv_name is None:
+        uv_layer = obj.data.uv_layers.active
+        assert uv_layer is not None, f"Object '{obj_name}' has no active UV map"
+    else:
+        uv_layer = obj.data.uv_layers.get(uv_name)
+        assert uv_layer is not None, f"Object '{obj_name}' has no UV map named '{uv_name}'"
+
+    num_loops = len(obj.data.loops)
+
+    if out is None:
+        uv_array = np.empty((num_loops, 2), dtype=np.float32)
+    else:
+        assert out.shape == (num_loops, 2) and out.dtype == np.float32 and out.flags['C_CONTIGUOUS'], \
+            f"out must be a C-contiguous float32 array with shape ({num_loops}, 2)"
+        uv_array = out
+
+    # Read the UVs of all loops (vertex per face corner) at once
+    uv_layer.data.foreach_get('uv', uv_array.reshape(-1))
+
     return uv_array
 
+
+def get_all_uv_coords_as_numpy(obj_name: str) -> dict[str, np.ndarray]:
+    """Get the per-loop UV coordinates of all UV maps of a mesh object.
+
+    Parameters:
+        obj_name: Name of the mesh object.
+
+    Returns:
+        uv_arrays: dict of {uv_name: float32 array with shape (#num_loops, 2)}.
+    """
+    obj = __get_mesh_object(obj_name)
+
+    uv_layers = obj.data.uv_layers
+    num_loops = len(obj.data.loops)
+
+    # One preallocated block for all layers, each dict value is a view into it
+    uv_block = np.empty((len(uv_layers), num_loops, 2), dtype=np.float32)
+
+    uv_arrays = {}
+    for ii, uv_layer in enumerate(uv_layers):
+        uv_layer.data.foreach_get('uv', uv_block[ii].reshape(-1))
+        uv_arrays[uv_layer.name] = uv_block[ii]
+
+    return uv_arrays
+
+
 if __name__ == "__main__":
     obj_name = "Cube"
     uv_array = get_uv_coords_as_numpy(obj_name)
@@ -48,3 +95,7 @@ if __name__ == "__main__":
     if uv_array is not None:
         print("UV coordinates exported to NumPy array:")
         print(uv_array)
+
+    uv_arrays = get_all_uv_coords_as_numpy(obj_name)
+    for uv_name, uv_array in uv_arrays.items():
+        print(f'---> {uv_name}: {uv_array.shape}')
@@ -7,20 +7,32 @@ import numpy as np
 
 def get_uv_map_as_numpy(
         mesh_name: str, 
-        uv_name: str='UVMap'
-) -> tuple[np.ndarray, np.ndarray]:
+        uv_name: str='UVMap',
+        layout: str='auto'
+) -> tuple[np.ndarray, np.ndarray | tuple[np.ndarray, np.ndarray]]:
     """
     Retrieve UV coordinates and polygon indices from a specified mesh.
 
+    UVs, polygon loop starts and loop totals are read in bulk with `foreach_get`,
+    so meshes mixing tris, quads and n-gons are supported without Python loops.
+
     Args:
         mesh_name (str): The name of the mesh object.
         uv_name (str): The name of the UV map.
+        layout (str): 'auto', 'dense' or 'csr', the layout of the polygon indices.
+            'dense': a 2D array, all polygons must have the same number of loops.
+            'csr': a compressed-sparse-row tuple (offsets, indices).
+            'auto': 'dense' if all polygons have the same number of loops, otherwise 'csr'.
 
     Returns:
         tuple: A tuple containing:
-            - numpy.ndarray: UV coordinates.
-            - numpy.ndarray: Polygon indices.
+            - numpy.ndarray: UV coordinates, float32 array with shape (#num_loops, 2).
+            - numpy.ndarray or tuple: Polygon indices into the UV coordinates,
+              a (#num_polygons, N) array (dense layout) or (offsets, indices) (csr layout).
     """
+    if layout not in ('auto', 'dense', 'csr'):
+        raise ValueError(f"Invalid layout: {layout}, must be 'auto', 'dense' or 'csr'.")
+
     # Get the object by name
     obj = bpy.data.objects.get(mesh_name)
     if obj is None or obj.type != 'MESH':
@@ -38,21 +50,36 @@ def get_uv_map_as_numpy(
     if bpy.context.mode != 'OBJECT':
         bpy.ops.object.mode_set(mode='OBJECT')
     
-    # Store UV coordinates and triangle indices
-    uv_coords = []
-    uv_polygons = []
+    num_polygons = len(mesh.polygons)
+    num_loops = len(mesh.loops)
 
     # Access UV coordinates for each loop in the mesh
-    for loop in mesh.loops:
-        uv_coords.append(uv_layer.data[loop.index].uv)
+    uv_coords = np.empty((num_loops, 2), dtype=np.float32)
+    uv_layer.data.foreach_get('uv', uv_coords.reshape(-1))
+
+    # Access the loop range of each polygon
+    loop_starts = np.empty(num_polygons, dtype=np.int32)
+    loop_totals = np.empty(num_polygons, dtype=np.int32)
+    mesh.polygons.foreach_get('loop_start', loop_starts)
+    mesh.polygons.foreach_get('loop_total', loop_totals)
+
+    offsets = np.zeros(num_polygons + 1, dtype=np.int32)
+    np.cumsum(loop_totals, out=offsets[1:])
 
-    # Access face vertex indices
-    for poly in mesh.polygons:
-        uv_polygons.append([loop_index for loop_index in poly.loop_indices])
+    # Loop indices of each polygon, in polygon order
+    indices = np.repeat(loop_starts - offsets[:-1], loop_totals) + np.arange(offsets[-1], dtype=np.int32)
 
-    # Convert to numpy arrays
-    uv_coords = np.array(uv_coords)
-    uv_polygons = np.array(uv_polygons)
+    is_uniform = num_polygons > 0 and np.all(loop_totals == loop_totals[0])
+
+    if layout == 'dense' or (layout == 'auto' and is_uniform):
+        if num_polygons == 0:
+            return uv_coords, np.empty((0, 0), dtype=np.int32)
+        if not is_uniform:
+            raise ValueError(f"Mesh '{mesh_name}' has polygons with different numbers of loops, use layout='csr'.")
+
+        uv_polygons = indices.reshape(num_polygons, loop_totals[0])
+    else:
+        uv_polygons = (offsets, indices)
 
     return uv_coords, uv_polygons
 
@@ -62,4 +89,8 @@ if __name__ == "__main__":
     print(f'---> uv_coords.shape: {uv_coords.shape}')
     print(f'---> uv_coords: {uv_coords}')
     print(f'---> uv_polygons.shape: {uv_polygons.shape}')
-    print(f'---> uv_polygons: {uv_polygons}')
\ No newline at end of file
+    print(f'---> uv_polygons: {uv_polygons}')
+
+    uv_coords, (offsets, indices) = get_uv_map_as_numpy('Cube', 'UVMap', layout='csr')
+    print(f'---> offsets: {offsets}')
+    print(f'---> indices: {indices}')
\ No newline at end of file
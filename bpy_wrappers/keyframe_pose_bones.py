@@ -6,8 +6,24 @@ Author: zhaoyafei0210@gmail.com
 import bpy
 import numpy as np
 
+from bpy_wrappers.bulk_fcurves import (
+    ensure_action,
+    get_or_create_fcurve,
+    make_keyframes,
+    replace_keyframes_in_range,
+    set_fcurve_keyframes
+)
+from utils.keyframe_reduction import print_reduction_stats, reduce_grouped_keyframes
 
-__all__ = ['keyframe_pose_bones', 'keyframe_single_pose_bone']
+
+__all__ = ['keyframe_pose_bones', 'keyframe_single_pose_bone', 'keyframe_pose_bones_bulk', 'update_pose_bones_keyframes']
+
+
+# {rotation_mode: (data_path of the rotation property, #components)}, Euler modes use 'rotation_euler'
+ROTATION_MODE_PROPERTIES = {
+    'QUATERNION': ('rotation_quaternion', 4),
+    'AXIS_ANGLE': ('rotation_axis_angle', 4),
+}
 
 
 def __is_valid_object(bpy_obj_name: str, type: str = 'MESH') -> bool:
@@ -24,13 +40,20 @@ def keyframe_pose_bones(
     bone_names: list[str],
     rotations_per_bone: list[list] | np.ndarray,
     rotation_mode: str,
-    start_frame: int = 1
+    start_frame: int = 1,
+    bulk: bool = True
 ) -> None:
     """
     Keyframes the rotation of the specified pose bones in a given armature object 
     across multiple frames.
+
+    With bulk=True the rotation fcurves are written directly by keyframe_pose_bones_bulk(),
+    otherwise each frame is set with frame_set() and keyframed with keyframe_insert() in POSE mode.
     ...
     """
+    if bulk:
+        return keyframe_pose_bones_bulk(armature_name, bone_names, rotations_per_bone, rotation_mode, start_frame)
+
     assert __is_valid_object(armature_name, type='ARMATURE'), \
         f"Armature object '{armature_name}' not found."
 
@@ -85,12 +108,175 @@ def keyframe_pose_bones(
     return end_frame
 
 
+def keyframe_pose_bones_bulk(
+    armature_name: str,
+    bone_names: list[str],
+    rotations_per_bone: list[list] | np.ndarray,
+    rotation_mode: str,
+    start_frame: int = 1,
+    interpolation: str | None = None,
+    tolerance: float | None = None,
+    frames: np.ndarray | None = None
+) -> int:
+    """
+    Keyframes the rotation of the specified pose bones from arrays, in bulk.
+
+    The `pose.bones["name"].rotation_*` fcurves are written directly with `keyframe_points.add`
+    plus `foreach_set`, so neither the current frame nor the object mode is changed.
+
+    Parameters:
+        armature_name (str): Name of the armature object.
+        bone_names (list[str]): Names of the pose bones to keyframe.
+        rotations_per_bone (list or np.ndarray): Array with shape (#num_bones, #num_frames, 3) for Euler modes,
+            or (#num_bones, #num_frames, 4) for 'QUATERNION' (w, x, y, z) and 'AXIS_ANGLE' (angle, x, y, z),
+            or a list with one (#num_frames, 3/4) sequence per bone.
+        rotation_mode (str): Rotation mode ('XYZ', 'QUATERNION', 'AXIS_ANGLE', etc.).
+        start_frame (int, optional): The starting frame for keyframing. Defaults to 1.
+        interpolation (str, optional): Interpolation of the new keys, e.g. 'LINEAR' or 'BEZIER'.
+            Defaults to None, i.e. the user preference for new keyframes, like keyframe_insert().
+        tolerance (float, optional): Only write the keys needed to keep every rotation component within this error,
+            all components of a bone keep the same frames (see utils.keyframe_reduction),
+            with 'LINEAR' interpolation unless `interpolation` is given. Defaults to None.
+        frames (np.ndarray, optional): Ascending frame numbers of the rotations shared by all bones,
+            e.g. of several takes with gaps between them. Defaults to None, i.e. start_frame, start_frame + 1, ...
+
+    Returns:
+        end_frame (int): The last frame number after keyframing.
+    """
+    assert __is_valid_object(armature_name, type='ARMATURE'), \
+        f"Armature object '{armature_name}' not found."
+
+    # Get the armature object
+    armature = bpy.data.objects.get(armature_name)
+
+    # Check if the number of rotations matches the number of bone names
+    assert len(rotations_per_bone) == len(bone_names), "Number of rotations_per_bone does not match number of bone names."
+
+    data_path_name, num_components = ROTATION_MODE_PROPERTIES.get(rotation_mode, ('rotation_euler', 3))
+
+    if tolerance is not None and interpolation is None:
+        interpolation = 'LINEAR'
+
+    action = ensure_action(armature)
+
+    end_frame = start_frame
+
+    for bone_name, rotations in zip(bone_names, rotations_per_bone):
+        # Get the pose bone
+        pose_bone = armature.pose.bones.get(bone_name)
+
+        assert pose_bone is not None, f"Pose bone '{bone_name}' not found in armature '{armature_name}'."
+
+        rotations = np.asarray(rotations, dtype=np.float32)
+        if len(rotations) == 0:
+            continue
+
+        assert rotations.ndim == 2 and rotations.shape[1] == num_components, \
+            f"Invalid shape of rotations for bone '{bone_name}', must be (#num_frames, {num_components}) " \
+            f"for rotation mode '{rotation_mode}', but got {rotations.shape}."
+
+        # Set the rotation mode, a property of the pose bone, not an object mode switch
+        pose_bone.rotation_mode = rotation_mode
+
+        if frames is None:
+            bone_frames = start_frame + np.arange(len(rotations))
+        else:
+            bone_frames = np.asarray(frames)
+            assert len(bone_frames) == len(rotations), \
+                f"Got {len(rotations)} rotations for bone '{bone_name}', but {len(bone_frames)} frames."
+
+        end_frame = max(end_frame, int(bone_frames[-1]))
+
+        if tolerance is not None:
+            kept_indices, stats = reduce_grouped_keyframes(rotations[None], tolerance, bone_frames)
+            print_reduction_stats(stats, [bone_name])
+            bone_frames, rotations = bone_frames[kept_indices[0]], rotations[kept_indices[0]]
+
+        data_path = pose_bone.path_from_id(data_path_name)
+
+        # One fcurve per component, grouped by bone name like keyframe_insert()
+        for index in range(num_components):
+            fcurve = get_or_create_fcurve(action, data_path, index, group_name=bone_name, id_data=armature)
+            set_fcurve_keyframes(fcurve, bone_frames, rotations[:, index], interpolation)
+
+    return end_frame
+
+
+def update_pose_bones_keyframes(
+    armature_name: str,
+    bone_names: list[str],
+    rotations_per_bone: list[list] | np.ndarray,
+    rotation_mode: str,
+    start_frame: int = 1,
+    frame_end: int | None = None,
+    interpolation: str | None = None
+) -> int:
+    """
+    Replace the rotation keyframes of pose bones within a frame window, e.g. to patch a re-captured segment.
+
+    Only the keys in [start_frame, frame_end] of each rotation fcurve are replaced, keys outside the
+    window are kept. Each fcurve is rebuilt once (see bulk_fcurves.replace_keyframes_in_range()).
+
+    Parameters:
+        armature_name (str): Name of the armature object.
+        bone_names (list[str]): Names of the pose bones to update.
+        rotations_per_bone (list or np.ndarray): New rotations, see keyframe_pose_bones_bulk().
+        rotation_mode (str): Rotation mode ('XYZ', 'QUATERNION', 'AXIS_ANGLE', etc.).
+        start_frame (int, optional): The first frame of the window. Defaults to 1.
+        frame_end (int, optional): The last frame of the window, default is the last new frame.
+        interpolation (str, optional): Interpolation of the new keys, default is the user preference.
+
+    Returns:
+        end_frame (int): The last frame number of the window.
+    """
+    assert __is_valid_object(armature_name, type='ARMATURE'), \
+        f"Armature object '{armature_name}' not found."
+
+    armature = bpy.data.objects.get(armature_name)
+
+    assert len(rotations_per_bone) == len(bone_names), "Number of rotations_per_bone does not match number of bone names."
+
+    if frame_end is None:
+        frame_end = start_frame + max((len(rotations) for rotations in rotations_per_bone), default=1) - 1
+
+    data_path_name, num_components = ROTATION_MODE_PROPERTIES.get(rotation_mode, ('rotation_euler', 3))
+
+    action = ensure_action(armature)
+
+    for bone_name, rotations in zip(bone_names, rotations_per_bone):
+        pose_bone = armature.pose.bones.get(bone_name)
+
+        assert pose_bone is not None, f"Pose bone '{bone_name}' not found in armature '{armature_name}'."
+
+        rotations = np.asarray(rotations, dtype=np.float32)
+        if rotations.size == 0:
+            # No new keys, only clear the window
+            rotations = rotations.reshape(0, num_components)
+
+        assert rotations.ndim == 2 and rotations.shape[1] == num_components, \
+            f"Invalid shape of rotations for bone '{bone_name}', must be (#num_frames, {num_components}) " \
+            f"for rotation mode '{rotation_mode}', but got {rotations.shape}."
+
+        pose_bone.rotation_mode = rotation_mode
+
+        frames = start_frame + np.arange(len(rotations))
+        data_path = pose_bone.path_from_id(data_path_name)
+
+        for index in range(num_components):
+            fcurve = get_or_create_fcurve(action, data_path, index, group_name=bone_name, id_data=armature)
+            replace_keyframes_in_range(
+                fcurve, start_frame, frame_end, make_keyframes(frames, rotations[:, index], interpolation))
+
+    return frame_end
+
+
 def keyframe_single_pose_bone(
     armature_name: str, 
     bone_name: str, 
     rotations: list | tuple | np.ndarray, 
     rotation_mode: str, 
-    start_frame: int = 1
+    start_frame: int = 1,
+    bulk: bool = True
 ) -> None:
     """
     Keyframes the rotation of a single pose bone in a given armature object for a single frame.
@@ -101,11 +287,12 @@ def keyframe_single_pose_bone(
         rotations (list, tuple or np.ndarray): Rotation values for the bone. The format depends on the rotation mode.
         rotation_mode (str): Rotation mode ('XYZ', 'QUATERNION', etc.).
         start_frame (int, optional): The starting frame for keyframing. Defaults to 1.
+        bulk (bool, optional): If True, write the fcurves in bulk. Defaults to True.
 
     Returns:
         end_frame (int): The last frame number after keyframing.
     """
-    end_frame = keyframe_pose_bones(armature_name, [bone_name], [rotations], rotation_mode, start_frame)
+    end_frame = keyframe_pose_bones(armature_name, [bone_name], [rotations], rotation_mode, start_frame, bulk)
 
     return end_frame
 
@@ -6,7 +6,16 @@ Author: zhaoyafei0210@gmail.com
 import bpy
 import numpy as np
 
-__all__ = ['keyframe_single_shape_key', 'keyframe_shape_keys']
+from bpy_wrappers.bulk_fcurves import (
+    ensure_action,
+    get_or_create_fcurve,
+    make_keyframes,
+    replace_keyframes_in_range,
+    set_fcurve_keyframes
+)
+from utils.keyframe_reduction import print_reduction_stats, reduce_keyframes
+
+__all__ = ['keyframe_single_shape_key', 'keyframe_shape_keys', 'update_shape_key_keyframes']
 
 
 def __is_valid_object(bpy_obj_name: str, type: str = 'MESH') -> bool:
@@ -59,23 +68,62 @@ def get_shape_key_index(
     return shape_key_index
 
 
+def __reduce_shape_key_values(
+        shape_key_values: list[list[float]] | np.ndarray,
+        tolerance: float,
+        shape_key_names: list[str],
+        frames: np.ndarray | None = None
+    ) -> list[np.ndarray]:
+    """Indices of the keys to write for each shape key, all shape keys at once if they have the same length."""
+    lengths = {len(key_values) for key_values in shape_key_values}
+
+    if len(lengths) == 1:
+        kept_indices, stats = reduce_keyframes(np.asarray(shape_key_values), tolerance, frames)
+    else:
+        kept_indices, stats_list = zip(*[
+            reduce_keyframes(np.asarray(key_values)[None], tolerance) for key_values in shape_key_values])
+        kept_indices = [kept[0] for kept in kept_indices]
+        stats = {key: np.concatenate([s[key] for s in stats_list]) for key in ('num_kept', 'num_dropped')}
+        stats['total_kept'] = int(stats['num_kept'].sum())
+        stats['total_dropped'] = int(stats['num_dropped'].sum())
+
+    print_reduction_stats(stats, shape_key_names)
+
+    return kept_indices
+
+
 def keyframe_shape_keys(
         mesh_name: str,
         shape_key_names: list[str],
         shape_key_values: list[list[float]] | np.ndarray,
         start_frame=1,
-        case_insensitive: bool = False
+        case_insensitive: bool = False,
+        bulk: bool = True,
+        interpolation: str | None = None,
+        tolerance: float | None = None,
+        frames: np.ndarray | None = None
     ) -> int:
     """Keyframe shape keys for a mesh object.
 
     This function sets keyframes for shape keys of a mesh object based on provided values. It supports both case-sensitive and case-insensitive matching of shape key names.
 
+    In bulk mode, the action and the `key_blocks["name"].value` fcurves are created or looked up once,
+    and all keys of a fcurve are written with `keyframe_points.add(n)` and `foreach_set`,
+    instead of setting `shape_key.value` and calling `keyframe_insert()` once per key per frame.
+
     Parameters:
         mesh_name (str): The name of the mesh object.
         shape_key_names (list[str]): A list of names of the shape keys to keyframe.
         shape_key_values (list[list[float]] | np.ndarray): A list of lists of float values or a numpy array, where each sublist or row corresponds to the values for a shape key over time.
         start_frame (int, optional): The frame number to start keyframing from. Defaults to 1.
         case_insensitive (bool, optional): If True, the comparison of shape key names is case-insensitive. Defaults to False.
+        bulk (bool, optional): If True, write fcurves in bulk, otherwise call keyframe_insert() per frame. Defaults to True.
+        interpolation (str, optional): Interpolation of the new keys in bulk mode, e.g. 'LINEAR' or 'BEZIER'.
+            Defaults to None, i.e. the user preference for new keyframes, like keyframe_insert().
+        tolerance (float, optional): In bulk mode only, write only the keys needed to stay within this error of the values
+            (see utils.keyframe_reduction), with 'LINEAR' interpolation unless `interpolation` is given. Defaults to None.
+        frames (np.ndarray, optional): Ascending frame numbers of the values shared by all shape keys,
+            e.g. of several takes with gaps between them. Defaults to None, i.e. start_frame, start_frame + 1, ...
 
     Returns:
         int: The last frame number after keyframing.
@@ -91,12 +139,27 @@ def keyframe_shape_keys(
     
     # Ensure shape_key_names and shape_key_values have the same length
     assert len(shape_key_names) == len(shape_key_values), "Shape key names and values lists must have the same length."
+    assert tolerance is None or bulk, "tolerance is only supported in bulk mode, keyframe_insert() keys every frame."
+
+    if frames is not None:
+        frames = np.asarray(frames)
+        assert all(len(key_values) == len(frames) for key_values in shape_key_values), \
+            f"Each shape key must have one value per frame, i.e. {len(frames)} values."
 
     shape_keys = mesh_obj.data.shape_keys.key_blocks
     shape_key_indexes = get_shape_key_index(mesh_obj, shape_key_names, case_insensitive)
 
     end_frame = start_frame
 
+    if bulk:
+        shape_keys_id = mesh_obj.data.shape_keys
+        action = ensure_action(shape_keys_id)
+
+        if tolerance is not None:
+            kept_indices = __reduce_shape_key_values(shape_key_values, tolerance, shape_key_names, frames)
+            if interpolation is None:
+                interpolation = 'LINEAR'
+
     # Loop through the shape keys and their corresponding values
     for ii, key_name in enumerate(shape_key_names):
         key_idx = shape_key_indexes[ii]
@@ -108,12 +171,26 @@ def keyframe_shape_keys(
         key_values = shape_key_values[ii]
         shape_key = shape_keys[key_idx]
 
-        # Loop through the values for this shape key and keyframe them
-        for i, value in enumerate(key_values):
-            current_frame = start_frame + i
-            shape_key.value = value
-            shape_key.keyframe_insert(data_path="value", frame=current_frame)
-            # print(f"Keyframe added for shape key '{key_name}' at frame {current_frame} with value {value}.")
+        if len(key_values) == 0:
+            continue
+
+        key_frames = start_frame + np.arange(len(key_values)) if frames is None else frames
+
+        if bulk:
+            # Write all keys of the 'key_blocks["name"].value' fcurve at once
+            current_frame = int(key_frames[-1])
+            if tolerance is not None:
+                key_frames = key_frames[kept_indices[ii]]
+                key_values = np.asarray(key_values)[kept_indices[ii]]
+            fcurve = get_or_create_fcurve(action, shape_key.path_from_id('value'), id_data=shape_keys_id)
+            set_fcurve_keyframes(fcurve, key_frames, key_values, interpolation)
+        else:
+            # Loop through the values for this shape key and keyframe them
+            for frame, value in zip(key_frames, key_values):
+                current_frame = int(frame)
+                shape_key.value = value
+                shape_key.keyframe_insert(data_path="value", frame=current_frame)
+                # print(f"Keyframe added for shape key '{key_name}' at frame {current_frame} with value {value}.")
 
         if end_frame < current_frame:
             end_frame = current_frame
@@ -121,12 +198,69 @@ def keyframe_shape_keys(
     return end_frame
 
 
+def update_shape_key_keyframes(
+        mesh_name: str,
+        shape_key_names: list[str],
+        shape_key_values: list[list[float]] | np.ndarray,
+        start_frame: int = 1,
+        frame_end: int | None = None,
+        case_insensitive: bool = False,
+        interpolation: str | None = None
+    ) -> int:
+    """Replace the keyframes of shape keys within a frame window, e.g. to patch a re-captured segment of a take.
+
+    Only the keys in [start_frame, frame_end] of each fcurve are replaced, keys outside the window are kept.
+    Each fcurve is rebuilt once (see bulk_fcurves.replace_keyframes_in_range()).
+
+    Parameters:
+        mesh_name (str): The name of the mesh object.
+        shape_key_names (list[str]): A list of names of the shape keys to update.
+        shape_key_values (list[list[float]] | np.ndarray): The new values of each shape key, keyed from start_frame.
+        start_frame (int, optional): The first frame of the window. Defaults to 1.
+        frame_end (int, optional): The last frame of the window, default is the last new frame.
+            Use a larger value to also drop old keys after a shorter re-capture.
+        case_insensitive (bool, optional): If True, the comparison of shape key names is case-insensitive. Defaults to False.
+        interpolation (str, optional): Interpolation of the new keys, default is the user preference.
+
+    Returns:
+        int: The last frame number of the window.
+    """
+    mesh_obj = bpy.data.objects.get(mesh_name)
+
+    assert mesh_obj, f"Mesh object '{mesh_name}' not found."
+    assert __is_valid_object(mesh_name, type='MESH'), f"Object '{mesh_name}' is not a mesh object."
+    assert mesh_obj.data.shape_keys is not None, f"Mesh object '{mesh_name}' has no shape keys."
+    assert len(shape_key_names) == len(shape_key_values), "Shape key names and values lists must have the same length."
+
+    if frame_end is None:
+        frame_end = start_frame + max((len(values) for values in shape_key_values), default=1) - 1
+
+    shape_keys_id = mesh_obj.data.shape_keys
+    shape_keys = shape_keys_id.key_blocks
+    shape_key_indexes = get_shape_key_index(mesh_obj, shape_key_names, case_insensitive)
+
+    action = ensure_action(shape_keys_id)
+
+    for key_name, key_idx, key_values in zip(shape_key_names, shape_key_indexes, shape_key_values):
+        if key_idx < 0:
+            print(f"Shape key '{key_name}' not found in mesh '{mesh_name}'.")
+            continue
+
+        frames = start_frame + np.arange(len(key_values))
+        fcurve = get_or_create_fcurve(action, shape_keys[key_idx].path_from_id('value'), id_data=shape_keys_id)
+        replace_keyframes_in_range(
+            fcurve, start_frame, frame_end, make_keyframes(frames, key_values, interpolation))
+
+    return frame_end
+
+
 def keyframe_single_shape_key(
         mesh_name: str,
         shape_key_name: str,
         shape_key_values: list[float] | tuple | np.ndarray,
         start_frame: int = 1,
-        case_insensitive: bool = False
+        case_insensitive: bool = False,
+        bulk: bool = True
     ) -> None:
     """
     Keyframe a single shape key with a list of values.
@@ -137,11 +271,12 @@ def keyframe_single_shape_key(
         shape_key_values (list[float] | tuple | np.ndarray): A list of values to keyframe for the shape key.
         start_frame (int, optional): The frame number to start keyframing from. Defaults to 1.
         case_insensitive (bool, optional): If True, the comparison of shape key names is case-insensitive. Defaults to False.
+        bulk (bool, optional): If True, write the fcurve in bulk. Defaults to True.
 
     Returns:
         None
     """
-    end_frame = keyframe_shape_keys(mesh_name, [shape_key_name], [shape_key_values], start_frame, case_insensitive)
+    end_frame = keyframe_shape_keys(mesh_name, [shape_key_name], [shape_key_values], start_frame, case_insensitive, bulk)
 
     return end_frame
 
@@ -178,3 +313,17 @@ if __name__ == "__main__":
     end_frame = keyframe_shape_keys(mesh_name, shape_keys, shape_key_values, end_frame + 1, case_insensitive)
     print(f'End frame: {end_frame}')
 
+    # Reduced keys still end at the last frame of the values
+    reduced_end_frame = keyframe_shape_keys(
+        mesh_name, shape_keys, shape_key_values, end_frame + 1, case_insensitive, tolerance=1e-3)
+    expected_end_frame = end_frame + len(shape_key_values[0])
+    assert reduced_end_frame == expected_end_frame, \
+        f'End frame with tolerance {reduced_end_frame} != end frame without it {expected_end_frame}'
+    end_frame = reduced_end_frame
+    print(f'End frame: {end_frame}')
+
+    # Re-key frames [13, 24] of the first two shape keys only
+    patch_values = [np.ones(12), np.zeros(12)]
+    patch_end_frame = update_shape_key_keyframes(mesh_name, shape_keys[:2], patch_values, 13, case_insensitive=case_insensitive)
+    print(f'Patched until frame: {patch_end_frame}')
+
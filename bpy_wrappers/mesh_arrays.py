@@ -0,0 +1,234 @@
+"""Snapshot the data of a mesh as NumPy arrays, with change-aware caching.
+
+Author: zhaoyafei0210@gmail.com
+"""
+from collections import OrderedDict
+from dataclasses import dataclass, field
+import zlib
+
+import bpy
+import numpy as np
+
+
+__all__ = ['MeshArrays', 'get_mesh_arrays', 'invalidate_mesh_arrays']
+
+
+# Max. number of cached snapshots, the least recently used one is dropped first
+MESH_ARRAYS_CACHE_SIZE = 16
+
+# Number of vertices sampled for the fingerprint checksum
+FINGERPRINT_NUM_SAMPLES = 64
+
+# {mesh_name: (fingerprint, MeshArrays)}
+_mesh_arrays_cache = OrderedDict()
+
+
+@dataclass
+class MeshArrays:
+    """NumPy snapshot of a mesh, all arrays are extracted with `foreach_get`.
+
+    Attributes:
+        mesh_name: name of the mesh data-block.
+        vertices: float32 array with shape (#num_vertices, 3).
+        vertex_normals: float32 array with shape (#num_vertices, 3).
+        loop_vertex_indices: int32 array with shape (#num_loops,).
+        polygon_offsets: int32 array with shape (#num_polygons + 1,), the loops of
+            polygon i are loop_vertex_indices[polygon_offsets[i]:polygon_offsets[i+1]].
+        polygon_normals: float32 array with shape (#num_polygons, 3).
+        uv_layers: dict of {uv_name: float32 array with shape (#num_loops, 2)}.
+        shape_key_names: list of shape-key names, empty if the mesh has no shape keys.
+        shape_keys: float32 array with shape (#num_shape_keys, #num_vertices, 3).
+    """
+    mesh_name: str
+    vertices: np.ndarray
+    vertex_normals: np.ndarray
+    loop_vertex_indices: np.ndarray
+    polygon_offsets: np.ndarray
+    polygon_normals: np.ndarray
+    uv_layers: dict[str, np.ndarray] = field(default_factory=dict)
+    shape_key_names: list[str] = field(default_factory=list)
+    shape_keys: np.ndarray | None = None
+
+    @property
+    def num_vertices(self) -> int:
+        return len(self.vertices)
+
+    @property
+    def num_loops(self) -> int:
+        return len(self.loop_vertex_indices)
+
+    @property
+    def num_polygons(self) -> int:
+        return len(self.polygon_offsets) - 1
+
+    @property
+    def polygons(self) -> tuple[np.ndarray, np.ndarray]:
+        """Polygons in CSR layout: (offsets, indices)."""
+        return self.polygon_offsets, self.loop_vertex_indices
+
+    @classmethod
+    def from_mesh(cls, mesh: bpy.types.Mesh) -> 'MeshArrays':
+        """Extract all arrays of a mesh data-block in one bulk pass."""
+        num_vertices = len(mesh.vertices)
+        num_loops = len(mesh.loops)
+        num_polygons = len(mesh.polygons)
+
+        vertices = np.empty((num_vertices, 3), dtype=np.float32)
+        vertex_normals = np.empty((num_vertices, 3), dtype=np.float32)
+        mesh.vertices.foreach_get('co', vertices.reshape(-1))
+        mesh.vertices.foreach_get('normal', vertex_normals.reshape(-1))
+
+        loop_vertex_indices = np.empty(num_loops, dtype=np.int32)
+        mesh.loops.foreach_get('vertex_index', loop_vertex_indices)
+
+        loop_starts = np.empty(num_polygons, dtype=np.int32)
+        loop_totals = np.empty(num_polygons, dtype=np.int32)
+        polygon_normals = np.empty((num_polygons, 3), dtype=np.float32)
+        mesh.polygons.foreach_get('loop_start', loop_starts)
+        mesh.polygons.foreach_get('loop_total', loop_totals)
+        mesh.polygons.foreach_get('normal', polygon_normals.reshape(-1))
+
+        polygon_offsets = np.zeros(num_polygons + 1, dtype=np.int32)
+        np.cumsum(loop_totals, out=polygon_offsets[1:])
+
+        # Loops are stored per corner, reorder only if polygons do not own consecutive runs of loops
+        loop_order = None
+        if not np.array_equal(loop_starts, polygon_offsets[:-1]):
+            loop_order = np.repeat(loop_starts - polygon_offsets[:-1], loop_totals) + np.arange(num_loops, dtype=np.int32)
+            loop_vertex_indices = loop_vertex_indices[loop_order]
+
+        uv_layers = {}
+        for uv_layer in mesh.uv_layers:
+            uv_coords = np.empty((num_loops, 2), dtype=np.float32)
+            uv_layer.data.foreach_get('uv', uv_coords.reshape(-1))
+            uv_layers[uv_layer.name] = uv_coords if loop_order is None else uv_coords[loop_order]
+
+        shape_key_names = []
+        shape_keys = None
+        if mesh.shape_keys is not None:
+            key_blocks = mesh.shape_keys.key_blocks
+            shape_key_names = [kb.name for kb in key_blocks]
+            shape_keys = np.empty((len(key_blocks), num_vertices, 3), dtype=np.float32)
+            for ii, kb in enumerate(key_blocks):
+                kb.data.foreach_get('co', shape_keys[ii].reshape(-1))
+
+        return cls(
+            mesh_name=mesh.name,
+            vertices=vertices,
+            vertex_normals=vertex_normals,
+            loop_vertex_indices=loop_vertex_indices,
+            polygon_offsets=polygon_offsets,
+            polygon_normals=polygon_normals,
+            uv_layers=uv_layers,
+            shape_key_names=shape_key_names,
+            shape_keys=shape_keys,
+        )
+
+
+def __get_mesh_fingerprint(mesh: bpy.types.Mesh) -> tuple:
+    """Cheap fingerprint of a mesh: element counts, layer names and a checksum
+    of a strided sample of vertex (and shape-key) coordinates.
+
+    Edits that keep the counts and do not touch any sampled vertex are not detected,
+    call invalidate_mesh_arrays() after such edits.
+    """
+    num_vertices = len(mesh.vertices)
+    sample_indices = np.unique(np.linspace(0, num_vertices - 1, FINGERPRINT_NUM_SAMPLES).astype(np.int64)) \
+        if num_vertices else []
+
+    checksum = 0
+    for idx in sample_indices:
+        checksum = zlib.crc32(np.asarray(mesh.vertices[idx].co, dtype=np.float32).tobytes(), checksum)
+
+    key_block_names = ()
+    if mesh.shape_keys is not None:
+        key_blocks = mesh.shape_keys.key_blocks
+        key_block_names = tuple(key_blocks.keys())
+        for kb in key_blocks:
+            for idx in sample_indices:
+                checksum = zlib.crc32(np.asarray(kb.data[idx].co, dtype=np.float32).tobytes(), checksum)
+
+    return (
+        num_vertices,
+        len(mesh.edges),
+        len(mesh.loops),
+        len(mesh.polygons),
+        tuple(mesh.uv_layers.keys()),
+        key_block_names,
+        checksum,
+    )
+
+
+def get_mesh_arrays(mesh_obj_name: str, use_cache: bool = True) -> MeshArrays:
+    """Get a MeshArrays snapshot of a mesh object.
+
+    Snapshots are kept in an LRU cache keyed by the mesh data-block name and a cheap
+    fingerprint (element counts plus a sampled checksum), so repeated reads of an
+    unchanged mesh return the cached snapshot without walking the mesh again.
+
+    The returned arrays are shared with the cache, do not modify them in place.
+
+    Parameters:
+        mesh_obj_name: Name of the mesh object.
+        use_cache: If False, always extract a new snapshot (and refresh the cache).
+
+    Returns:
+        mesh_arrays: MeshArrays snapshot.
+    """
+    obj = bpy.data.objects.get(mesh_obj_name)
+    assert obj is not None, f"Object '{mesh_obj_name}' not found."
+    assert obj.type == 'MESH', f"Object '{mesh_obj_name}' is not a mesh."
+
+    # Flush edit-mode changes into the mesh data
+    obj.update_from_editmode()
+
+    mesh = obj.data
+    fingerprint = __get_mesh_fingerprint(mesh)
+
+    if use_cache and mesh.name in _mesh_arrays_cache:
+        cached_fingerprint, mesh_arrays = _mesh_arrays_cache[mesh.name]
+        if cached_fingerprint == fingerprint:
+            _mesh_arrays_cache.move_to_end(mesh.name)
+            return mesh_arrays
+
+    mesh_arrays = MeshArrays.from_mesh(mesh)
+
+    _mesh_arrays_cache[mesh.name] = (fingerprint, mesh_arrays)
+    _mesh_arrays_cache.move_to_end(mesh.name)
+    while len(_mesh_arrays_cache) > MESH_ARRAYS_CACHE_SIZE:
+        _mesh_arrays_cache.popitem(last=False)
+
+    return mesh_arrays
+
+
+def invalidate_mesh_arrays(mesh_obj_name: str | None = None) -> None:
+    """Drop cached MeshArrays snapshots.
+
+    Parameters:
+        mesh_obj_name: Name of the mesh object whose snapshot is dropped, if None, the whole cache is cleared.
+    """
+    if mesh_obj_name is None:
+        _mesh_arrays_cache.clear()
+        return
+
+    obj = bpy.data.objects.get(mesh_obj_name)
+    mesh_name = obj.data.name if obj is not None and obj.type == 'MESH' else mesh_obj_name
+    _mesh_arrays_cache.pop(mesh_name, None)
+
+
+if __name__ == "__main__":
+    import time
+
+    mesh_obj_name = 'Cube'
+
+    for ii in range(3):
+        t0 = time.perf_counter()
+        mesh_arrays = get_mesh_arrays(mesh_obj_name)
+        print(f'---> read #{ii}: {time.perf_counter() - t0:.6f} seconds')
+
+    print(f'---> num_vertices: {mesh_arrays.num_vertices}')
+    print(f'---> num_polygons: {mesh_arrays.num_polygons}')
+    print(f'---> uv_layers: {list(mesh_arrays.uv_layers.keys())}')
+    print(f'---> shape_key_names: {mesh_arrays.shape_key_names}')
+
+    invalidate_mesh_arrays(mesh_obj_name)
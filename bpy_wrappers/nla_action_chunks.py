@@ -0,0 +1,197 @@
+"""Keyframe very long takes as consecutive NLA strips of fixed-length actions.
+
+Each action holds at most `max_frames_per_action` frames, so the fcurves stay small for the
+editors and when saving, and every strip plays its keys at their original frames.
+
+Author: zhaoyafei0210@gmail.com
+"""
+import bpy
+import numpy as np
+
+from bpy_wrappers.bulk_fcurves import get_or_create_fcurve, set_fcurve_keyframes
+from utils.keyframe_reduction import print_reduction_stats, reduce_keyframes
+
+
+__all__ = ['clear_nla_track', 'keyframe_action', 'keyframe_action_chunks', 'push_actions_to_nla']
+
+
+def clear_nla_track(id_data: bpy.types.ID, track_name: str) -> None:
+    """Remove the NLA track named track_name of id_data, and the actions of its strips left without users.
+
+    Call it before keying a take onto the track again, push_actions_to_nla() appends to an existing track.
+    """
+    anim_data = id_data.animation_data
+    if anim_data is None:
+        return
+
+    track = anim_data.nla_tracks.get(track_name)
+    if track is None:
+        return
+
+    actions = {strip.action for strip in track.strips if strip.action is not None}
+    anim_data.nla_tracks.remove(track)
+
+    # Actions still on the tracks of other IDs are kept until their last track is removed
+    for action in actions:
+        if action.users == 0:
+            bpy.data.actions.remove(action)
+
+
+def push_actions_to_nla(
+        id_data: bpy.types.ID,
+        actions: list[bpy.types.Action],
+        track_name: str | None = None
+) -> bpy.types.NlaTrack:
+    """Place actions as consecutive strips on an NLA track, each strip starts at the first key of its action.
+
+    Parameters:
+        id_data: animated ID, e.g. mesh_obj.data.shape_keys or an armature object.
+        actions: actions sorted by frame range, with non-overlapping frame ranges,
+            after the strips already on the track.
+        track_name: name of the NLA track, the strips are appended if the track exists,
+            default is a new track named after the first action.
+
+    Returns:
+        track: bpy.types.NlaTrack.
+    """
+    anim_data = id_data.animation_data
+    if anim_data is None:
+        anim_data = id_data.animation_data_create()
+
+    track = anim_data.nla_tracks.get(track_name) if track_name else None
+    if track is None:
+        track = anim_data.nla_tracks.new()
+        if track_name or actions:
+            track.name = track_name or actions[0].name
+
+    for action in actions:
+        strip = track.strips.new(action.name, int(action.frame_range[0]), action)
+
+        # Layered actions (Blender 4.4+) need the slot the fcurves were written to
+        if hasattr(strip, 'action_slot') and len(action.slots):
+            strip.action_slot = action.slots[0]
+
+        # Hold the last frame of a strip until the next one starts, only the first strip may hold backwards
+        strip.extrapolation = 'HOLD' if len(track.strips) == 1 else 'HOLD_FORWARD'
+
+    return track
+
+
+def keyframe_action(
+        id_data: bpy.types.ID,
+        channels: list[tuple[str, int, str | None]],
+        values: np.ndarray,
+        start_frame: int,
+        action_name: str,
+        interpolation: str | None = None,
+        tolerance: float | None = None
+) -> bpy.types.Action:
+    """Keyframe a (T, C) array into a new action, frame `start_frame + t` gets values[t].
+
+    The action is not left assigned to id_data, push it to the NLA with push_actions_to_nla().
+
+    Parameters:
+        id_data, channels, interpolation, tolerance: see keyframe_action_chunks().
+        values: array with shape (#num_frames, #num_channels).
+        start_frame: frame of values[0].
+        action_name: name of the new action.
+
+    Returns:
+        action: the new bpy.types.Action.
+    """
+    values = np.asarray(values, dtype=np.float32)
+    assert values.ndim == 2 and values.shape[1] == len(channels), \
+        f"Invalid shape of values, must be (#num_frames, {len(channels)}), but got {values.shape}."
+
+    anim_data = id_data.animation_data
+    if anim_data is None:
+        anim_data = id_data.animation_data_create()
+
+    action = bpy.data.actions.new(name=action_name)
+    # Assign the action, so that layered actions (Blender 5.0+) get a slot for id_data
+    anim_data.action = action
+
+    frames = start_frame + np.arange(len(values))
+    kept_indices = [slice(None)] * len(channels)
+    if tolerance is not None and len(values):
+        kept_indices, stats = reduce_keyframes(values.T, tolerance)
+        print_reduction_stats(stats, [f'{data_path}[{index}]' for data_path, index, _ in channels])
+        if interpolation is None:
+            interpolation = 'LINEAR'
+
+    for ii, (data_path, index, group_name) in enumerate(channels):
+        fcurve = get_or_create_fcurve(action, data_path, index, group_name, id_data=id_data)
+        kept = kept_indices[ii]
+        set_fcurve_keyframes(fcurve, frames[kept], values[kept, ii], interpolation, replace=True)
+
+    anim_data.action = None
+
+    return action
+
+
+def keyframe_action_chunks(
+        id_data: bpy.types.ID,
+        channels: list[tuple[str, int, str | None]],
+        values: np.ndarray,
+        start_frame: int = 1,
+        max_frames_per_action: int = 10000,
+        action_name: str | None = None,
+        interpolation: str | None = None,
+        tolerance: float | None = None
+) -> list[bpy.types.Action]:
+    """Keyframe a (T, C) array as actions of at most max_frames_per_action frames, placed as consecutive NLA strips.
+
+    Frame `start_frame + t` gets values[t], like keyframing the whole array into a single action.
+    The active action of id_data is cleared, so that only the NLA track is evaluated.
+    An existing NLA track named action_name is replaced, see clear_nla_track().
+
+    Parameters:
+        id_data: animated ID, e.g. mesh_obj.data.shape_keys or an armature object.
+        channels: one (data_path, array_index, group_name) per column of values,
+            e.g. ('key_blocks["jawOpen"].value', 0, None) or ('pose.bones["Head"].rotation_quaternion', 1, 'Head').
+        values: array with shape (#num_frames, #num_channels).
+        start_frame: frame of values[0].
+        max_frames_per_action: max. number of frames of each action.
+        action_name: prefix of the action names, default is id_data.name + 'Action', the actions are
+            named '{action_name}_000', '{action_name}_001', ...
+        interpolation: interpolation of the keys, see bulk_fcurves.make_keyframes().
+        tolerance: if set, only write the keys needed to stay within this error of each column
+            (see utils.keyframe_reduction), with 'LINEAR' interpolation unless `interpolation` is given.
+
+    Returns:
+        actions: list of the new actions.
+    """
+    assert max_frames_per_action > 0, "max_frames_per_action must be positive."
+
+    action_name = action_name or f'{id_data.name}Action'
+    num_frames = len(values)
+
+    # Replace the strips of a previous run instead of appending at the same frames
+    clear_nla_track(id_data, action_name)
+
+    actions = [
+        keyframe_action(
+            id_data, channels, values[chunk_start:chunk_start + max_frames_per_action],
+            start_frame + chunk_start, f'{action_name}_{chunk_idx:03d}', interpolation, tolerance)
+        for chunk_idx, chunk_start in enumerate(range(0, num_frames, max_frames_per_action))
+    ]
+
+    push_actions_to_nla(id_data, actions, action_name)
+
+    print(f"---> Keyframed {num_frames} frames of '{id_data.name}' as {len(actions)} NLA strips")
+
+    return actions
+
+
+if __name__ == "__main__":
+    mesh_name = 'Cube'
+    key_name = 'Key 1'
+
+    shape_keys = bpy.data.objects[mesh_name].data.shape_keys
+    data_path = shape_keys.key_blocks[key_name].path_from_id('value')
+
+    frames = np.arange(100000)
+    values = (0.5 - 0.5 * np.cos(frames / 120 * 2 * np.pi))[:, None]
+
+    actions = keyframe_action_chunks(shape_keys, [(data_path, 0, None)], values, max_frames_per_action=20000)
+    print(f'---> actions: {[action.name for action in actions]}')
@@ -0,0 +1,150 @@
+"""Convert shape keys (blendshapes) of a mesh object to and from sparse deltas.
+
+Author: zhaoyafei0210@gmail.com
+"""
+import bpy
+import numpy as np
+
+from bpy_wrappers.get_shape_key_names import get_shape_keys_as_numpy
+from utils.sparse_shape_key_deltas import (
+    dense_to_sparse_deltas,
+    get_sparse_delta,
+    get_sparse_deltas_compression_ratio
+)
+
+
+__all__ = ['get_shape_keys_as_sparse_deltas', 'set_shape_keys_from_sparse_deltas']
+
+
+def get_shape_keys_as_sparse_deltas(
+        obj_name: str,
+        tolerance: float = 1e-5,
+        dtype: type | np.dtype = np.float16
+) -> dict:
+    """Get all shape keys of a mesh object as sparse deltas relative to the Basis.
+
+    Parameters:
+        obj_name: Name of the mesh object.
+        tolerance: a vertex is kept for a shape key if its displacement is larger than tolerance.
+        dtype: np.float16 or np.float32, dtype of the stored deltas.
+
+    Returns:
+        dict: the sparse deltas (see utils.sparse_shape_key_deltas.dense_to_sparse_deltas()), plus:
+            - 'names': list of shape-key names
+            - 'basis': float32 array with shape (#num_vertices, 3), coordinates of the Basis
+            - 'relative_key_indices', 'slider_min', 'slider_max', 'reference_key_index':
+              as returned by get_shape_keys_as_numpy()
+            - 'compression_ratio': compression ratio against dense float32 deltas
+    """
+    shape_key_data = get_shape_keys_as_numpy(obj_name, relative=False)
+
+    reference_key_index = shape_key_data['reference_key_index']
+    vertices = shape_key_data['vertices']
+    basis = vertices[reference_key_index].copy()
+
+    # Deltas relative to the Basis, in place to avoid a second (K, V, 3) array
+    vertices -= basis
+    sparse_deltas = dense_to_sparse_deltas(vertices, tolerance, dtype)
+    del vertices, shape_key_data['vertices']
+
+    sparse_deltas.update(shape_key_data)
+    sparse_deltas['basis'] = basis
+    sparse_deltas['compression_ratio'] = get_sparse_deltas_compression_ratio(sparse_deltas)
+
+    print(f"---> {len(sparse_deltas['names'])} shape keys of '{obj_name}' with "
+          f"{len(sparse_deltas['indices'])} non-zero deltas, "
+          f"compression ratio: {sparse_deltas['compression_ratio']:.1f}x")
+
+    return sparse_deltas
+
+
+def set_shape_keys_from_sparse_deltas(
+        obj_name: str,
+        sparse_deltas: dict,
+        basis: np.ndarray | None = None
+) -> list[str]:
+    """Create or update the shape keys of a mesh object from sparse deltas.
+
+    Existing key blocks with the same names are overwritten, missing ones are created.
+    The Basis (reference key) itself is not modified.
+
+    Parameters:
+        obj_name: Name of the mesh object, must have #num_vertices vertices.
+        sparse_deltas: sparse deltas with 'names', as returned by get_shape_keys_as_sparse_deltas().
+        basis: optional Basis coordinates with shape (#num_vertices, 3),
+            default is the current reference key (or the mesh vertices) of the object.
+
+    Returns:
+        List of shape key names.
+    """
+    obj = bpy.data.objects.get(obj_name)
+    assert obj is not None, f"Object '{obj_name}' not found."
+    assert obj.type == 'MESH', f"Object '{obj_name}' is not a mesh."
+
+    num_vertices = len(obj.data.vertices)
+    assert sparse_deltas['num_vertices'] == num_vertices, \
+        f"Sparse deltas have {sparse_deltas['num_vertices']} vertices, but '{obj_name}' has {num_vertices}."
+
+    # Ensure the object has a basis shape key
+    if obj.data.shape_keys is None:
+        obj.shape_key_add(name="Basis")
+
+    shape_keys = obj.data.shape_keys
+    key_blocks = shape_keys.key_blocks
+
+    if basis is None:
+        basis = np.empty((num_vertices, 3), dtype=np.float32)
+        shape_keys.reference_key.data.foreach_get('co', basis.reshape(-1))
+    else:
+        basis = np.asarray(basis, dtype=np.float32)
+        assert basis.shape == (num_vertices, 3), \
+            f"Invalid shape of basis, must be ({num_vertices}, 3), but got {basis.shape}."
+
+    names = sparse_deltas['names']
+    reference_key_index = sparse_deltas.get('reference_key_index', 0)
+
+    # Only one (V, 3) buffer is used at a time
+    co = np.empty_like(basis)
+
+    for ii, name in enumerate(names):
+        if ii == reference_key_index:
+            continue
+
+        key_block = key_blocks.get(name)
+        if key_block is None:
+            key_block = obj.shape_key_add(name=name, from_mix=False)
+
+        indices, deltas = get_sparse_delta(sparse_deltas, ii)
+        co[:] = basis
+        co[indices] += deltas
+
+        key_block.data.foreach_set('co', co.reshape(-1))
+
+    # Restore the key settings once all key blocks exist
+    if 'relative_key_indices' in sparse_deltas:
+        for ii, name in enumerate(names):
+            if ii == reference_key_index:
+                continue
+
+            key_block = key_blocks[name]
+            key_block.slider_max = sparse_deltas['slider_max'][ii]
+            key_block.slider_min = sparse_deltas['slider_min'][ii]
+
+            relative_key_name = names[sparse_deltas['relative_key_indices'][ii]]
+            if relative_key_name in key_blocks:
+                key_block.relative_key = key_blocks[relative_key_name]
+
+    obj.data.update()
+
+    return names
+
+
+if __name__ == "__main__":
+    obj_name = 'Cube'
+
+    sparse_deltas = get_shape_keys_as_sparse_deltas(obj_name, tolerance=1e-5)
+    print(f"---> names: {sparse_deltas['names']}")
+    print(f"---> compression ratio: {sparse_deltas['compression_ratio']:.1f}x")
+
+    names = set_shape_keys_from_sparse_deltas(obj_name, sparse_deltas)
+    print(f'---> restored shape keys: {names}')
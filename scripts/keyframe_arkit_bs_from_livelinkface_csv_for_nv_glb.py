@@ -6,53 +6,24 @@ Author: zhaoyafei0210@gmail.com
 """
 import bpy
 import mathutils
-import csv
+import os.path as osp
+import sys
 
+import numpy as np
 
+sys.path.append(osp.join(osp.dirname(osp.abspath(__file__)), "../"))
 
-def load_livelinkface_csv(csv_path: str) -> dict:
-    '''
-    Load and parse the contents of a LiveLinkFace CSV file from the specified path.
-
-    This function reads the CSV file, extracts the header row and all data rows.
-
-    Parameters:
-    csv_path (str): The path to the CSV file
-
-    Returns:
-    dict: A dictionary containing:
-        - 'time_codes': List of time codes
-        - 'blendshape_names': List of blendshape names
-        - 'blendshape_frames': List of blendshape data rows
-        - 'joint_names': List of joint names
-        - 'joint_frames': List of joint data rows
-    '''
-    time_codes = []
-    bs_names = []
-    bs_frames = []
-    joint_frames = []
-    time_codes = []
-
-    with open(csv_path, 'r') as csv_file:
-        csv_reader = csv.reader(csv_file)
-
-        row = next(csv_reader)
-        bs_names = row[2:-9]
-        joint_names = row[-9:]
-
-
-        for row in csv_reader:
-            time_codes.append(row[0])
-            bs_frames.append([float(item) for item in row[2:-9]])
-            joint_frames.append([float(item) for item in row[-9:]])
-
-    return {
-        'time_codes': time_codes,
-        'blendshape_names': bs_names,
-        'blendshape_frames': bs_frames,
-        'joint_names': joint_names,
-        'joint_frames': joint_frames
-    }
+from bpy_wrappers.action_snapshot_cache import (
+    get_action_cache_path,
+    load_actions_from_cache,
+    save_actions_to_cache
+)
+from bpy_wrappers.fan_out_shape_key_action import fan_out_shape_key_action
+from bpy_wrappers.keyframe_pose_bones import keyframe_pose_bones_bulk
+from bpy_wrappers.keyframe_shape_keys import keyframe_shape_keys
+from utils.capture_batch import ingest_capture_takes
+from utils.capture_csv import load_livelinkface_csv
+from utils.capture_resample import resample_capture
 
 
 def print_bs_keyframe_at(bpy_obj_name, frame_id=0):
@@ -162,23 +133,25 @@ def keyframe_arkit_bs_from_csv_file(
     start_frame=1,
     time_downsample_rate=2,
     armature_obj_name=None,
-    bone_name_list=[]
+    bone_name_list=[],
+    cache_dir=None,
+    target_fps=None,
+    timecode_fps=60,
+    tolerance=None
 ):
     """Read arkit bs list from a .csv file and keyframe them on to a rigged character.
 
     arkit_rigged_mesh_obj_names: list of str, arkit 51-bs rigged mesh objects
     csv_path:      input .csv file with LiveLinkeFace-captured ARKit BS.
+    cache_dir:     if set, the baked actions are saved as .npz snapshots into cache_dir,
+                   and restored instead of keyframed again for the same csv, objects and parameters.
+    target_fps:    if set, resample the take onto an exact target_fps frame grid by its time codes
+                   (see utils.capture_resample.resample_capture()) instead of keeping every time_downsample_rate-th row.
+    timecode_fps:  frame rate of the FF field of the 'HH:MM:SS:FF.mmm' time codes, used with target_fps.
+    tolerance:     if set, write the keys in bulk, only those needed to stay within this error of the values
+                   (see utils.keyframe_reduction), instead of keyframe_insert() at every frame.
     """
 
-    loaded_anim_data = load_livelinkface_csv(csv_path)
-
-    # time_downsample_rate = 2  # 60fps->30fps
-    # time_downsample_rate = 1
-    frame_num = len(loaded_anim_data['blendshape_frames']) // time_downsample_rate
-
-    # livelikeface_data_keys = dataframe.keys().to_list()
-    # pose_keys = livelikeface_data_keys[-9:]
-
     if arkit_rigged_mesh_obj_names:
         first_keyframed_obj_name = arkit_rigged_mesh_obj_names[0]
         if not is_valid_object(first_keyframed_obj_name, 'MESH'):  
@@ -192,49 +165,186 @@ def keyframe_arkit_bs_from_csv_file(
     if not first_keyframed_obj_name and not armature_obj_name:
         raise Exception('Error: Must have at least one valid "MESH" object or one "ARMATURE" object')
 
-    for ii in range(frame_num):
-        frame_idx = ii*time_downsample_rate
-        frame_data = loaded_anim_data['blendshape_frames'][frame_idx]
-        arkit_bs = dict(zip(loaded_anim_data['blendshape_names'], frame_data))
+    cache_path = None
+    metadata = None
+
+    if cache_dir:
+        cache_path = get_action_cache_path(
+            cache_dir,
+            csv_path,
+            [*arkit_rigged_mesh_obj_names, armature_obj_name],
+            {
+                'start_frame': start_frame,
+                'time_downsample_rate': time_downsample_rate,
+                'bone_name_list': bone_name_list,
+                'target_fps': target_fps,
+                'timecode_fps': timecode_fps,
+                'tolerance': tolerance
+            }
+        )
+
+        cache_id_datas = {}
+        if first_keyframed_obj_name:
+            cache_id_datas['shape_keys'] = bpy.data.objects[first_keyframed_obj_name].data.shape_keys
+        if armature_obj_name:
+            cache_id_datas['armature'] = bpy.data.objects[armature_obj_name]
+
+        metadata = load_actions_from_cache(cache_path, cache_id_datas)
+
+    if metadata is not None:
+        cur_key_frame_id = metadata['end_frame']
+    elif tolerance is not None:
+        cur_key_frame_id = keyframe_arkit_bs_from_csv_files(
+            arkit_rigged_mesh_obj_names[:1], [csv_path], start_frame, time_downsample_rate, armature_obj_name,
+            bone_name_list, target_fps=target_fps, timecode_fps=timecode_fps, max_workers=0, tolerance=tolerance)
+    else:
+        loaded_anim_data = load_livelinkface_csv(csv_path)
+
+        if target_fps:
+            loaded_anim_data = resample_capture(loaded_anim_data, target_fps, 'livelinkface', timecode_fps)
+            time_downsample_rate = 1
 
-        cur_key_frame_id = ii+start_frame
+        # time_downsample_rate = 2  # 60fps->30fps
+        # time_downsample_rate = 1
+        frame_num = len(loaded_anim_data['blendshape_frames']) // time_downsample_rate
 
-        # print('arkit_bs: ')
-        # print(arkit_bs)
-        insert_bs_keyframe_at(first_keyframed_obj_name, arkit_bs, cur_key_frame_id)
+        # livelikeface_data_keys = dataframe.keys().to_list()
+        # pose_keys = livelikeface_data_keys[-9:]
+
+        for ii in range(frame_num):
+            frame_idx = ii*time_downsample_rate
+            frame_data = loaded_anim_data['blendshape_frames'][frame_idx]
+            arkit_bs = dict(zip(loaded_anim_data['blendshape_names'], frame_data))
+
+            cur_key_frame_id = ii+start_frame
+
+            # print('arkit_bs: ')
+            # print(arkit_bs)
+            insert_bs_keyframe_at(first_keyframed_obj_name, arkit_bs, cur_key_frame_id)
  
-        pose_data_list = loaded_anim_data['joint_frames'][frame_idx]
+            pose_data_list = loaded_anim_data['joint_frames'][frame_idx]
+
+            # print('Pose Data: ')
+            # print(pose_data.to_dict())
 
-        # print('Pose Data: ')
-        # print(pose_data.to_dict())
+            insert_pose_keyframe_at(
+                armature_obj_name, pose_data_list, cur_key_frame_id, bone_name_list)
 
-        insert_pose_keyframe_at(
-            armature_obj_name, pose_data_list, cur_key_frame_id, bone_name_list)
+    if metadata is None and cache_path:
+        save_actions_to_cache(
+            cache_path, cache_id_datas, {'end_frame': cur_key_frame_id}, (start_frame, cur_key_frame_id))
 
     if len(arkit_rigged_mesh_obj_names)>1:
-        print('---> Get animation_data.action of MESH object: ', first_keyframed_obj_name)
-        action = bpy.data.objects[first_keyframed_obj_name].data.shape_keys.animation_data.action
+        print('---> Share animation_data.action of MESH object: ', first_keyframed_obj_name)
 
+        target_mesh_obj_names = []
         for mesh_obj_name in arkit_rigged_mesh_obj_names[1:]:
             if not is_valid_object(mesh_obj_name, 'MESH'):
                 print('==> Skip invalid MESH object: ', mesh_obj_name)
                 continue
 
-            # set to the first mesh's animation_data.action
-            print('---> Set MESH object "{}" animation data to the animation data of "{}" : '.format(mesh_obj_name, first_keyframed_obj_name))
+            target_mesh_obj_names.append(mesh_obj_name)
 
-            anim_data = bpy.data.objects[mesh_obj_name].data.shape_keys.animation_data
-
-            if not anim_data:
-                anim_data = bpy.data.objects[mesh_obj_name].data.shape_keys.animation_data_create()
-            
-            anim_data.action = action
+        # the first mesh's action, or one copy with remapped data paths per other shape key naming scheme
+        fan_out_shape_key_action(first_keyframed_obj_name, target_mesh_obj_names)
 
     # bpy.ops.object.mode_set(mode='OBJECT', toggle=False)
 
     return cur_key_frame_id
 
 
+def keyframe_arkit_bs_from_csv_files(
+    arkit_rigged_mesh_obj_names,
+    csv_path_list,
+    start_frame=1,
+    time_downsample_rate=2,
+    armature_obj_name=None,
+    bone_name_list=[],
+    frame_gap=15,
+    target_fps=None,
+    timecode_fps=60,
+    max_workers=None,
+    tolerance=None
+):
+    """Read arkit bs lists from .csv files and keyframe them back to back on to a rigged character.
+
+    Take k starts frame_gap frames after the last frame of take k-1. The takes are parsed, resampled
+    and filtered in worker processes (see utils.capture_batch.ingest_capture_takes()),
+    only the bulk fcurve writes run in Blender. The last keyframed frame is returned.
+
+    max_workers:   number of worker processes, default is os.cpu_count(), 0 to parse in Blender's process.
+    tolerance:     if set, only write the keys needed to stay within this error of the values, see utils.keyframe_reduction.
+    """
+    if not bone_name_list:
+        bone_name_list = ['Head', 'LeftEye', 'RightEye']
+
+    take_kwargs = {
+        'csv_format': 'livelinkface',
+        'time_downsample_rate': time_downsample_rate,
+        'target_fps': target_fps,
+        'timecode_fps': timecode_fps
+    }
+
+    first_keyframed_obj_name = ""
+    if arkit_rigged_mesh_obj_names:
+        first_keyframed_obj_name = arkit_rigged_mesh_obj_names[0]
+        if not is_valid_object(first_keyframed_obj_name, 'MESH'):
+            raise Exception('Error: Invalid "MESH" object: ', first_keyframed_obj_name)
+
+        take_kwargs['blendshape_names'] = bpy.data.objects[first_keyframed_obj_name].data.shape_keys.key_blocks.keys()
+
+    if armature_obj_name:
+        if not is_valid_object(armature_obj_name, "ARMATURE"):
+            raise Exception('Error: Invalid "ARMATURE" object: ', armature_obj_name)
+
+        # rest pose of each bone in world space, see angles_to_bone_quaternions()
+        bpy_obj = bpy.data.objects[armature_obj_name]
+        arm_matrix_world = bpy_obj.matrix_world.to_3x3()
+        take_kwargs['bone_rest_quaternions'] = [
+            list((arm_matrix_world @ bpy_obj.data.bones[bone_name].matrix_local.to_3x3()).to_quaternion())
+            for bone_name in bone_name_list
+        ]
+
+    takes = ingest_capture_takes(csv_path_list, start_frame, frame_gap, max_workers, **take_kwargs)
+    if not takes:
+        return start_frame - 1
+
+    # All takes are written at once, so each fcurve is rebuilt once instead of merged once per take
+    frames = np.concatenate([take['start_frame'] + np.arange(take['num_frames']) for take in takes])
+
+    if first_keyframed_obj_name:
+        blendshape_names = takes[0]['blendshape_names']
+        for take in takes[1:]:
+            if take['blendshape_names'] != blendshape_names:
+                raise Exception('Error: Different blendshape columns in: ', take['csv_path'])
+
+        keyframe_shape_keys(
+            first_keyframed_obj_name, blendshape_names,
+            np.concatenate([take['blendshape_values'] for take in takes], axis=1), start_frame,
+            tolerance=tolerance, frames=frames)
+
+    if armature_obj_name:
+        keyframe_pose_bones_bulk(
+            armature_obj_name, bone_name_list,
+            np.concatenate([take['bone_rotations'] for take in takes], axis=1), 'QUATERNION', start_frame,
+            tolerance=tolerance, frames=frames)
+
+    end_frame = takes[-1]['end_frame']
+
+    if len(arkit_rigged_mesh_obj_names)>1:
+        target_mesh_obj_names = []
+        for mesh_obj_name in arkit_rigged_mesh_obj_names[1:]:
+            if not is_valid_object(mesh_obj_name, 'MESH'):
+                print('==> Skip invalid MESH object: ', mesh_obj_name)
+                continue
+
+            target_mesh_obj_names.append(mesh_obj_name)
+
+        fan_out_shape_key_action(first_keyframed_obj_name, target_mesh_obj_names)
+
+    return end_frame
+
+
 def clear_keyframed_animation_data(bpy_obj_name):
     """Clear keyframed (pose) animation data
     """
@@ -289,6 +399,10 @@ if __name__ == "__main__":
     # time_downsample_rate = 2  # 60 fps -> 30 fps
     time_downsample_rate = int(input_fps / target_fps)
 
+    # resample onto an exact target_fps grid instead of dropping rows, e.g. 59.94 fps -> 30 fps or 60 fps -> 24 fps
+    resample_fps = None
+    # resample_fps = target_fps
+
     for mesh_obj in arkit_rigged_mesh_obj_names:
         clear_keyframed_animation_data(mesh_obj)
         
@@ -313,7 +427,9 @@ if __name__ == "__main__":
         start_frame,
         time_downsample_rate,
         armature_obj_name,
-        bone_name_list)
+        bone_name_list,
+        target_fps=resample_fps,
+        timecode_fps=input_fps)
 
     print('===> end keyframing arkit bs from csv file')
     print('===> end_frame: ', end_frame)
@@ -329,18 +445,13 @@ if __name__ == "__main__":
     #     r'/Users/zhaoyafei/dl-bk/LiveLinkFace_data/20210812_MySlate_11/MySlate_11_JZs_iPhone12Pro.csv'
     # ]
 
-    # start_frame = end_frame + 15
-
-    # for csv_path in csv_path_list:
-    #     # clear_all_animation_data()
-    #     end_frame = keyframe_arkit_bs_from_csv_file(
-    #         arkit_rigged_mesh_obj_names,
-    #         csv_path,
-    #         start_frame,
-    #         time_downsample_rate,
-    #         armature_obj_name,
-    #         bone_name_list)
-            
-    #     start_frame = end_frame + 15
-
-    #     print('===> end_frame: ', end_frame)
+    # end_frame = keyframe_arkit_bs_from_csv_files(
+    #     arkit_rigged_mesh_obj_names,
+    #     csv_path_list,
+    #     end_frame + 15,
+    #     time_downsample_rate,
+    #     armature_obj_name,
+    #     bone_name_list,
+    #     frame_gap=15)
+
+    # print('===> end_frame: ', end_frame)
@@ -6,53 +6,25 @@ Author: zhaoyafei0210@gmail.com
 """
 import bpy
 import mathutils
-import csv
+import os.path as osp
+import sys
 
+import numpy as np
 
-def load_nv_a2f_csv(csv_path: str) -> dict:
-    '''
-    Load and parse the contents of a Nvidia audio2face NIM returned CSV file from the specified path.
-
-    This function reads the CSV file, extracts the header row and all data rows.
-
-    Parameters:
-    csv_path (str): The path to the CSV file
+sys.path.append(osp.join(osp.dirname(osp.abspath(__file__)), "../"))
 
-    Returns:
-    dict: A dictionary containing:
-        - 'time_codes': List of time codes
-        - 'blendshape_names': List of blendshape names
-        - 'blendshape_frames': List of blendshape data rows
-        - 'joint_names': List of joint names
-        - 'joint_frames': List of joint data rows
-    '''
-    time_codes = []
-    bs_names = []
-    bs_frames = []
-    joint_frames = []
-    time_codes = []
-
-    with open(csv_path, 'r') as csv_file:
-        csv_reader = csv.reader(csv_file)
-
-        row = next(csv_reader)
-        bs_names = [item.split('.')[-1] for item in row[2:-3]] # remove prefix "blendShapes."
-        bs_names = [name[0].lower()+name[1:] for name in bs_names] # lower case the first letter
-        joint_names = [item.split('.')[-1] for item in row[-3:]] # remove prefix "blendShapes."
-        joint_names = [name[0].lower()+name[1:] for name in joint_names] # lower case the first letter
-
-        for row in csv_reader:
-            time_codes.append(row[1])
-            bs_frames.append([float(item) for item in row[2:-3]])
-            joint_frames.append([float(item) for item in row[-3:]])
-
-    return {
-        'time_codes': time_codes,
-        'blendshape_names': bs_names,
-        'blendshape_frames': bs_frames,
-        'joint_names': joint_names,
-        'joint_frames': joint_frames
-    }
+from bpy_wrappers.action_snapshot_cache import (
+    get_action_cache_path,
+    load_actions_from_cache,
+    save_actions_to_cache
+)
+from bpy_wrappers.fan_out_shape_key_action import fan_out_shape_key_action, get_shape_key_name_mapping
+from bpy_wrappers.keyframe_pose_bones import keyframe_pose_bones_bulk
+from bpy_wrappers.keyframe_shape_keys import keyframe_shape_keys
+from bpy_wrappers.nla_action_chunks import clear_nla_track, keyframe_action, push_actions_to_nla
+from utils.capture_batch import angles_to_bone_quaternions, ingest_capture_take
+from utils.capture_csv import iter_capture_csv, load_nv_a2f_csv
+from utils.capture_resample import resample_capture
 
 
 def print_bs_keyframe_at(bpy_obj_name, frame_id=0):
@@ -110,6 +82,28 @@ def insert_bs_keyframe_at(bpy_obj_name, data_dict, frame_id=1):
         #         print('frame # : %s \t value : %s' % (key.co[0], key.co[1]))
 
 
+def angles_to_bone_quaternion(angles, matrix_world):
+    """
+    Convert [yaw, pitch, roll] into a rotation quaternion in the bone's local space,
+    matrix_world is the 3x3 world matrix of the bone's rest pose
+    """
+    # LiveLinkFace's [yaw, pitch, roll] corresponds to Intrisic Rotation Order in UE4's object local space: Z/Y/-X
+    # Corres. intrinsic order in Blender's world space: -Z/-X/Y = [yaw, pitch, roll], extrinsic order in Blender: Y/-X/-Z
+    r1, r2, r3 = angles
+    xyz_angles = [-r2, r3, -r1]
+    rot_order = 'ZXY'
+    # create a new euler with default axis rotation order
+    # mathutils.Euler() uses extrinsic rotation order, but the input angles are always in 'xyz' order
+    eul = mathutils.Euler(xyz_angles, rot_order[::-1])
+
+    # eul = mathutils.Euler(xyz_angles, rot_order[::-1])
+    rot_mat = eul.to_matrix().to_3x3()
+    rot_mat = (matrix_world.inverted() @ rot_mat @
+               matrix_world)  # to bone's local space
+
+    return rot_mat.to_quaternion()
+
+
 def insert_pose_keyframe_at(bpy_obj_name, pose_data_list, frame_id=1, bone_name_list=[]):
     """
     Keyframe pose data from .csv file exported from LiveLinkFace
@@ -132,22 +126,8 @@ def insert_pose_keyframe_at(bpy_obj_name, pose_data_list, frame_id=1, bone_name_
     for i, bone_name in enumerate(bone_name_list):
         offset = i*3
 
-        # LiveLinkFace's [yaw, pitch, roll] corresponds to Intrisic Rotation Order in UE4's object local space: Z/Y/-X
-        # Corres. intrinsic order in Blender's world space: -Z/-X/Y = [yaw, pitch, roll], extrinsic order in Blender: Y/-X/-Z
-        r1, r2, r3 = pose_data_list[offset:offset+3]
-        xyz_angles = [-r2, r3, -r1]
-        rot_order = 'ZXY'
-        # create a new euler with default axis rotation order
-        # mathutils.Euler() uses extrinsic rotation order, but the input angles are always in 'xyz' order
-        eul = mathutils.Euler(xyz_angles, rot_order[::-1])
-
-        # eul = mathutils.Euler(xyz_angles, rot_order[::-1])
-        rot_mat = eul.to_matrix().to_3x3()
         matrix_world = arm_matrix_world @ bones[bone_name].matrix_local.to_3x3()
-        rot_mat = (matrix_world.inverted() @ rot_mat @
-                   matrix_world)  # to bone's local space
-
-        quat = rot_mat.to_quaternion()
+        quat = angles_to_bone_quaternion(pose_data_list[offset:offset+3], matrix_world)
 
         pose_bones[bone_name].rotation_quaternion = quat
         pose_bones[bone_name].keyframe_insert(
@@ -156,29 +136,166 @@ def insert_pose_keyframe_at(bpy_obj_name, pose_data_list, frame_id=1, bone_name_
         )
 
 
+def keyframe_arkit_bs_as_nla_chunks(
+    arkit_rigged_mesh_obj_names,
+    csv_path,
+    start_frame=1,
+    time_downsample_rate=2,
+    armature_obj_name=None,
+    bone_name_list=[],
+    max_frames_per_action=10000,
+    tolerance=None
+):
+    """Keyframe arkit bs and pose data of a .csv file as consecutive NLA strips of actions
+    with at most max_frames_per_action frames each, so that the fcurves of very long takes stay small.
+
+    The .csv file is streamed chunk by chunk (see utils.capture_csv.iter_capture_csv()), one action per chunk,
+    so the frames of the whole take are never held in memory (the time codes are, if a sidecar is loaded).
+    Frames are numbered as in keyframe_arkit_bs_from_csv_file(), the last frame is returned.
+    The NLA tracks and chunk actions of a previous run are replaced.
+    If tolerance is set, each chunk action only gets the keys needed to stay within this error of the values,
+    see utils.keyframe_reduction.
+    """
+    if not bone_name_list:
+        bone_name_list = ['Head', 'LeftEye', 'RightEye']
+
+    shape_keys = None
+    if arkit_rigged_mesh_obj_names:
+        shape_keys = bpy.data.objects[arkit_rigged_mesh_obj_names[0]].data.shape_keys
+
+        # the other meshes get the actions of the first mesh as NLA strips, see remapped_groups below
+        shared_shape_keys = []
+        for mesh_obj_name in arkit_rigged_mesh_obj_names[1:]:
+            if not is_valid_object(mesh_obj_name, 'MESH'):
+                print('==> Skip invalid MESH object: ', mesh_obj_name)
+                continue
+
+            shared_shape_keys.append(bpy.data.objects[mesh_obj_name].data.shape_keys)
+
+        shape_key_track_name = f'{shape_keys.name}Action'
+        for id_data in [shape_keys, *shared_shape_keys]:
+            clear_nla_track(id_data, shape_key_track_name)
+
+    bpy_obj = None
+    if armature_obj_name:
+        bpy_obj = bpy.data.objects[armature_obj_name]
+        arm_matrix_world = bpy_obj.matrix_world.to_3x3()
+
+        armature_track_name = f'{bpy_obj.name}Action'
+        clear_nla_track(bpy_obj, armature_track_name)
+
+        # rest pose of each bone in world space, see angles_to_bone_quaternions()
+        bone_rest_quaternions = []
+        bone_channels = []
+        for bone_name in bone_name_list:
+            matrix_world = arm_matrix_world @ bpy_obj.data.bones[bone_name].matrix_local.to_3x3()
+            bone_rest_quaternions.append(list(matrix_world.to_quaternion()))
+
+            data_path = bpy_obj.pose.bones[bone_name].path_from_id('rotation_quaternion')
+            bone_channels += [(data_path, index, bone_name) for index in range(4)]
+
+    # chunk_size is a multiple of time_downsample_rate, so the kept frames are the same as without chunking
+    chunk_size = max_frames_per_action * time_downsample_rate
+    cur_start_frame = start_frame
+
+    for chunk_idx, chunk in enumerate(iter_capture_csv(csv_path, 'nv_a2f', chunk_size)):
+        frame_num = len(chunk['data']) // time_downsample_rate
+        if frame_num == 0:
+            break
+
+        frame_indices = np.arange(frame_num) * time_downsample_rate
+
+        if shape_keys is not None:
+            if chunk_idx == 0:
+                key_blocks = shape_keys.key_blocks
+
+                columns = []
+                channels = []
+                for ii, bs_name in enumerate(chunk['blendshape_names']):
+                    if bs_name in key_blocks:
+                        columns.append(ii)
+                        channels.append((key_blocks[bs_name].path_from_id('value'), 0, None))
+
+                # like fan_out_shape_key_action(): meshes with the same shape key names share the actions,
+                # the others get one remapped copy per naming scheme
+                source_names = [chunk['blendshape_names'][ii] for ii in columns]
+                sharing_shape_keys = [shape_keys]
+                remapped_groups = {}
+                for id_data in shared_shape_keys:
+                    mapping = get_shape_key_name_mapping(source_names, id_data.key_blocks.keys())
+                    if all(source == target for source, target in mapping.items()):
+                        sharing_shape_keys.append(id_data)
+                        continue
+
+                    signature = tuple(sorted(mapping.items()))
+                    if signature not in remapped_groups:
+                        positions = [jj for jj, name in enumerate(source_names) if name in mapping]
+                        remapped_groups[signature] = {
+                            'id_datas': [],
+                            'positions': positions,
+                            'channels': [(f'key_blocks["{mapping[source_names[jj]]}"].value', 0, None) for jj in positions],
+                        }
+                    remapped_groups[signature]['id_datas'].append(id_data)
+
+            bs_frames = chunk['blendshape_frames'][frame_indices][:, columns]
+            action = keyframe_action(
+                shape_keys, channels, bs_frames, cur_start_frame, f'{shape_key_track_name}_{chunk_idx:03d}', tolerance=tolerance)
+
+            for id_data in sharing_shape_keys:
+                push_actions_to_nla(id_data, [action], shape_key_track_name)
+
+            for group_idx, group in enumerate(remapped_groups.values()):
+                remapped_action = keyframe_action(
+                    group['id_datas'][0], group['channels'], bs_frames[:, group['positions']], cur_start_frame,
+                    f'{shape_key_track_name}_{chunk_idx:03d}_{group_idx + 1:02d}', tolerance=tolerance)
+
+                for id_data in group['id_datas']:
+                    push_actions_to_nla(id_data, [remapped_action], shape_key_track_name)
+
+        if bpy_obj is not None:
+            joint_frames = chunk['joint_frames'][frame_indices]
+            quats = np.empty((frame_num, len(bone_name_list) * 4), dtype=np.float32)
+
+            for i, rest_quaternion in enumerate(bone_rest_quaternions):
+                quats[:, i*4:i*4+4] = angles_to_bone_quaternions(joint_frames[:, i*3:i*3+3], rest_quaternion)
+
+            action = keyframe_action(
+                bpy_obj, bone_channels, quats, cur_start_frame, f'{armature_track_name}_{chunk_idx:03d}', tolerance=tolerance)
+            push_actions_to_nla(bpy_obj, [action], armature_track_name)
+
+        print(f'---> Keyframed chunk #{chunk_idx}: frames {cur_start_frame}-{cur_start_frame + frame_num - 1}')
+        cur_start_frame += frame_num
+
+    return cur_start_frame - 1
+
+
 def keyframe_arkit_bs_from_csv_file(
     arkit_rigged_mesh_obj_names,
     csv_path,
     start_frame=1,
     time_downsample_rate=2,
     armature_obj_name=None,
-    bone_name_list=[]
+    bone_name_list=[],
+    cache_dir=None,
+    max_frames_per_action=None,
+    target_fps=None,
+    tolerance=None
 ):
     """Read arkit bs list from a .csv file and keyframe them on to a rigged character.
 
     arkit_rigged_mesh_obj_names: list of str, arkit 51-bs rigged mesh objects
     csv_path:      input .csv file with LiveLinkeFace-captured ARKit BS.
+    cache_dir:     if set, the baked actions are saved as .npz snapshots into cache_dir,
+                   and restored instead of keyframed again for the same csv, objects and parameters.
+    max_frames_per_action: if set, split the take into actions of at most max_frames_per_action frames,
+                   placed as consecutive NLA strips (see keyframe_arkit_bs_as_nla_chunks()), cache_dir is ignored.
+    target_fps:    if set, resample the take onto an exact target_fps frame grid by its time column
+                   (see utils.capture_resample.resample_capture()) instead of keeping every time_downsample_rate-th row,
+                   not supported with max_frames_per_action.
+    tolerance:     if set, write the keys in bulk, only those needed to stay within this error of the values
+                   (see utils.keyframe_reduction), instead of keyframe_insert() at every frame.
     """
 
-    loaded_anim_data = load_nv_a2f_csv(csv_path)
-
-    # time_downsample_rate = 2  # 60fps->30fps
-    # time_downsample_rate = 1
-    frame_num = len(loaded_anim_data['blendshape_frames']) // time_downsample_rate
-
-    # livelikeface_data_keys = dataframe.keys().to_list()
-    # pose_keys = livelikeface_data_keys[-9:]
-
     if arkit_rigged_mesh_obj_names:
         first_keyframed_obj_name = arkit_rigged_mesh_obj_names[0]
         if not is_valid_object(first_keyframed_obj_name, 'MESH'):  
@@ -186,49 +303,133 @@ def keyframe_arkit_bs_from_csv_file(
     else:
         first_keyframed_obj_name = ""
 
+    if max_frames_per_action and target_fps:
+        raise Exception('Error: target_fps is not supported with max_frames_per_action')
+
     if armature_obj_name and not is_valid_object(armature_obj_name, "ARMATURE"):
         raise Exception('Error: Invalid "ARMATURE" object: ', armature_obj_name)
 
     if not first_keyframed_obj_name and not armature_obj_name:
         raise Exception('Error: Must have at least one valid "MESH" object or one "ARMATURE" object')
 
-    for ii in range(frame_num):
-        frame_idx = ii*time_downsample_rate
-        frame_data = loaded_anim_data['blendshape_frames'][frame_idx]
-        arkit_bs = dict(zip(loaded_anim_data['blendshape_names'], frame_data))
+    cache_path = None
+    metadata = None
+
+    if cache_dir and not max_frames_per_action:
+        cache_path = get_action_cache_path(
+            cache_dir,
+            csv_path,
+            [*arkit_rigged_mesh_obj_names, armature_obj_name],
+            {
+                'start_frame': start_frame,
+                'time_downsample_rate': time_downsample_rate,
+                'bone_name_list': bone_name_list,
+                'target_fps': target_fps,
+                'tolerance': tolerance
+            }
+        )
+
+        cache_id_datas = {}
+        if first_keyframed_obj_name:
+            cache_id_datas['shape_keys'] = bpy.data.objects[first_keyframed_obj_name].data.shape_keys
+        if armature_obj_name:
+            cache_id_datas['armature'] = bpy.data.objects[armature_obj_name]
+
+        metadata = load_actions_from_cache(cache_path, cache_id_datas)
+
+    if max_frames_per_action:
+        return keyframe_arkit_bs_as_nla_chunks(
+            arkit_rigged_mesh_obj_names,
+            csv_path,
+            start_frame,
+            time_downsample_rate,
+            armature_obj_name,
+            bone_name_list,
+            max_frames_per_action,
+            tolerance)
+
+    if metadata is not None:
+        cur_key_frame_id = metadata['end_frame']
+    elif tolerance is not None:
+        take_kwargs = {}
+        if first_keyframed_obj_name:
+            take_kwargs['blendshape_names'] = bpy.data.objects[first_keyframed_obj_name].data.shape_keys.key_blocks.keys()
+
+        if armature_obj_name:
+            if not bone_name_list:
+                bone_name_list = ['Head', 'LeftEye', 'RightEye']
+
+            # rest pose of each bone in world space, see angles_to_bone_quaternions()
+            bpy_obj = bpy.data.objects[armature_obj_name]
+            arm_matrix_world = bpy_obj.matrix_world.to_3x3()
+            take_kwargs['bone_rest_quaternions'] = [
+                list((arm_matrix_world @ bpy_obj.data.bones[bone_name].matrix_local.to_3x3()).to_quaternion())
+                for bone_name in bone_name_list
+            ]
+
+        take = ingest_capture_take(csv_path, 'nv_a2f', time_downsample_rate, target_fps, **take_kwargs)
+
+        if first_keyframed_obj_name:
+            keyframe_shape_keys(
+                first_keyframed_obj_name, take['blendshape_names'], take['blendshape_values'], start_frame,
+                tolerance=tolerance)
+
+        if armature_obj_name:
+            keyframe_pose_bones_bulk(
+                armature_obj_name, bone_name_list, take['bone_rotations'], 'QUATERNION', start_frame,
+                tolerance=tolerance)
+
+        cur_key_frame_id = start_frame + take['num_frames'] - 1
+    else:
+        loaded_anim_data = load_nv_a2f_csv(csv_path)
+
+        if target_fps:
+            loaded_anim_data = resample_capture(loaded_anim_data, target_fps, 'nv_a2f')
+            time_downsample_rate = 1
+
+        # time_downsample_rate = 2  # 60fps->30fps
+        # time_downsample_rate = 1
+        frame_num = len(loaded_anim_data['blendshape_frames']) // time_downsample_rate
+
+        # livelikeface_data_keys = dataframe.keys().to_list()
+        # pose_keys = livelikeface_data_keys[-9:]
 
-        cur_key_frame_id = ii+start_frame
+        for ii in range(frame_num):
+            frame_idx = ii*time_downsample_rate
+            frame_data = loaded_anim_data['blendshape_frames'][frame_idx]
+            arkit_bs = dict(zip(loaded_anim_data['blendshape_names'], frame_data))
 
-        # print('arkit_bs: ')
-        # print(arkit_bs)
-        insert_bs_keyframe_at(first_keyframed_obj_name, arkit_bs, cur_key_frame_id)
+            cur_key_frame_id = ii+start_frame
+
+            # print('arkit_bs: ')
+            # print(arkit_bs)
+            insert_bs_keyframe_at(first_keyframed_obj_name, arkit_bs, cur_key_frame_id)
  
-        pose_data_list = loaded_anim_data['joint_frames'][frame_idx]
+            pose_data_list = loaded_anim_data['joint_frames'][frame_idx]
+
+            # print('Pose Data: ')
+            # print(pose_data.to_dict())
 
-        # print('Pose Data: ')
-        # print(pose_data.to_dict())
+            insert_pose_keyframe_at(
+                armature_obj_name, pose_data_list, cur_key_frame_id, bone_name_list)
 
-        insert_pose_keyframe_at(
-            armature_obj_name, pose_data_list, cur_key_frame_id, bone_name_list)
+    if metadata is None and cache_path:
+        save_actions_to_cache(
+            cache_path, cache_id_datas, {'end_frame': cur_key_frame_id}, (start_frame, cur_key_frame_id))
 
     if len(arkit_rigged_mesh_obj_names)>1:
-        print('---> Get animation_data.action of MESH object: ', first_keyframed_obj_name)
-        action = bpy.data.objects[first_keyframed_obj_name].data.shape_keys.animation_data.action
+        print('---> Share animation_data.action of MESH object: ', first_keyframed_obj_name)
 
+        target_mesh_obj_names = []
         for mesh_obj_name in arkit_rigged_mesh_obj_names[1:]:
             if not is_valid_object(mesh_obj_name, 'MESH'):
                 print('==> Skip invalid MESH object: ', mesh_obj_name)
                 continue
 
-            # set to the first mesh's animation_data.action
-            print('---> Set MESH object "{}" animation data to the animation data of "{}" : '.format(mesh_obj_name, first_keyframed_obj_name))
-
-            anim_data = bpy.data.objects[mesh_obj_name].data.shape_keys.animation_data
+            target_mesh_obj_names.append(mesh_obj_name)
 
-            if not anim_data:
-                anim_data = bpy.data.objects[mesh_obj_name].data.shape_keys.animation_data_create()
-            
-            anim_data.action = action
+        # the first mesh's action, or one copy with remapped data paths per other shape key naming scheme
+        fan_out_shape_key_action(first_keyframed_obj_name, target_mesh_obj_names)
 
     # bpy.ops.object.mode_set(mode='OBJECT', toggle=False)
 
@@ -292,6 +493,14 @@ if __name__ == "__main__":
     # time_downsample_rate = 2  # 60 fps -> 30 fps
     time_downsample_rate = int(input_fps / target_fps)
 
+    # resample onto an exact target_fps grid instead of dropping rows, e.g. 59.94 fps -> 30 fps or 60 fps -> 24 fps
+    resample_fps = None
+    # resample_fps = target_fps
+
+    # split takes longer than 10 minutes at 30 fps into NLA strips, None to keyframe a single action
+    max_frames_per_action = None
+    # max_frames_per_action = 18000
+
     for mesh_obj in arkit_rigged_mesh_obj_names:
         clear_keyframed_animation_data(mesh_obj)
 
@@ -313,7 +522,9 @@ if __name__ == "__main__":
         start_frame,
         time_downsample_rate,
         armature_obj_name,
-        bone_name_list)
+        bone_name_list,
+        max_frames_per_action=max_frames_per_action,
+        target_fps=resample_fps)
     print('===> end keyframing arkit bs from csv file')
     print('===> end_frame: ', end_frame)
     
\ No newline at end of file
@@ -0,0 +1,246 @@
+"""Evaluate blendshape (relative shape key) animation with NumPy, without Blender.
+
+Mixing follows Blender's relative shape keys:
+
+    co = basis + sum_k clamp(w_k, slider_min_k, slider_max_k) * (key_k - relative_key_k)
+
+Vertex-group masks of key blocks are not supported.
+
+Author: zhaoyafei0210@gmail.com
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+__all__ = [
+    'get_relative_key_deltas',
+    'align_weights_to_shape_keys',
+    'iter_evaluate_blendshapes',
+    'evaluate_blendshapes'
+]
+
+
+def get_relative_key_deltas(
+        deltas: np.ndarray,
+        relative_key_indices: list[int] | np.ndarray
+) -> np.ndarray:
+    """Convert deltas relative to the Basis into deltas relative to each key's relative key,
+    i.e. key_k - relative_key_k, which is what Blender mixes.
+
+    Parameters:
+        deltas: array with shape (#num_shape_keys, #num_vertices, 3), deltas relative to the Basis,
+            e.g. get_shape_keys_as_numpy(obj_name, relative=True)['vertices'].
+        relative_key_indices: index of the relative key of each shape key.
+
+    Returns:
+        array with shape (#num_shape_keys, #num_vertices, 3).
+    """
+    relative_key_indices = np.asarray(relative_key_indices)
+    if np.array_equal(relative_key_indices, np.zeros_like(relative_key_indices)):
+        return deltas
+
+    return deltas - deltas[relative_key_indices]
+
+
+def align_weights_to_shape_keys(
+        weights: np.ndarray,
+        weight_names: list[str],
+        shape_key_names: list[str],
+        case_insensitive: bool = True
+) -> np.ndarray:
+    """Reorder the columns of a weight matrix to match a list of shape keys.
+
+    Parameters:
+        weights: array with shape (#num_frames, #num_weights), e.g. the blendshape frames of a capture CSV.
+        weight_names: names of the weight columns.
+        shape_key_names: names of the shape keys, e.g. get_shape_keys_as_numpy(obj_name)['names'].
+        case_insensitive: if True, names are matched case-insensitively.
+
+    Returns:
+        float32 array with shape (#num_frames, #num_shape_keys), zeros for shape keys without a weight column.
+    """
+    if case_insensitive:
+        weight_names = [name.lower() for name in weight_names]
+        shape_key_names = [name.lower() for name in shape_key_names]
+
+    column_of = {name: ii for ii, name in enumerate(weight_names)}
+
+    aligned = np.zeros((len(weights), len(shape_key_names)), dtype=np.float32)
+    for kk, name in enumerate(shape_key_names):
+        if name in column_of:
+            aligned[:, kk] = weights[:, column_of[name]]
+
+    return aligned
+
+
+def __prepare_weights(weights, num_shape_keys, slider_min, slider_max):
+    weights = np.asarray(weights, dtype=np.float32)
+    assert weights.ndim == 2 and weights.shape[1] == num_shape_keys, \
+        f"Invalid shape of weights, must be (#num_frames, {num_shape_keys}), but got {weights.shape}."
+
+    # Blender clamps shape key values to [slider_min, slider_max]
+    if slider_min is not None or slider_max is not None:
+        lower = -np.inf if slider_min is None else np.asarray(slider_min, dtype=np.float32)
+        upper = np.inf if slider_max is None else np.asarray(slider_max, dtype=np.float32)
+        weights = np.clip(weights, lower, upper)
+
+    return weights
+
+
+def __evaluate_chunk(basis, deltas, weights, out):
+    """Evaluate frames of `weights` (n, K) into `out` (n, V, 3)."""
+    num_frames = len(weights)
+
+    if isinstance(deltas, dict):
+        # Sparse deltas: scatter-add the non-zero deltas of each key into a (V, 3, n) buffer,
+        # so each gathered vertex row holds the n frames contiguously
+        offsets, indices, values = deltas['offsets'], deltas['indices'], deltas['deltas']
+        accum = np.zeros((out.shape[1], 3, num_frames), dtype=np.float32)
+        for kk in range(len(offsets) - 1):
+            w = weights[:, kk]
+            if not np.any(w):
+                continue
+            start, end = offsets[kk], offsets[kk + 1]
+            accum[indices[start:end]] += values[start:end, :, None] * w[None, None, :]
+        np.add(accum.transpose(2, 0, 1), basis, out=out)
+    else:
+        # Dense deltas: one matmul (n, K) @ (K, V*3)
+        np.matmul(weights, deltas.reshape(len(deltas), -1), out=out.reshape(num_frames, -1))
+        out += basis
+
+    return out
+
+
+def __check_inputs(basis, deltas):
+    basis = np.asarray(basis, dtype=np.float32)
+    num_vertices = len(basis)
+    assert basis.shape == (num_vertices, 3), f"Invalid shape of basis, must be (#num_vertices, 3), but got {basis.shape}."
+
+    if isinstance(deltas, dict):
+        assert deltas['num_vertices'] == num_vertices, \
+            f"Sparse deltas have {deltas['num_vertices']} vertices, but basis has {num_vertices}."
+        num_shape_keys = len(deltas['offsets']) - 1
+        # Upcast float16 deltas once instead of once per chunk
+        deltas = dict(deltas, deltas=np.asarray(deltas['deltas'], dtype=np.float32))
+    else:
+        deltas = np.ascontiguousarray(deltas, dtype=np.float32)
+        assert deltas.ndim == 3 and deltas.shape[1:] == (num_vertices, 3), \
+            f"Invalid shape of deltas, must be (#num_shape_keys, {num_vertices}, 3), but got {deltas.shape}."
+        num_shape_keys = len(deltas)
+
+    return basis, deltas, num_shape_keys
+
+
+def iter_evaluate_blendshapes(
+        basis: np.ndarray,
+        deltas: np.ndarray | dict,
+        weights: np.ndarray,
+        slider_min: float | np.ndarray | None = None,
+        slider_max: float | np.ndarray | None = None,
+        chunk_size: int = 64
+):
+    """Evaluate blendshape animation chunk by chunk, memory is bounded by chunk_size frames.
+
+    Parameters:
+        basis: array with shape (#num_vertices, 3), coordinates of the Basis.
+        deltas: dense deltas with shape (#num_shape_keys, #num_vertices, 3), each relative to its
+            relative key (see get_relative_key_deltas()), or sparse deltas relative to the Basis
+            (see utils.sparse_shape_key_deltas).
+        weights: array with shape (#num_frames, #num_shape_keys), shape key values of each frame.
+        slider_min: None, a float or an array with shape (#num_shape_keys,).
+        slider_max: None, a float or an array with shape (#num_shape_keys,).
+        chunk_size: number of frames evaluated per chunk.
+
+    Yields:
+        (start_frame_idx, positions): positions is a float32 array with shape (#chunk_frames, #num_vertices, 3),
+            the buffer is reused between chunks, copy it if it must be kept.
+    """
+    basis, deltas, num_shape_keys = __check_inputs(basis, deltas)
+    weights = __prepare_weights(weights, num_shape_keys, slider_min, slider_max)
+
+    buffer = np.empty((min(chunk_size, len(weights)), len(basis), 3), dtype=np.float32)
+
+    for start in range(0, len(weights), chunk_size):
+        chunk_weights = weights[start:start + chunk_size]
+        yield start, __evaluate_chunk(basis, deltas, chunk_weights, buffer[:len(chunk_weights)])
+
+
+def evaluate_blendshapes(
+        basis: np.ndarray,
+        deltas: np.ndarray | dict,
+        weights: np.ndarray,
+        slider_min: float | np.ndarray | None = None,
+        slider_max: float | np.ndarray | None = None,
+        chunk_size: int = 64,
+        num_threads: int = 1,
+        out: np.ndarray | None = None
+) -> np.ndarray:
+    """Evaluate blendshape animation into a (T, V, 3) array, chunks can be evaluated by multiple threads.
+
+    Parameters:
+        basis, deltas, weights, slider_min, slider_max, chunk_size: see iter_evaluate_blendshapes().
+        num_threads: number of worker threads, default is 1. The matmul of each chunk already runs
+            on the multithreaded BLAS, so with num_threads > 1 limit the BLAS threads (e.g. OMP_NUM_THREADS,
+            OPENBLAS_NUM_THREADS or MKL_NUM_THREADS) to about os.cpu_count() // num_threads to avoid oversubscription.
+        out: optional float32 array with shape (#num_frames, #num_vertices, 3) to fill,
+            e.g. a np.memmap for takes that do not fit into memory.
+
+    Returns:
+        positions: float32 array with shape (#num_frames, #num_vertices, 3).
+    """
+    basis, deltas, num_shape_keys = __check_inputs(basis, deltas)
+    weights = __prepare_weights(weights, num_shape_keys, slider_min, slider_max)
+
+    num_frames = len(weights)
+    out_shape = (num_frames, len(basis), 3)
+
+    if out is None:
+        out = np.empty(out_shape, dtype=np.float32)
+    else:
+        assert out.shape == out_shape and out.dtype == np.float32 and out.flags['C_CONTIGUOUS'], \
+            f"out must be a C-contiguous float32 array with shape {out_shape}."
+
+    starts = range(0, num_frames, chunk_size)
+
+    def _evaluate(start):
+        end = min(start + chunk_size, num_frames)
+        __evaluate_chunk(basis, deltas, weights[start:end], out[start:end])
+
+    if num_threads <= 1 or len(starts) <= 1:
+        for start in starts:
+            _evaluate(start)
+    else:
+        # NumPy releases the GIL inside matmul and the ufuncs, chunks write to disjoint slices of out
+        with ThreadPoolExecutor(max_workers=num_threads) as executor:
+            list(executor.map(_evaluate, starts))
+
+    return out
+
+
+if __name__ == "__main__":
+    import time
+
+    from utils.sparse_shape_key_deltas import dense_to_sparse_deltas
+
+    num_frames = 600
+    num_shape_keys = 52
+    num_vertices = 20000
+
+    rng = np.random.default_rng(0)
+    basis = rng.normal(size=(num_vertices, 3)).astype(np.float32)
+    deltas = np.zeros((num_shape_keys, num_vertices, 3), dtype=np.float32)
+    for kk in range(num_shape_keys):
+        start = rng.integers(0, num_vertices - 1000)
+        deltas[kk, start:start + 1000] = rng.normal(scale=0.01, size=(1000, 3))
+    weights = rng.uniform(-0.2, 1.2, size=(num_frames, num_shape_keys)).astype(np.float32)
+
+    t0 = time.perf_counter()
+    positions = evaluate_blendshapes(basis, deltas, weights, slider_min=0.0, slider_max=1.0)
+    print(f'---> dense: {positions.shape} in {time.perf_counter() - t0:.3f} seconds')
+
+    sparse_deltas = dense_to_sparse_deltas(deltas, dtype=np.float32)
+    t0 = time.perf_counter()
+    positions2 = evaluate_blendshapes(basis, sparse_deltas, weights, slider_min=0.0, slider_max=1.0)
+    print(f'---> sparse: {positions2.shape} in {time.perf_counter() - t0:.3f} seconds')
+    print(f'---> max abs diff: {np.abs(positions - positions2).max()}')
@@ -0,0 +1,242 @@
+"""Ingest many capture takes in parallel, into arrays ready for the bulk keyframing functions.
+
+Each take is parsed (utils.capture_csv), optionally resampled to a target fps (utils.capture_resample)
+or downsampled by an integer rate, filtered to the blendshapes of the target mesh, and its joint
+angles are converted to pose-bone quaternions, all in a worker process with NumPy only.
+Only the fcurve writes are left to the main thread, all takes at once so each fcurve is written once, e.g.:
+
+    takes = ingest_capture_takes(csv_paths, start_frame=1, frame_gap=15, **take_kwargs)
+    frames = np.concatenate([take['start_frame'] + np.arange(take['num_frames']) for take in takes])
+    keyframe_shape_keys(mesh_name, takes[0]['blendshape_names'],
+                        np.concatenate([take['blendshape_values'] for take in takes], axis=1), frames=frames)
+    keyframe_pose_bones_bulk(armature_name, bone_names,
+                             np.concatenate([take['bone_rotations'] for take in takes], axis=1), 'QUATERNION', frames=frames)
+
+Run `python -m utils.capture_batch <take.csv> [num_takes] [max_workers ...]` from the repository root
+to time the ingestion of num_takes copies of a take with each number of workers.
+
+Author: zhaoyafei0210@gmail.com
+"""
+import contextlib
+import multiprocessing
+import sys
+import types
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from utils.capture_csv import load_capture_csv
+from utils.capture_resample import angles_to_quaternions, resample_capture
+
+
+__all__ = ['angles_to_bone_quaternions', 'ingest_capture_take', 'ingest_capture_takes']
+
+
+def __quaternion_multiply(q0: np.ndarray, q1: np.ndarray) -> np.ndarray:
+    """Hamilton product of (..., 4) (w, x, y, z) quaternions."""
+    w0, x0, y0, z0 = np.moveaxis(q0, -1, 0)
+    w1, x1, y1, z1 = np.moveaxis(q1, -1, 0)
+
+    return np.stack([
+        w0 * w1 - x0 * x1 - y0 * y1 - z0 * z1,
+        w0 * x1 + x0 * w1 + y0 * z1 - z0 * y1,
+        w0 * y1 - x0 * z1 + y0 * w1 + z0 * x1,
+        w0 * z1 + x0 * y1 - y0 * x1 + z0 * w1,
+    ], axis=-1)
+
+
+def angles_to_bone_quaternions(angles: np.ndarray, rest_quaternion) -> np.ndarray:
+    """Convert [yaw, pitch, roll] rows into rotation quaternions in a bone's local space.
+
+    The vectorized counterpart of angles_to_bone_quaternion() in the keyframing scripts,
+    `matrix_world.inverted() @ rot_mat @ matrix_world` with rest_quaternion = matrix_world.to_quaternion().
+
+    Parameters:
+        angles: array with shape (T, 3).
+        rest_quaternion: (w, x, y, z) of the 3x3 world matrix of the bone's rest pose.
+
+    Returns:
+        quats: float32 array with shape (T, 4), w >= 0 like mathutils.Matrix.to_quaternion().
+    """
+    rest = np.asarray(rest_quaternion, dtype=np.float64)
+    rest = rest / np.linalg.norm(rest)
+    rest_inverted = rest * np.array([1, -1, -1, -1])
+
+    quats = angles_to_quaternions(np.asarray(angles, dtype=np.float64))
+    quats = __quaternion_multiply(__quaternion_multiply(rest_inverted, quats), rest)
+    quats *= np.where(quats[:, :1] < 0, -1, 1)
+
+    return quats.astype(np.float32)
+
+
+def ingest_capture_take(
+        csv_path: str,
+        csv_format: str = 'livelinkface',
+        time_downsample_rate: int = 1,
+        target_fps: float | None = None,
+        timecode_fps: float = 60,
+        blendshape_names: list[str] | None = None,
+        bone_rest_quaternions: list | None = None,
+        use_cache: bool = True
+) -> dict:
+    """Parse, resample and filter one capture take, safe to run in a worker process (no bpy).
+
+    Parameters:
+        csv_path: path of the capture CSV file.
+        csv_format: 'livelinkface' or 'nv_a2f', see utils.capture_csv.CAPTURE_CSV_FORMATS.
+        time_downsample_rate: keep every time_downsample_rate-th row, ignored if target_fps is set.
+        target_fps: if set, resample onto an exact target_fps grid, see utils.capture_resample.resample_capture().
+        timecode_fps: frame rate of the LiveLinkFace time codes, used with target_fps.
+        blendshape_names: if set, only keep these blendshapes, e.g. the shape key names of the target mesh.
+        bone_rest_quaternions: if set, one (w, x, y, z) per bone, see angles_to_bone_quaternions(),
+            bone i takes the [yaw, pitch, roll] joint columns 3*i to 3*i+2.
+        use_cache: see utils.capture_csv.load_capture_csv().
+
+    Returns:
+        dict: A dictionary containing:
+            - 'csv_path': csv_path
+            - 'num_frames': number of frames N
+            - 'blendshape_names': list of the kept blendshape names
+            - 'blendshape_values': float32 array with shape (#num_blendshapes, N), for keyframe_shape_keys()
+            - 'joint_frames': float32 array with shape (N, #num_joints)
+            - 'bone_rotations': float32 array with shape (#num_bones, N, 4) for keyframe_pose_bones_bulk()
+              with 'QUATERNION', or None if bone_rest_quaternions is not set
+    """
+    loaded_anim_data = load_capture_csv(csv_path, csv_format, use_cache=use_cache)
+
+    if target_fps:
+        loaded_anim_data = resample_capture(loaded_anim_data, target_fps, csv_format, timecode_fps)
+        time_downsample_rate = 1
+
+    num_frames = len(loaded_anim_data['data']) // time_downsample_rate
+    frame_indices = np.arange(num_frames) * time_downsample_rate
+
+    names = loaded_anim_data['blendshape_names']
+    columns = np.arange(len(names))
+    if blendshape_names is not None:
+        kept_names = set(blendshape_names)
+        columns = np.array([ii for ii, name in enumerate(names) if name in kept_names], dtype=np.int64)
+        names = [names[ii] for ii in columns]
+
+    # Copies, not views of a memory map, so they are cheap to send back from the worker
+    blendshape_values = np.ascontiguousarray(loaded_anim_data['blendshape_frames'][frame_indices][:, columns].T)
+    joint_frames = np.ascontiguousarray(loaded_anim_data['joint_frames'][frame_indices])
+
+    bone_rotations = None
+    if bone_rest_quaternions is not None:
+        assert len(bone_rest_quaternions) * 3 <= joint_frames.shape[1], \
+            f"Got {len(bone_rest_quaternions)} bones, but only {joint_frames.shape[1]} joint columns in {csv_path}."
+
+        bone_rotations = np.empty((len(bone_rest_quaternions), num_frames, 4), dtype=np.float32)
+        for i, rest_quaternion in enumerate(bone_rest_quaternions):
+            bone_rotations[i] = angles_to_bone_quaternions(joint_frames[:, i*3:i*3+3], rest_quaternion)
+
+    return {
+        'csv_path': csv_path,
+        'num_frames': num_frames,
+        'blendshape_names': names,
+        'blendshape_values': blendshape_values,
+        'joint_frames': joint_frames,
+        'bone_rotations': bone_rotations,
+    }
+
+
+@contextlib.contextmanager
+def __detached_main():
+    """Hide the __main__ module while worker processes are started.
+
+    Spawned workers re-run the file of __main__, which is the calling script when run by Blender
+    and fails there on `import bpy`. The workers only need this module, pickled by name.
+    """
+    main_module = sys.modules['__main__']
+    sys.modules['__main__'] = types.ModuleType('__main__')
+    try:
+        yield
+    finally:
+        sys.modules['__main__'] = main_module
+
+
+def ingest_capture_takes(
+        csv_paths: list[str],
+        start_frame: int = 1,
+        frame_gap: int = 15,
+        max_workers: int | None = None,
+        **take_kwargs
+) -> list[dict]:
+    """Ingest capture takes in a process pool and lay them out back to back on the timeline.
+
+    Take k starts at `end_frame(k - 1) + frame_gap`, like keying the takes one after another
+    with `start_frame = end_frame + 15` in the keyframing scripts. The same csv path is ingested once.
+
+    Parameters:
+        csv_paths: paths of the capture CSV files, in timeline order.
+        start_frame: first frame of the first take.
+        frame_gap: frame offset from the last frame of a take to the first frame of the next one.
+        max_workers: number of worker processes, default is os.cpu_count(), 0 to ingest in this process.
+        take_kwargs: keyword arguments of ingest_capture_take().
+
+    Returns:
+        takes: one dict per csv path, see ingest_capture_take(), plus 'start_frame' and 'end_frame'.
+    """
+    unique_paths = list(dict.fromkeys(csv_paths))
+
+    if max_workers == 0:
+        ingested = {csv_path: ingest_capture_take(csv_path, **take_kwargs) for csv_path in unique_paths}
+    else:
+        # Never fork the Blender process, spawn clean interpreters
+        mp_context = multiprocessing.get_context('spawn')
+
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=mp_context) as executor:
+            with __detached_main():
+                futures = {
+                    csv_path: executor.submit(ingest_capture_take, csv_path, **take_kwargs)
+                    for csv_path in unique_paths
+                }
+
+            ingested = {csv_path: future.result() for csv_path, future in futures.items()}
+
+    takes = []
+    for csv_path in csv_paths:
+        take = dict(ingested[csv_path])
+        take['start_frame'] = start_frame
+        take['end_frame'] = start_frame + take['num_frames'] - 1
+        takes.append(take)
+
+        print(f"---> Take '{csv_path}': frames {take['start_frame']}-{take['end_frame']}")
+        start_frame = take['end_frame'] + frame_gap
+
+    return takes
+
+
+if __name__ == "__main__":
+    import os
+    import os.path as osp
+    import shutil
+    import tempfile
+    import time
+
+    # Workers unpickle the function by module name, so use this module's importable copy
+    from utils import capture_batch
+
+    csv_path = sys.argv[1]
+    num_takes = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+    worker_counts = [int(arg) for arg in sys.argv[3:]] or [0, 1, 2, 4, 8]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # Distinct copies, the same path is ingested once
+        csv_paths = []
+        for ii in range(num_takes):
+            csv_paths.append(osp.join(tmp_dir, f'take_{ii:03d}.csv'))
+            shutil.copyfile(csv_path, csv_paths[-1])
+
+        print(f'---> {num_takes} takes of {csv_path}, {os.cpu_count()} CPUs')
+
+        base_seconds = None
+        for max_workers in worker_counts:
+            t0 = time.perf_counter()
+            capture_batch.ingest_capture_takes(csv_paths, max_workers=max_workers, use_cache=False)
+            seconds = time.perf_counter() - t0
+
+            if base_seconds is None:
+                base_seconds = seconds
+            print(f'---> max_workers={max_workers}: {seconds:.3f} seconds, {base_seconds / seconds:.2f}x')
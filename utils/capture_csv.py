@@ -0,0 +1,365 @@
+"""Load facial capture CSV files (LiveLinkFace, Nvidia audio2face) into NumPy arrays.
+
+All numeric columns are parsed at once by a C parser (np.loadtxt, or pandas.read_csv if
+pandas is installed) into one C-contiguous float32 (T, C) array. The blendshape and joint
+frames are column views of it, the time codes are returned as a separate str array.
+
+The parsed data is cached in a binary sidecar next to the CSV file: '<csv_path>.npy' holds
+the (T, C) array and '<csv_path>.json' the column names, time codes and the key of the CSV
+file (path, size, mtime and a hash of sampled blocks). Later loads memory-map the .npy file,
+stale sidecars are rebuilt.
+
+The first parse of a file is bounded by the C parser: on a 100k x 61 LiveLinkFace take np.loadtxt
+takes about 0.5 s, 3-4x faster than the csv module (1.5-2 s); np.fromstring and byte-level
+decoding in NumPy are slower still. Loading the sidecar takes ~20 ms, so the 10x and more only
+applies to loading a take again, e.g. when it is keyed again. Run this module on a CSV file to time both.
+
+iter_capture_csv() reads a CSV file in fixed-size chunks instead, so memory stays bounded
+for takes of any length. Only the NLA chunk path of the audio2face scripts streams this way;
+load_capture_csv(), the LiveLinkFace scripts and utils.capture_batch hold whole takes, as
+resampling and keyframe reduction work on a whole take.
+
+Author: zhaoyafei0210@gmail.com
+"""
+import hashlib
+import io
+import itertools
+import json
+import os
+import os.path as osp
+
+import numpy as np
+
+
+__all__ = [
+    'CAPTURE_CSV_FORMATS',
+    'load_capture_csv',
+    'get_sidecar_paths',
+    'iter_capture_csv',
+    'load_livelinkface_csv',
+    'load_nv_a2f_csv'
+]
+
+
+# Column layout of the supported CSV formats:
+#   time_column: index of the time code column
+#   first_data_column: index of the first numeric column, i.e. the first blendshape
+#   num_joint_columns: number of joint (head/eye rotation) columns at the end
+CAPTURE_CSV_FORMATS = {
+    # Timecode,BlendShapeCount,EyeBlinkLeft,...,HeadYaw,HeadPitch,HeadRoll,LeftEyeYaw,...,RightEyeRoll
+    'livelinkface': {'time_column': 0, 'first_data_column': 2, 'num_joint_columns': 9},
+    # frame,timeCode,blendShapes.EyeBlinkLeft,...,<3 joint columns>
+    'nv_a2f': {'time_column': 1, 'first_data_column': 2, 'num_joint_columns': 3},
+}
+
+
+SIDECAR_VERSION = 1
+
+
+def get_sidecar_paths(csv_path: str) -> tuple[str, str]:
+    """Paths of the .npy data block and the .json header of the sidecar of a CSV file."""
+    return f'{csv_path}.npy', f'{csv_path}.json'
+
+
+def __get_source_key(csv_path: str, num_blocks: int = 16, block_size: int = 1 << 16) -> dict:
+    """Key of a CSV file: absolute path, size, mtime and a SHA-1 of num_blocks evenly spaced blocks,
+    so that a content change with the same size and mtime is detected without reading the whole file.
+    """
+    stat = os.stat(csv_path)
+    size = stat.st_size
+
+    hasher = hashlib.sha1()
+    with open(csv_path, 'rb') as f:
+        if size <= num_blocks * block_size:
+            hasher.update(f.read())
+        else:
+            for offset in np.linspace(0, size - block_size, num_blocks).astype(np.int64):
+                f.seek(int(offset))
+                hasher.update(f.read(block_size))
+
+    return {
+        'path': osp.abspath(csv_path),
+        'size': size,
+        'mtime_ns': stat.st_mtime_ns,
+        'hash': hasher.hexdigest(),
+    }
+
+
+def __load_sidecar(csv_path: str, csv_format: str, source_key: dict) -> tuple | None:
+    npy_path, json_path = get_sidecar_paths(csv_path)
+    if not (osp.isfile(npy_path) and osp.isfile(json_path)):
+        return None
+
+    try:
+        with open(json_path, 'r') as f:
+            header = json.load(f)
+
+        if (header.get('version') != SIDECAR_VERSION or header.get('csv_format') != csv_format
+                or header.get('source') != source_key):
+            return None
+
+        # Read-only memory map: nothing is read until a frame is touched
+        data = np.load(npy_path, mmap_mode='r')
+    except (OSError, ValueError):
+        return None
+
+    if data.shape != (len(header['time_codes']), len(header['column_names'])) or data.dtype != np.float32:
+        return None
+
+    return data, np.array(header['time_codes'], dtype=str), header['column_names']
+
+
+def __save_sidecar(csv_path: str, csv_format: str, source_key: dict, data, time_codes, column_names) -> None:
+    npy_path, json_path = get_sidecar_paths(csv_path)
+
+    header = {
+        'version': SIDECAR_VERSION,
+        'csv_format': csv_format,
+        'source': source_key,
+        'column_names': column_names,
+        'time_codes': time_codes.tolist(),
+    }
+
+    # Write to temporary files and rename them, the header last, so a sidecar is never seen half-written
+    try:
+        with open(npy_path + '.tmp', 'wb') as f:
+            np.save(f, data)
+        os.replace(npy_path + '.tmp', npy_path)
+
+        with open(json_path + '.tmp', 'w') as f:
+            json.dump(header, f)
+        os.replace(json_path + '.tmp', json_path)
+    except OSError as e:
+        print(f'---> Failed to write the sidecar of {csv_path}: {e}')
+
+
+def __get_column_names(header: list[str], csv_format: str) -> list[str]:
+    first_data_column = CAPTURE_CSV_FORMATS[csv_format]['first_data_column']
+    names = header[first_data_column:]
+
+    if csv_format == 'nv_a2f':
+        names = [item.split('.')[-1] for item in names] # remove prefix "blendShapes."
+        names = [name[0].lower()+name[1:] for name in names] # lower case the first letter
+
+    return names
+
+
+def __parse_with_numpy(body: bytes, time_column: int, first_data_column: int, num_columns: int):
+    data = np.loadtxt(io.BytesIO(body), delimiter=',', dtype=np.float32, ndmin=2,
+                      usecols=range(first_data_column, first_data_column + num_columns))
+
+    time_codes = np.array(
+        [line.split(b',', time_column + 1)[time_column].decode() for line in body.splitlines() if line.strip()],
+        dtype=str)
+
+    return data, time_codes
+
+
+def __parse_with_pandas(body: bytes, time_column: int, first_data_column: int, num_columns: int):
+    import pandas as pd
+
+    df = pd.read_csv(io.BytesIO(body), header=None, dtype={time_column: str}, engine='c')
+    data = df.iloc[:, first_data_column:first_data_column + num_columns].to_numpy(dtype=np.float32)
+
+    return data, df.iloc[:, time_column].to_numpy(dtype=str)
+
+
+def load_capture_csv(
+        csv_path: str,
+        csv_format: str = 'livelinkface',
+        engine: str = 'auto',
+        use_cache: bool = True
+) -> dict:
+    '''
+    Load and parse the contents of a capture CSV file from the specified path.
+
+    Parameters:
+    csv_path (str): The path to the CSV file
+    csv_format (str): 'livelinkface' or 'nv_a2f', see CAPTURE_CSV_FORMATS
+    engine (str): 'numpy', 'pandas' or 'auto' (pandas if installed, otherwise numpy)
+    use_cache (bool): if True, load the sidecar of the CSV file if it is up to date,
+        otherwise parse the CSV file and (re)write its sidecar
+
+    Returns:
+    dict: A dictionary containing:
+        - 'time_codes': str array with shape (T,)
+        - 'column_names': list of the C numeric column names, blendshapes then joints
+        - 'data': C-contiguous float32 array with shape (T, C), a read-only np.memmap if loaded from the sidecar
+        - 'blendshape_names': list of blendshape names
+        - 'blendshape_frames': float32 view of data with shape (T, #num_blendshapes)
+        - 'joint_names': list of joint names
+        - 'joint_frames': float32 view of data with shape (T, #num_joints)
+    '''
+    assert csv_format in CAPTURE_CSV_FORMATS, \
+        f"Unsupported csv_format '{csv_format}', must be one of {list(CAPTURE_CSV_FORMATS)}."
+
+    layout = CAPTURE_CSV_FORMATS[csv_format]
+
+    cached = None
+    if use_cache:
+        source_key = __get_source_key(csv_path)
+        cached = __load_sidecar(csv_path, csv_format, source_key)
+
+    if cached is not None:
+        data, time_codes, column_names = cached
+    else:
+        data, time_codes, column_names = __parse_csv(csv_path, csv_format, engine)
+
+        if use_cache:
+            __save_sidecar(csv_path, csv_format, source_key, data, time_codes, column_names)
+
+    num_blendshapes = len(column_names) - layout['num_joint_columns']
+
+    return {
+        'time_codes': time_codes,
+        'column_names': column_names,
+        'data': data,
+        'blendshape_names': column_names[:num_blendshapes],
+        'blendshape_frames': data[:, :num_blendshapes],
+        'joint_names': column_names[num_blendshapes:],
+        'joint_frames': data[:, num_blendshapes:],
+    }
+
+
+def __get_parser(engine: str):
+    if engine == 'auto':
+        try:
+            import pandas  # noqa: F401
+            engine = 'pandas'
+        except ImportError:
+            engine = 'numpy'
+
+    if engine == 'pandas':
+        return __parse_with_pandas
+    elif engine == 'numpy':
+        return __parse_with_numpy
+    else:
+        raise ValueError(f"Unsupported engine '{engine}', must be 'auto', 'numpy' or 'pandas'.")
+
+
+def __parse_csv(csv_path: str, csv_format: str, engine: str):
+    layout = CAPTURE_CSV_FORMATS[csv_format]
+    parse = __get_parser(engine)
+
+    with open(csv_path, 'rb') as f:
+        header = f.readline().decode().strip().split(',')
+        body = f.read()
+
+    column_names = __get_column_names(header, csv_format)
+    data, time_codes = parse(body, layout['time_column'], layout['first_data_column'], len(column_names))
+
+    return np.ascontiguousarray(data, dtype=np.float32), time_codes, column_names
+
+
+def iter_capture_csv(
+        csv_path: str,
+        csv_format: str = 'livelinkface',
+        chunk_size: int = 10000,
+        engine: str = 'auto'
+):
+    '''
+    Read a capture CSV file chunk by chunk, only one chunk of rows is in memory at a time.
+
+    If the sidecar of the CSV file is up to date (see load_capture_csv()), the chunks are
+    slices of the memory-mapped sidecar, otherwise chunk_size lines are parsed at a time.
+
+    Limits: with a sidecar, the time codes of all rows are still read at once from its .json file.
+    Resampling to a target fps (utils.capture_resample) and keyframe reduction need the whole take
+    and are not applied chunk by chunk; a reduction per chunk always keeps the chunk borders.
+
+    Parameters:
+    csv_path (str): The path to the CSV file
+    csv_format (str): 'livelinkface' or 'nv_a2f', see CAPTURE_CSV_FORMATS
+    chunk_size (int): number of rows per chunk, the last chunk may be shorter
+    engine (str): 'numpy', 'pandas' or 'auto', see load_capture_csv()
+
+    Yields:
+    dict: A dictionary containing:
+        - 'start': index of the first row of the chunk
+        - 'time_codes': str array with shape (n,)
+        - 'data': float32 array with shape (n, C)
+        - 'blendshape_frames', 'joint_frames': views of data
+        - 'column_names', 'blendshape_names', 'joint_names': header metadata, as in load_capture_csv()
+    '''
+    assert csv_format in CAPTURE_CSV_FORMATS, \
+        f"Unsupported csv_format '{csv_format}', must be one of {list(CAPTURE_CSV_FORMATS)}."
+    assert chunk_size > 0, "chunk_size must be positive."
+
+    layout = CAPTURE_CSV_FORMATS[csv_format]
+
+    def _make_chunk(start, data, time_codes, column_names):
+        num_blendshapes = len(column_names) - layout['num_joint_columns']
+        return {
+            'start': start,
+            'time_codes': time_codes,
+            'data': data,
+            'blendshape_frames': data[:, :num_blendshapes],
+            'joint_frames': data[:, num_blendshapes:],
+            'column_names': column_names,
+            'blendshape_names': column_names[:num_blendshapes],
+            'joint_names': column_names[num_blendshapes:],
+        }
+
+    cached = __load_sidecar(csv_path, csv_format, __get_source_key(csv_path))
+    if cached is not None:
+        data, time_codes, column_names = cached
+        for start in range(0, len(data), chunk_size):
+            yield _make_chunk(start, data[start:start + chunk_size], time_codes[start:start + chunk_size], column_names)
+        return
+
+    parse = __get_parser(engine)
+
+    with open(csv_path, 'rb') as f:
+        header = f.readline().decode().strip().split(',')
+        column_names = __get_column_names(header, csv_format)
+
+        start = 0
+        while True:
+            lines = [line for line in itertools.islice(f, chunk_size) if line.strip()]
+            if not lines:
+                break
+
+            data, time_codes = parse(
+                b''.join(lines), layout['time_column'], layout['first_data_column'], len(column_names))
+            yield _make_chunk(start, np.ascontiguousarray(data, dtype=np.float32), time_codes, column_names)
+
+            start += len(data)
+
+
+def load_livelinkface_csv(csv_path: str, engine: str = 'auto', use_cache: bool = True) -> dict:
+    '''
+    Load and parse the contents of a LiveLinkFace CSV file, see load_capture_csv().
+    '''
+    return load_capture_csv(csv_path, 'livelinkface', engine, use_cache)
+
+
+def load_nv_a2f_csv(csv_path: str, engine: str = 'auto', use_cache: bool = True) -> dict:
+    '''
+    Load and parse the contents of a Nvidia audio2face NIM returned CSV file, see load_capture_csv().
+    '''
+    return load_capture_csv(csv_path, 'nv_a2f', engine, use_cache)
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    csv_path = sys.argv[1]
+    csv_format = sys.argv[2] if len(sys.argv) > 2 else 'livelinkface'
+
+    import csv
+
+    # Baseline: the csv module, one float() per value
+    t0 = time.perf_counter()
+    with open(csv_path, newline='') as f:
+        rows = list(csv.reader(f))[1:]
+    first_data_column = CAPTURE_CSV_FORMATS[csv_format]['first_data_column']
+    baseline = np.array([[float(value) for value in row[first_data_column:]] for row in rows if row], dtype=np.float32)
+    print(f"---> csv module: {baseline.shape} in {time.perf_counter() - t0:.3f} seconds")
+
+    for use_cache in (False, True, True):
+        t0 = time.perf_counter()
+        loaded = load_capture_csv(csv_path, csv_format, use_cache=use_cache)
+        print(f"---> loaded {loaded['data'].shape} in {time.perf_counter() - t0:.3f} seconds, use_cache={use_cache}")
+    print(f"---> blendshapes: {loaded['blendshape_frames'].shape}, joints: {loaded['joint_names']}")
+    print(f"---> time codes: {loaded['time_codes'][:3]} ...")
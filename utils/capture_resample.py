@@ -0,0 +1,249 @@
+"""Resample loaded capture data (see utils.capture_csv) onto an exact target-fps frame grid.
+
+The time of each row is parsed from its time code: LiveLinkFace 'HH:MM:SS:FF.mmm' time codes
+(FF.mmm is the fractional frame at the time code fps) or the audio2face time column in seconds.
+Rows are sorted by time and duplicated time codes keep their last row, so dropped frames
+become wider gaps that are interpolated over like any other gap.
+
+All channels are resampled at once: one searchsorted over the row times, then a linear blend
+of the two bracketing rows for the blendshape weights, and a slerp of the same two rows for
+the [yaw, pitch, roll] joint triplets.
+
+Author: zhaoyafei0210@gmail.com
+"""
+import numpy as np
+
+from utils.capture_csv import CAPTURE_CSV_FORMATS
+
+
+__all__ = [
+    'timecodes_to_seconds',
+    'get_capture_times',
+    'angles_to_quaternions',
+    'resample_frames',
+    'resample_capture'
+]
+
+
+SECONDS_PER_DAY = 24 * 3600
+
+
+def timecodes_to_seconds(time_codes, timecode_fps: float) -> np.ndarray:
+    """Convert 'HH:MM:SS:FF.mmm' time codes into seconds.
+
+    Drop-frame time codes ('HH:MM:SS;FF.mmm', 29.97 or 59.94 fps) are converted into frame counts
+    with the drop-frame formula (2 or 4 frame labels skipped each minute, except every 10th minute),
+    and divided by 30000/1001 or 60000/1001.
+    Time codes wrapping around midnight keep increasing, e.g. '23:59:59:59' -> '00:00:00:00'.
+
+    Parameters:
+        time_codes: str array with shape (T,).
+        timecode_fps: frame rate of the FF field, e.g. 60, or 59.94 (or 60) for drop-frame time codes.
+
+    Returns:
+        seconds: float64 array with shape (T,).
+    """
+    time_codes = np.asarray(time_codes, dtype=str)
+    if len(time_codes) == 0:
+        return np.empty(0, dtype=np.float64)
+
+    text = ' '.join(time_codes.tolist()).replace(':', ' ').replace(';', ' ')
+    fields = np.fromstring(text, dtype=np.float64, sep=' ')
+    if len(fields) != len(time_codes) * 4:
+        raise ValueError(f"Invalid time codes, must be 'HH:MM:SS:FF.mmm', e.g. {time_codes[0]!r}.")
+
+    fields = fields.reshape(-1, 4)
+    if fields[:, 3].max() >= timecode_fps + 1:
+        raise ValueError(f"Frame field {fields[:, 3].max()} of the time codes exceeds timecode_fps {timecode_fps}.")
+
+    seconds = fields[:, 0] * 3600 + fields[:, 1] * 60 + fields[:, 2] + fields[:, 3] / timecode_fps
+
+    is_drop_frame = np.char.find(time_codes, ';') >= 0
+    if is_drop_frame.any():
+        nominal_fps = int(round(timecode_fps))
+        if nominal_fps not in (30, 60):
+            raise ValueError(f"Drop-frame time codes need 29.97 or 59.94 fps, but got timecode_fps {timecode_fps}.")
+
+        df = fields[is_drop_frame]
+        total_minutes = df[:, 0] * 60 + df[:, 1]
+        dropped = nominal_fps // 15 * (total_minutes - total_minutes // 10)
+        frame_counts = (total_minutes * 60 + df[:, 2]) * nominal_fps + df[:, 3] - dropped
+        seconds[is_drop_frame] = frame_counts / (nominal_fps * 1000 / 1001)
+
+    # Add a day after each jump back of more than half a day
+    day_wraps = np.cumsum(np.diff(seconds, prepend=seconds[0]) < -SECONDS_PER_DAY / 2)
+    return seconds + day_wraps * SECONDS_PER_DAY
+
+
+def get_capture_times(loaded_anim_data: dict, csv_format: str = 'livelinkface', timecode_fps: float = 60) -> np.ndarray:
+    """Time in seconds of each row of loaded capture data, see utils.capture_csv.load_capture_csv().
+
+    timecode_fps is only used for 'livelinkface' time codes, audio2face time codes are in seconds.
+    """
+    assert csv_format in CAPTURE_CSV_FORMATS, \
+        f"Unsupported csv_format '{csv_format}', must be one of {list(CAPTURE_CSV_FORMATS)}."
+
+    if csv_format == 'livelinkface':
+        return timecodes_to_seconds(loaded_anim_data['time_codes'], timecode_fps)
+    else:
+        return np.asarray(loaded_anim_data['time_codes']).astype(np.float64)
+
+
+def angles_to_quaternions(angles: np.ndarray) -> np.ndarray:
+    """[yaw, pitch, roll] (..., 3) -> (w, x, y, z) quaternions (..., 4) of R = Rz(-yaw) @ Rx(-pitch) @ Ry(roll),
+    the rotation built by mathutils.Euler([-pitch, roll, -yaw], 'YXZ') in the keyframing scripts.
+    """
+    half = angles * 0.5
+    cz, sz = np.cos(-half[..., 0]), np.sin(-half[..., 0])
+    cx, sx = np.cos(-half[..., 1]), np.sin(-half[..., 1])
+    cy, sy = np.cos(half[..., 2]), np.sin(half[..., 2])
+
+    # qz * qx * qy
+    return np.stack([
+        cz * cx * cy - sz * sx * sy,
+        cz * sx * cy - sz * cx * sy,
+        cz * cx * sy + sz * sx * cy,
+        sz * cx * cy + cz * sx * sy,
+    ], axis=-1)
+
+
+def __quaternions_to_angles(quats: np.ndarray) -> np.ndarray:
+    """Inverse of angles_to_quaternions(), pitch is in [-pi/2, pi/2]."""
+    w, x, y, z = np.moveaxis(quats, -1, 0)
+
+    # Rows of R = Rz(a) @ Rx(b) @ Ry(c) needed for a, b, c
+    r01 = 2 * (x * y - w * z)
+    r11 = 1 - 2 * (x * x + z * z)
+    r20 = 2 * (x * z - w * y)
+    r21 = 2 * (y * z + w * x)
+    r22 = 1 - 2 * (x * x + y * y)
+
+    a = np.arctan2(-r01, r11)
+    b = np.arcsin(np.clip(r21, -1, 1))
+    c = np.arctan2(-r20, r22)
+
+    return np.stack([-a, -b, c], axis=-1)
+
+
+def __slerp(q0: np.ndarray, q1: np.ndarray, t: np.ndarray) -> np.ndarray:
+    """Shortest-path slerp of (..., 4) quaternions, t broadcasts against q0[..., 0]."""
+    dot = np.sum(q0 * q1, axis=-1)
+    q1 = np.where((dot < 0)[..., None], -q1, q1)
+    dot = np.abs(dot)
+
+    theta = np.arccos(np.clip(dot, -1, 1))
+    sin_theta = np.sin(theta)
+
+    # Nearly equal rotations fall back to lerp, the result is normalized below anyway
+    is_small = sin_theta < 1e-6
+    safe_sin = np.where(is_small, 1, sin_theta)
+    w0 = np.where(is_small, 1 - t, np.sin((1 - t) * theta) / safe_sin)
+    w1 = np.where(is_small, t, np.sin(t * theta) / safe_sin)
+
+    quats = w0[..., None] * q0 + w1[..., None] * q1
+    return quats / np.linalg.norm(quats, axis=-1, keepdims=True)
+
+
+def resample_frames(
+        times: np.ndarray,
+        data: np.ndarray,
+        target_fps: float,
+        rotation_start: int | None = None
+) -> tuple[np.ndarray, np.ndarray]:
+    """Resample (T, C) rows captured at `times` onto the grid times[0] + k / target_fps.
+
+    Parameters:
+        times: array with shape (T,), time in seconds of each row, in any order, may repeat.
+        data: array with shape (T, C).
+        target_fps: frame rate of the output grid.
+        rotation_start: if set, columns from rotation_start on are [yaw, pitch, roll] triplets
+            and are slerped, the other columns are interpolated linearly.
+
+    Returns:
+        grid_times: float64 array with shape (N,), the output times in seconds.
+        frames: C-contiguous float32 array with shape (N, C).
+    """
+    times = np.asarray(times, dtype=np.float64)
+    data = np.asarray(data)
+    assert len(times) == len(data), f"Got {len(times)} times for {len(data)} rows."
+    assert target_fps > 0, "target_fps must be positive."
+
+    if rotation_start is not None:
+        assert (data.shape[1] - rotation_start) % 3 == 0, \
+            f"Columns from {rotation_start} on must be [yaw, pitch, roll] triplets, but got {data.shape[1] - rotation_start}."
+
+    if len(times) == 0:
+        return np.empty(0, dtype=np.float64), np.empty((0, data.shape[1]), dtype=np.float32)
+
+    # Sort by time, duplicated times keep their last row
+    order = np.argsort(times, kind='stable')
+    times = times[order]
+    is_last = np.append(times[1:] != times[:-1], True)
+    order = order[is_last]
+    times = times[is_last]
+
+    num_frames = int(np.floor((times[-1] - times[0]) * target_fps + 1e-6)) + 1
+    grid_times = times[0] + np.arange(num_frames) / target_fps
+
+    # Rows bracketing each grid time, and the blend weight of the right one
+    right = np.clip(np.searchsorted(times, grid_times, side='right'), 1, max(len(times) - 1, 1))
+    left = right - 1
+    right = np.minimum(right, len(times) - 1)
+    span = times[right] - times[left]
+    t = np.divide(grid_times - times[left], span, out=np.zeros_like(span), where=span > 0)
+    t = np.clip(t, 0, 1)
+
+    rows0 = data[order[left]].astype(np.float64)
+    rows1 = data[order[right]].astype(np.float64)
+
+    frames = rows0 + t[:, None] * (rows1 - rows0)
+
+    if rotation_start is not None and rotation_start < data.shape[1]:
+        shape = (num_frames, -1, 3)
+        q0 = angles_to_quaternions(rows0[:, rotation_start:].reshape(shape))
+        q1 = angles_to_quaternions(rows1[:, rotation_start:].reshape(shape))
+        quats = __slerp(q0, q1, t[:, None])
+        frames[:, rotation_start:] = __quaternions_to_angles(quats).reshape(num_frames, -1)
+
+    return grid_times, np.ascontiguousarray(frames, dtype=np.float32)
+
+
+def resample_capture(
+        loaded_anim_data: dict,
+        target_fps: float,
+        csv_format: str = 'livelinkface',
+        timecode_fps: float = 60
+) -> dict:
+    """Resample loaded capture data (see utils.capture_csv.load_capture_csv()) to target_fps.
+
+    Parameters:
+        loaded_anim_data: dict returned by load_capture_csv().
+        target_fps: frame rate of the output, keyframe it with time_downsample_rate=1.
+        csv_format: 'livelinkface' or 'nv_a2f', see CAPTURE_CSV_FORMATS.
+        timecode_fps: frame rate of the LiveLinkFace time codes.
+
+    Returns:
+        dict: the same keys as load_capture_csv(), with resampled 'data' and views of it, plus:
+            - 'times': float64 array with shape (N,), time in seconds of each output frame
+            - 'fps': target_fps
+        'time_codes' holds the times formatted with '%.6f'.
+    """
+    times = get_capture_times(loaded_anim_data, csv_format, timecode_fps)
+    num_blendshapes = len(loaded_anim_data['blendshape_names'])
+
+    # Only whole [yaw, pitch, roll] triplets can be slerped
+    rotation_start = num_blendshapes if len(loaded_anim_data['joint_names']) % 3 == 0 else None
+
+    grid_times, data = resample_frames(times, loaded_anim_data['data'], target_fps, rotation_start)
+
+    return {
+        'time_codes': np.char.mod('%.6f', grid_times),
+        'times': grid_times,
+        'fps': target_fps,
+        'column_names': loaded_anim_data['column_names'],
+        'data': data,
+        'blendshape_names': loaded_anim_data['blendshape_names'],
+        'blendshape_frames': data[:, :num_blendshapes],
+        'joint_names': loaded_anim_data['joint_names'],
+        'joint_frames': data[:, num_blendshapes:],
+    }
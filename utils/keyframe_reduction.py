@@ -0,0 +1,194 @@
+"""Reduce dense per-frame animation channels to the keyframes needed within an error tolerance.
+
+Ramer-Douglas-Peucker on the vertical (value) error: the kept keys, linearly interpolated,
+stay within `tolerance` of every input sample. Write the reduced keys with 'LINEAR'
+interpolation to keep that bound, Bezier handles may overshoot.
+
+All channels are processed together: every iteration splits, in every channel,
+each segment that exceeds the tolerance at the worst sample of each of its error lobes.
+
+Author: zhaoyafei0210@gmail.com
+"""
+import numpy as np
+
+
+__all__ = ['reduce_keyframes', 'reduce_grouped_keyframes', 'print_reduction_stats']
+
+
+def __reduce(values: np.ndarray, frames: np.ndarray, tolerance: float) -> np.ndarray:
+    """values: (C, T, D), frames: (T,), returns the kept mask with shape (C, T)."""
+    num_channels, num_frames, num_components = values.shape
+
+    kept = np.zeros((num_channels, num_frames), dtype=bool)
+    if num_frames == 0:
+        return kept
+
+    kept[:, 0] = True
+    kept[:, -1] = True
+
+    # Work on flat (C * T) indices, the first and last keys of each channel are kept,
+    # so the nearest kept keys of a sample never lie in another channel
+    kept = kept.reshape(-1)
+    flat_values = values.reshape(-1, num_components)
+    flat_frames = np.tile(frames, num_channels)
+    open_segment = np.zeros(len(kept), dtype=bool)
+
+    # Samples of the segments that still exceed the tolerance, a segment that is within
+    # the tolerance never changes again
+    active = np.flatnonzero(~kept)
+
+    while len(active):
+        # Nearest kept key on the left and on the right of every active sample
+        kept_idx = np.flatnonzero(kept)
+        pos = np.searchsorted(kept_idx, active)
+        left = kept_idx[pos - 1]
+        right = kept_idx[pos]
+
+        frame_left = flat_frames[left]
+        frame_span = flat_frames[right] - frame_left
+        alpha = np.divide(flat_frames[active] - frame_left, frame_span,
+                          out=np.zeros_like(frame_left), where=frame_span > 0)
+
+        value_left = flat_values[left]
+        signed_error = value_left + alpha[:, None] * (flat_values[right] - value_left) - flat_values[active]
+        component = np.abs(signed_error).argmax(axis=-1)
+        signed_error = np.take_along_axis(signed_error, component[:, None], axis=-1)[:, 0]
+        error = np.abs(signed_error)
+
+        exceeded = error > tolerance
+        if not exceeded.any():
+            break
+
+        # A segment is identified by its left key
+        open_segment[:] = False
+        open_segment[left[exceeded]] = True
+        in_open_segment = open_segment[left]
+        active, left = active[in_open_segment], left[in_open_segment]
+        signed_error, error = signed_error[in_open_segment], error[in_open_segment]
+
+        # Split each open segment at the worst sample of every lobe (run of the same error sign)
+        # above the tolerance, instead of only at the worst sample of the segment as plain RDP does,
+        # so an oscillating channel is split at all its peaks at once rather than one per iteration
+        new_run = np.ones(len(active), dtype=bool)
+        new_run[1:] = (left[1:] != left[:-1]) | (np.signbit(signed_error[1:]) != np.signbit(signed_error[:-1]))
+        run_ids = np.cumsum(new_run) - 1
+        order = np.lexsort((-error, run_ids))
+        first_of_run = np.ones(len(order), dtype=bool)
+        first_of_run[1:] = run_ids[order][1:] != run_ids[order][:-1]
+        worst = order[first_of_run]
+        worst = worst[error[worst] > tolerance]
+
+        kept[active[worst]] = True
+        active = np.delete(active, worst)
+
+    return kept.reshape(num_channels, num_frames)
+
+
+def __get_stats(kept: np.ndarray) -> dict:
+    num_kept = kept.sum(axis=1)
+
+    return {
+        'num_kept': num_kept,
+        'num_dropped': kept.shape[1] - num_kept,
+        'total_kept': int(num_kept.sum()),
+        'total_dropped': int(kept.size - num_kept.sum()),
+    }
+
+
+def reduce_keyframes(
+        values: np.ndarray,
+        tolerance: float,
+        frames: np.ndarray | None = None
+) -> tuple[list[np.ndarray], dict]:
+    """Reduce independent channels, e.g. the (K, T) blendshape weights of a capture.
+
+    Parameters:
+        values: array with shape (#num_channels, #num_frames).
+        tolerance: max. absolute error of the linearly interpolated kept keys.
+        frames: optional frame numbers (or times) with shape (#num_frames,), default is 0..T-1.
+
+    Returns:
+        kept_indices: list with one int array of kept frame indices per channel.
+        stats: dict with 'num_kept' and 'num_dropped' (arrays with shape (#num_channels,)),
+            'total_kept' and 'total_dropped'.
+    """
+    values = np.asarray(values, dtype=np.float32)
+    assert values.ndim == 2, f"Invalid shape of values, must be (#num_channels, #num_frames), but got {values.shape}."
+
+    return reduce_grouped_keyframes(values[..., None], tolerance, frames)
+
+
+def reduce_grouped_keyframes(
+        values: np.ndarray,
+        tolerance: float,
+        frames: np.ndarray | None = None
+) -> tuple[list[np.ndarray], dict]:
+    """Reduce groups of channels that share keyframes, e.g. the (B, T, 4) quaternions of B bones,
+    so the 4 components of a bone keep the same frames.
+
+    Parameters:
+        values: array with shape (#num_groups, #num_frames, #num_components).
+        tolerance: max. absolute error of any component of the linearly interpolated kept keys.
+        frames: optional frame numbers (or times) with shape (#num_frames,), default is 0..T-1.
+
+    Returns:
+        kept_indices: list with one int array of kept frame indices per group.
+        stats: see reduce_keyframes(), counted per group.
+    """
+    values = np.asarray(values, dtype=np.float32)
+    assert values.ndim == 3, \
+        f"Invalid shape of values, must be (#num_groups, #num_frames, #num_components), but got {values.shape}."
+
+    num_frames = values.shape[1]
+    if frames is None:
+        frames = np.arange(num_frames, dtype=np.float32)
+    else:
+        frames = np.asarray(frames, dtype=np.float32)
+        assert frames.shape == (num_frames,), f"Invalid shape of frames, must be ({num_frames},), but got {frames.shape}."
+
+    kept = __reduce(values, frames, tolerance)
+    kept_indices = [np.flatnonzero(row) for row in kept]
+
+    return kept_indices, __get_stats(kept)
+
+
+def print_reduction_stats(stats: dict, channel_names: list[str] | None = None) -> None:
+    """Print the keys kept vs. dropped per channel."""
+    num_kept = stats['num_kept']
+    num_dropped = stats['num_dropped']
+
+    if channel_names is None:
+        channel_names = [f'#{ii}' for ii in range(len(num_kept))]
+
+    for name, kept, dropped in zip(channel_names, num_kept, num_dropped):
+        print(f'---> {name}: kept {kept}, dropped {dropped}')
+
+    total = stats['total_kept'] + stats['total_dropped']
+    print(f"---> total: kept {stats['total_kept']} / {total} keys "
+          f"({100.0 * stats['total_kept'] / max(total, 1):.1f}%)")
+
+
+if __name__ == "__main__":
+    import time
+
+    num_frames = 60 * 60 * 5 # 5 minutes at 60 fps
+    num_channels = 52
+
+    rng = np.random.default_rng(0)
+    t = np.arange(num_frames) / 60.0
+    # Slow motion on some channels, almost static ones on the others
+    freqs = rng.uniform(0.05, 2.0, size=(num_channels, 1))
+    amps = np.where(rng.random((num_channels, 1)) < 0.5, 0.5, 0.001)
+    weights = (0.5 + amps * np.sin(2 * np.pi * freqs * t)).astype(np.float32)
+
+    t0 = time.perf_counter()
+    kept_indices, stats = reduce_keyframes(weights, tolerance=0.005)
+    print(f'---> reduced {num_channels} x {num_frames} keys in {time.perf_counter() - t0:.3f} seconds')
+    print_reduction_stats(stats)
+
+    # Check the error bound
+    max_error = max(
+        np.abs(np.interp(np.arange(num_frames), kept, weights[ii, kept]) - weights[ii]).max()
+        for ii, kept in enumerate(kept_indices)
+    )
+    print(f'---> max error: {max_error:.6f}')
@@ -0,0 +1,135 @@
+"""Sparse-delta representation of shape keys (blendshapes).
+
+Each shape key only stores the indices of the vertices it displaces by more than
+a tolerance, plus their deltas, in compressed-sparse-row (CSR) layout.
+
+Author: zhaoyafei0210@gmail.com
+"""
+import numpy as np
+
+
+__all__ = [
+    'dense_to_sparse_deltas',
+    'sparse_to_dense_deltas',
+    'get_sparse_delta',
+    'get_sparse_deltas_nbytes',
+    'get_sparse_deltas_compression_ratio'
+]
+
+
+def dense_to_sparse_deltas(
+        deltas: np.ndarray,
+        tolerance: float = 1e-5,
+        dtype: type | np.dtype = np.float16
+) -> dict:
+    """Convert dense shape-key deltas into the sparse-delta (CSR) layout.
+
+    Parameters:
+        deltas: array with shape (#num_shape_keys, #num_vertices, 3), per-vertex deltas of each shape key.
+        tolerance: a vertex is kept for a shape key if the length of its delta is larger than tolerance.
+        dtype: np.float16 or np.float32, dtype of the stored deltas.
+
+    Returns:
+        dict: A dictionary containing:
+            - 'num_vertices': #num_vertices
+            - 'offsets': int64 array with shape (#num_shape_keys + 1,)
+            - 'indices': int32 array with shape (#nnz,), vertex indices
+            - 'deltas': array with shape (#nnz, 3) and dtype `dtype`
+          The indices and deltas of shape key k are indices[offsets[k]:offsets[k+1]]
+          and deltas[offsets[k]:offsets[k+1]].
+    """
+    deltas = np.asarray(deltas)
+    assert deltas.ndim == 3 and deltas.shape[-1] == 3, \
+        f"Invalid shape of deltas, must be (#num_shape_keys, #num_vertices, 3), but got {deltas.shape}."
+
+    num_shape_keys, num_vertices, _ = deltas.shape
+
+    # Compare squared lengths to avoid a sqrt over K*V elements
+    mask = np.einsum('kvi,kvi->kv', deltas, deltas) > tolerance * tolerance
+
+    offsets = np.zeros(num_shape_keys + 1, dtype=np.int64)
+    np.cumsum(mask.sum(axis=1), out=offsets[1:])
+
+    # np.nonzero() returns row-major order, i.e. grouped by shape key and sorted by vertex
+    key_idx, vert_idx = np.nonzero(mask)
+
+    return {
+        'num_vertices': num_vertices,
+        'offsets': offsets,
+        'indices': vert_idx.astype(np.int32),
+        'deltas': deltas[key_idx, vert_idx].astype(dtype),
+    }
+
+
+def get_sparse_delta(sparse_deltas: dict, key_idx: int) -> tuple[np.ndarray, np.ndarray]:
+    """Get the (indices, deltas) of a single shape key, both are views.
+
+    Parameters:
+        sparse_deltas: sparse deltas, as returned by dense_to_sparse_deltas().
+        key_idx: index of the shape key.
+
+    Returns:
+        indices: int32 array with shape (#nnz_k,).
+        deltas: array with shape (#nnz_k, 3).
+    """
+    start, end = sparse_deltas['offsets'][key_idx:key_idx + 2]
+
+    return sparse_deltas['indices'][start:end], sparse_deltas['deltas'][start:end]
+
+
+def sparse_to_dense_deltas(
+        sparse_deltas: dict,
+        dtype: type | np.dtype = np.float32
+) -> np.ndarray:
+    """Convert sparse deltas back into dense deltas.
+
+    Parameters:
+        sparse_deltas: sparse deltas, as returned by dense_to_sparse_deltas().
+        dtype: dtype of the returned array.
+
+    Returns:
+        deltas: array with shape (#num_shape_keys, #num_vertices, 3).
+    """
+    offsets = sparse_deltas['offsets']
+    num_shape_keys = len(offsets) - 1
+
+    deltas = np.zeros((num_shape_keys, sparse_deltas['num_vertices'], 3), dtype=dtype)
+
+    key_idx = np.repeat(np.arange(num_shape_keys), np.diff(offsets))
+    deltas[key_idx, sparse_deltas['indices']] = sparse_deltas['deltas']
+
+    return deltas
+
+
+def get_sparse_deltas_nbytes(sparse_deltas: dict) -> int:
+    """Number of bytes used by the arrays of the sparse deltas."""
+    return (sparse_deltas['offsets'].nbytes +
+            sparse_deltas['indices'].nbytes +
+            sparse_deltas['deltas'].nbytes)
+
+
+def get_sparse_deltas_compression_ratio(sparse_deltas: dict) -> float:
+    """Compression ratio of the sparse deltas against dense float32 (K, V, 3) deltas."""
+    num_shape_keys = len(sparse_deltas['offsets']) - 1
+    dense_nbytes = num_shape_keys * sparse_deltas['num_vertices'] * 3 * np.dtype(np.float32).itemsize
+
+    return dense_nbytes / max(get_sparse_deltas_nbytes(sparse_deltas), 1)
+
+
+if __name__ == "__main__":
+    num_shape_keys = 52
+    num_vertices = 15000
+
+    # Each shape key only moves a small region of the mesh
+    rng = np.random.default_rng(0)
+    dense_deltas = np.zeros((num_shape_keys, num_vertices, 3), dtype=np.float32)
+    for kk in range(num_shape_keys):
+        start = rng.integers(0, num_vertices - 500)
+        dense_deltas[kk, start:start + 500] = rng.normal(scale=0.01, size=(500, 3))
+
+    sparse_deltas = dense_to_sparse_deltas(dense_deltas, tolerance=1e-5)
+    print(f"---> nnz: {len(sparse_deltas['indices'])}")
+    print(f'---> compression ratio: {get_sparse_deltas_compression_ratio(sparse_deltas):.1f}x')
+
+    restored_deltas = sparse_to_dense_deltas(sparse_deltas)
+    print(f'---> max abs error: {np.abs(restored_deltas - dense_deltas).max()}')